@@ -1,16 +1,29 @@
 
 import os
+import click
+from contextlib import closing
 from flask_cors import CORS
-from flask import redirect, request, send_from_directory, __name__, url_for
+from flask import Response, redirect, request, send_from_directory, __name__, url_for
 from flask_migrate import Migrate
 from flask_openapi3 import OpenAPI, Info, Tag
 from flask_sqlalchemy import SQLAlchemy
 from flask_uploads import UploadSet, IMAGES, configure_uploads
+from sqlalchemy.pool import NullPool
 
 import jwt
 
 from controllers import *
-from models.database import db_url
+from models.base import Base
+from models.database import db_url, engine, Session, estatisticas_do_pool
+from models.cache import cache_agenda_hoje, cache_clientes
+from models.coalescencia import single_flight
+from models.remocao_arquivos import fila_remocao_arquivos
+from models.sugestoes import indice_nomes
+from models.extracao import extrator_conteudo
+from models.samba import pool_samba
+from models.ndjson import MIMETYPE_NDJSON
+from models.exportacao import abre_exportacao, FORMATOS_EXPORTACAO, MIMETYPES_EXPORTACAO
+from models.consultas_duplicadas import restricao_consulta_unico_presente, consultas_duplicadas, move_consultas_duplicadas
 from models.fuso_horario import exp
 from models.consultas_juridicas import ConsultaJuridica
 from models.clientes import Cliente
@@ -22,15 +35,15 @@ from schemas import *
 
 info = Info(title="Thata System API", version='1.0.0')
 app = OpenAPI(__name__, info=info)
-db = SQLAlchemy()
-migrate = Migrate(app, db)
 images = UploadSet('images', IMAGES)
-db.init_app(app)
 CORS(app)
 
 # Configurações do banco de dados
 app.config['SQLALCHEMY_DATABASE_URI'] = db_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# O Flask-SQLAlchemy só é usado pelo Flask-Migrate; as requisições usam a engine
+# única de models.database, então este engine não mantém pool próprio.
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'poolclass': NullPool}
 app.config['JSON_AS_ASCII'] = False
 app.config['JSONIFY_MIMETYPE'] = 'application/json; charset=utf-8'
 app.config['BABEL_DEFAULT_TIMEZONE'] = 'America/Sao_Paulo'
@@ -38,6 +51,10 @@ app.config['UPLOADED_DOCUMENTS_DEST'] = os.path.abspath('public/uploads/document
 app.config['UPLOADED_IMAGES_DEST'] = os.path.abspath('public/uploads/images')
 app.config['UPLOADED_PECAS_DEST'] = os.path.abspath('public/uploads/pecas')
 
+db = SQLAlchemy(metadata=Base.metadata)
+db.init_app(app)
+migrate = Migrate(app, db)
+
 # Configuração Uploads Local
 configure_uploads(app, documents)
 configure_uploads(app, images)
@@ -51,6 +68,10 @@ documento_tag = Tag(name="Documento", description="Criação, atualização, exc
 image_tag = Tag(name="Image", description="Upload de imagens")
 usuario_tag = Tag(name="Usuário", description="Criação, atualização, exclusão, obtenção e autenticação de usuários")
 peca_tag = Tag(name="PecaProcessual", description="Criação, atualização, exclusão e obtenção de peças processuais")
+exportacao_tag = Tag(name="Exportação", description="Exportação de snapshots de tabelas em CSV ou Parquet")
+upload_tag = Tag(name="Upload", description="Uploads em partes, com retomada, de documentos e peças processuais")
+busca_tag = Tag(name="Busca", description="Busca textual em clientes, consultas, documentos e peças processuais")
+metricas_tag = Tag(name="Métricas", description="Telemetria de recursos do processo da API")
 
 # Inicializar os controladores
 consultas_controller = ConsultaJuridicaController()
@@ -58,6 +79,23 @@ clientes_controller = ClientesController()
 documentos_controller = DocumentoController()
 pecas_processuais_controller = PecaProcessualController()
 users_controller = UserController()
+busca_controller = BuscaController()
+upload_controller = UploadController()
+
+# O índice de sugestões de clientes começa a carregar na inicialização; até ficar pronto, as sugestões vêm do banco
+indice_nomes.carregar_em_segundo_plano(Session.session_factory)
+
+def quer_ndjson(query: PaginacaoSchema) -> bool:
+    """Indica se a listagem deve ser transmitida em NDJSON, por ?stream=1 ou pelo cabeçalho Accept."""
+    if query.stream:
+        return True
+    return request.accept_mimetypes.best_match(['application/json', MIMETYPE_NDJSON]) == MIMETYPE_NDJSON
+
+
+@app.teardown_appcontext
+def remover_sessao(exception=None):
+    """Encerra a sessão da requisição, devolvendo a conexão ao pool."""
+    Session.remove()
 
 # Rotas
 @app.get('/', tags=[home_tag])
@@ -67,6 +105,97 @@ def home():
     return redirect('/openapi')
 
 
+@app.get('/metricas', tags=[metricas_tag])
+def obter_metricas():
+    """Obtém a telemetria do processo atual: uso do pool de conexões com o banco, acertos do cache da agenda
+    do dia e do cache de clientes, leituras coalescidas, a fila de remoção de arquivos, o índice de sugestões, a extração de texto
+    dos arquivos enviados e o pool de conexões com o Samba.
+    """
+    return {
+        "pool": estatisticas_do_pool(),
+        "agenda_hoje": cache_agenda_hoje.como_dict(),
+        "clientes": cache_clientes.como_dict(),
+        "coalescencia": single_flight.como_dict(),
+        "remocao_arquivos": fila_remocao_arquivos.como_dict(),
+        "sugestoes": indice_nomes.como_dict(),
+        "extracao": extrator_conteudo.como_dict(),
+        "samba": pool_samba.como_dict()
+    }, 200
+
+
+@app.get('/busca', tags=[busca_tag],
+         responses={"200": BuscaListagemSchema, "400": MensagemResposta, "404": MensagemResposta, "422": MensagemResposta})
+def buscar(query: BuscaSchema):
+    """Busca textual em nomes e CPFs de clientes, detalhes de consultas, nomes de documentos e de peças processuais.
+
+    A busca é em português e não diferencia acentos. Retorna uma página de resultados ordenados pela relevância
+    e o cursor da próxima página.
+    """
+    return busca_controller.buscar(query.q, query.limit, query.cursor)
+
+
+@app.get('/export/<tabela>', tags=[exportacao_tag],
+         responses={"400": MensagemResposta})
+def exportar_tabela(path: ExportacaoPathSchema, query: ExportacaoBuscaSchema):
+    """Exporta um snapshot consistente de clientes, consultas ou documentos em CSV ou Parquet.
+
+    O arquivo é transmitido em lotes. O cabeçalho X-Export-Watermark traz o maior id exportado,
+    que deve ser usado como desde_id na próxima exportação incremental.
+    """
+    formato = query.formato or 'csv'
+    try:
+        marca_dagua, arquivo = abre_exportacao(path.tabela, formato, query.desde_id or 0)
+    except ValueError as e:
+        return {"mensagem": str(e)}, 400
+
+    resposta = Response(arquivo, mimetype=MIMETYPES_EXPORTACAO[formato], headers={
+        'Content-Disposition': f'attachment; filename={path.tabela}.{formato}',
+        'X-Export-Watermark': str(marca_dagua)
+    })
+    # libera a conexão do snapshot mesmo se o cliente desconectar antes do primeiro lote
+    resposta.call_on_close(arquivo.close)
+    return resposta
+
+
+@app.cli.command('exportar')
+@click.argument('tabela')
+@click.option('--formato', default='csv', type=click.Choice(FORMATOS_EXPORTACAO))
+@click.option('--desde-id', default=0, type=int, help="Exporta apenas linhas com id maior que este.")
+@click.option('--saida', required=True, type=click.Path(dir_okay=False), help="Arquivo de destino.")
+def exportar_comando(tabela, formato, desde_id, saida):
+    """Exporta um snapshot de clientes, consultas ou documentos para um arquivo CSV ou Parquet."""
+    try:
+        marca_dagua, arquivo = abre_exportacao(tabela, formato, desde_id)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    with closing(arquivo), open(saida, 'wb') as destino:
+        for parte in arquivo:
+            destino.write(parte)
+    click.echo(f'Exportação concluída em {saida}. Próximo --desde-id: {marca_dagua}')
+
+
+@app.cli.command('consultas-duplicadas')
+@click.option('--mover', is_flag=True,
+              help="Move as consultas repetidas para consulta_juridica_duplicada e cria a restrição consulta_unico.")
+def consultas_duplicadas_comando(mover):
+    """Lista as consultas repetidas do mesmo CPF no mesmo dia, que impedem a criação da restrição consulta_unico."""
+    with engine.begin() as conexao:
+        if restricao_consulta_unico_presente(conexao):
+            click.echo('A restrição consulta_unico já existe; não há consultas repetidas.')
+            return
+        grupos = consultas_duplicadas(conexao)
+        for grupo in grupos:
+            click.echo(f'CPF {grupo.cpf_cliente} em {grupo.data_consulta:%d/%m/%Y}: mantida {grupo.mantida}, '
+                       f'repetidas {", ".join(str(pk) for pk in grupo.repetidas)}')
+        if not mover:
+            click.echo(f'{len(grupos)} CPFs com consultas repetidas. Use --mover para mantê-las em '
+                       'consulta_juridica_duplicada, removê-las da agenda e criar a restrição.')
+            return
+        movidas = move_consultas_duplicadas(conexao)
+    click.echo(f'{len(movidas)} consultas movidas para consulta_juridica_duplicada; restrição consulta_unico criada.')
+
+
 @app.post('/consulta', tags=[consulta_tag],
           responses={"200": ConsultaJuridicaViewSchema, "400": MensagemResposta, "409": MensagemResposta, "422": MensagemResposta})
 def add_consulta(body: ConsultaJuridicaSchema):
@@ -87,6 +216,16 @@ def add_consulta(body: ConsultaJuridicaSchema):
     return consultas_controller.criar_consulta(consulta)
 
 
+@app.post('/consultas/lote', tags=[consulta_tag],
+          responses={"200": ConsultaJuridicaLoteResultadoSchema, "400": MensagemResposta})
+def add_consultas_em_lote(body: ConsultaJuridicaLoteSchema):
+    """Agenda um lote de Consultas Jurídicas de uma só vez.
+
+    Retorna, para cada item do lote, a consulta criada ou o motivo (400 ou 409) da recusa.
+    """
+    return consultas_controller.criar_consultas_em_lote(body.consultas)
+
+
 @app.put('/consulta', tags=[consulta_tag],
          responses={"200": ConsultaJuridicaViewSchema, "404": MensagemResposta, "409": MensagemResposta, "422": MensagemResposta})
 def atualizar_consulta(body: ConsultaJuridicaAtualizadaSchema):
@@ -112,11 +251,32 @@ def excluir_consulta(query: ConsultaJuridicaBuscaSchema):
 
 
 @app.get('/consultas', tags=[consulta_tag],
-         responses={"200": ConsultaJuridicaListagemSchema, "404": MensagemResposta})
+         responses={"200": ConsultaJuridicaListagemSchema, "400": MensagemResposta, "404": MensagemResposta})
 def obter_consultas(query: ConsultasFiltradasBuscaSchema):
-    """Obtém todas as consultas jurídicas ou consultas por data, nome do cliente ou CPF do cliente.
-    """
-    return consultas_controller.obter_consultas(query.data_consulta, query.nome_cliente, query.cpf)
+    """Obtém as consultas jurídicas, filtradas por qualquer combinação de data, intervalo de datas,
+    intervalo de horários, cliente, nome do cliente ou CPF do cliente.
+
+    Retorna uma página de consultas e o cursor da próxima página, ou todas as consultas em NDJSON.
+    Relações em include: cliente.
+    """
+    if quer_ndjson(query):
+        return consultas_controller.stream_consultas(query.data_consulta, query.nome_cliente, query.cpf, query.sort,
+                                                     data_de=query.data_de,
+                                                     data_ate=query.data_ate,
+                                                     horario_de=query.horario_de,
+                                                     horario_ate=query.horario_ate,
+                                                     cliente_id=query.cliente_id,
+                                                     fields=query.fields,
+                                                     include=query.include)
+    return consultas_controller.obter_consultas(query.data_consulta, query.nome_cliente, query.cpf,
+                                                query.limit, query.cursor, query.sort,
+                                                data_de=query.data_de,
+                                                data_ate=query.data_ate,
+                                                horario_de=query.horario_de,
+                                                horario_ate=query.horario_ate,
+                                                cliente_id=query.cliente_id,
+                                                fields=query.fields,
+                                                include=query.include)
 
 
 @app.get('/consultas/hoje', tags=[consulta_tag],
@@ -135,6 +295,26 @@ def obter_consultas_horario(query: ConsultaJuridicaBuscaPorDataEHoraSchema):
     return consultas_controller.obter_consultas_horario(query.data_consulta, query.horario_consulta)
 
 
+@app.get('/consultas/disponibilidade', tags=[consulta_tag],
+         responses={"200": ConsultaDisponibilidadeViewSchema, "400": MensagemResposta})
+def obter_disponibilidade(query: ConsultaDisponibilidadeBuscaSchema):
+    """Obtém os horários livres da agenda entre duas datas, nas janelas de 09h às 12h e de 13h às 18h.
+
+    Retorna um par [data, [horários livres]] para cada dia do intervalo.
+    """
+    return consultas_controller.obter_disponibilidade(query.de, query.ate, query.duracao)
+
+
+@app.get('/consultas/resumo', tags=[consulta_tag],
+         responses={"200": ConsultaResumoViewSchema, "400": MensagemResposta})
+def obter_resumo_agenda(query: ConsultaResumoBuscaSchema):
+    """Obtém o total de consultas por dia entre duas datas, separado em manhã, tarde e fora do expediente.
+
+    Os totais vêm de uma tabela agregada atualizada a cada gravação de consulta.
+    """
+    return consultas_controller.obter_resumo(query.de, query.ate)
+
+
 @app.get('/consulta', tags=[consulta_tag],
          responses={"200": ConsultaJuridicaViewSchema, "404": MensagemResposta})
 def obter_consulta_por_id(query: ConsultaJuridicaBuscaSchema):
@@ -162,6 +342,23 @@ def criar_cliente(body: ClienteSchema):
     return clientes_controller.criar_cliente(cliente)
 
 
+@app.post('/clientes/importacao', tags=[cliente_tag],
+          responses={"200": ClienteImportacaoResultadoSchema, "400": MensagemResposta, "422": MensagemResposta})
+def importar_clientes():
+    """Importa clientes em massa de um CSV com as colunas nome_cliente e cpf_cliente.
+
+    O CSV pode ser enviado no campo 'arquivo' de um formulário multipart ou diretamente no corpo, com
+    Content-Type text/csv. CPFs são normalizados e validados; clientes com CPF já cadastrado são ignorados.
+    Retorna as quantidades importadas e rejeitadas e as linhas rejeitadas com o motivo.
+    """
+    arquivo = request.files.get('arquivo')
+    if arquivo:
+        return clientes_controller.importar_clientes(arquivo.stream)
+    if request.mimetype == 'text/csv':
+        return clientes_controller.importar_clientes(request.stream)
+    return {"mensagem": "Envie o CSV no campo 'arquivo' ou no corpo da requisição com Content-Type text/csv"}, 400
+
+
 @app.put('/cliente', tags=[cliente_tag],
          responses={"200": ClienteViewSchema, "404": MensagemResposta, "409": MensagemResposta, "400": MensagemResposta, "422": MensagemResposta})
 def atualizar_cliente(body: ClienteAtualizadoSchema):
@@ -183,27 +380,67 @@ def excluir_cliente(query: ClienteBuscaSchema):
 
 
 @app.get('/clientes', tags=[cliente_tag],
-         responses={"200": ClienteListagemSchema, "404": MensagemResposta, "422": MensagemResposta})
+         responses={"200": ClienteListagemSchema, "400": MensagemResposta, "404": MensagemResposta, "422": MensagemResposta})
 def obter_clientes(query: ClientesFiltradosSchema):
-    """Obtém todos os clientes ou clientes filtrados por nome, CPF, data de cadastro ou data de atualização.
+    """Obtém os clientes, opcionalmente filtrados por nome, CPF, data de cadastro ou data de atualização.
 
-    Retorna uma lista de clientes.
+    As datas podem ser um dia exato (data_cadastro, data_atualizacao) ou um intervalo de dias inclusivo
+    (data_cadastro_de/data_cadastro_ate, data_atualizacao_de/data_atualizacao_ate), no formato dd/mm/aaaa.
+
+    Retorna uma página de clientes e o cursor da próxima página, ou todos os clientes em NDJSON.
     """
+    if quer_ndjson(query):
+        return clientes_controller.stream_clientes(query.nome, query.cpf, query.data_cadastro, query.data_atualizacao, query.sort,
+                                                   query.fields, query.include,
+                                                   data_cadastro_de=query.data_cadastro_de,
+                                                   data_cadastro_ate=query.data_cadastro_ate,
+                                                   data_atualizacao_de=query.data_atualizacao_de,
+                                                   data_atualizacao_ate=query.data_atualizacao_ate)
     return clientes_controller.obter_clientes(query.nome,
                                               query.cpf,
                                               query.data_cadastro,
-                                              query.data_atualizacao
+                                              query.data_atualizacao,
+                                              query.limit,
+                                              query.cursor,
+                                              query.sort,
+                                              query.fields,
+                                              query.include,
+                                              data_cadastro_de=query.data_cadastro_de,
+                                              data_cadastro_ate=query.data_cadastro_ate,
+                                              data_atualizacao_de=query.data_atualizacao_de,
+                                              data_atualizacao_ate=query.data_atualizacao_ate
                                               )
 
+@app.get('/clientes/sugestoes', tags=[cliente_tag],
+         responses={"200": ClienteSugestoesSchema, "400": MensagemResposta, "422": MensagemResposta})
+def obter_sugestoes_clientes(query: ClienteSugestoesBuscaSchema):
+    """Sugere clientes para autocompletar pelo nome: cada termo de q deve iniciar uma palavra do nome,
+    sem diferenciar acentos e maiúsculas.
+
+    Retorna até limit clientes (id e nome), com os nomes que começam pelo texto buscado primeiro.
+    """
+    return clientes_controller.obter_sugestoes(query.q, query.limit)
+
 @app.get('/cliente', tags=[cliente_tag],
-         responses={"200": ClienteViewSchema, "404": MensagemResposta, "422": MensagemResposta})
-def obter_cliente_por_id(query: ClienteBuscaSchema):
-    """Obtém um cliente pelo ID.
+         responses={"200": ClienteViewSchema, "400": MensagemResposta, "404": MensagemResposta, "422": MensagemResposta})
+def obter_cliente_por_id(query: ClienteIdOuCpfBuscaSchema):
+    """Obtém um cliente pelo ID ou pelo CPF.
 
     Retorna uma representação de um cliente.
     """
+    if not query.cliente_id and query.cpf:
+        return clientes_controller.obter_cliente_por_cpf(query.cpf)
     return clientes_controller.obter_cliente_por_id(query.cliente_id)
 
+@app.get('/cliente/<int:cliente_id>/dossie', tags=[cliente_tag],
+         responses={"200": ClienteDossieSchema, "404": MensagemResposta, "422": MensagemResposta})
+def obter_dossie_cliente(path: ClienteDossiePathSchema):
+    """Obtém um cliente com todas as suas consultas e documentos.
+
+    Retorna o cliente, as consultas ordenadas por data e horário e os documentos, em uma única resposta.
+    """
+    return clientes_controller.obter_dossie(path.cliente_id)
+
 @app.post('/documento', tags=[documento_tag],
           responses={"200": DocumentoViewSchema, "400": MensagemResposta, "409": MensagemResposta, "422": MensagemResposta})
 def criar_documento(body: DocumentoSchema):
@@ -237,11 +474,26 @@ def obter_documento_por_id(query: DocumentoBuscaSchema):
     return documentos_controller.obter_documento_por_id(query.documento_id)
 
 @app.get('/documentos', tags=[documento_tag],
-         responses={"200": DocumentoListagemSchema, "404": MensagemResposta})
-def obter_todos_documentos():
-    """Obtém todos os Documentos.
+         responses={"200": DocumentoListagemSchema, "400": MensagemResposta, "404": MensagemResposta})
+def obter_todos_documentos(query: PaginacaoSchema):
+    """Obtém os Documentos paginados por cursor.
+
+    Ordenações: id, documento_nome e cliente_id. Relações em include: cliente e consulta.
     """
-    return documentos_controller.obter_todos_documentos()
+    if quer_ndjson(query):
+        return documentos_controller.stream_documentos(query.sort, query.fields, query.include)
+    return documentos_controller.obter_todos_documentos(query.limit, query.cursor, query.sort, query.fields, query.include)
+
+@app.get('/documentos/conteudo', tags=[documento_tag],
+         responses={"200": ConteudoListagemSchema, "400": MensagemResposta, "404": MensagemResposta, "422": MensagemResposta})
+def buscar_conteudo_documentos(query: BuscaSchema):
+    """Busca no texto dos arquivos PDF e DOCX de documentos e peças processuais.
+
+    O texto é extraído em segundo plano após o upload. Retorna uma página de documentos e peças ordenados pela
+    relevância, com trechos do texto em que os termos aparecem, e o cursor da próxima página.
+    """
+    return busca_controller.buscar_conteudo(query.q, query.limit, query.cursor)
+
 @app.post('/documento/upload', tags=[documento_tag],
           responses={"200": MensagemResposta, "400": MensagemResposta, "422": MensagemResposta})
 def upload_route():
@@ -305,6 +557,56 @@ def excluir_documento_do_armazenamento_route(body: DocumentoExclusaoArmazenament
     except Exception as e:
         return {"mensagem": f"Erro ao excluir documento: {str(e)}"}, 500
 
+@app.post('/uploads', tags=[upload_tag],
+          responses={"200": UploadSessaoViewSchema, "400": MensagemResposta, "422": MensagemResposta, "500": MensagemResposta})
+def criar_upload(body: UploadSessaoSchema):
+    """Cria um upload em partes de um documento ou peça processual.
+
+    As partes são enviadas com PUT /uploads/<upload_id>, em ordem, e o upload é concluído com
+    POST /uploads/<upload_id>/conclusao. Retorna o id do upload.
+    """
+    return upload_controller.criar_sessao(body.tipo, body.local_ou_samba, body.pasta, body.nome_arquivo,
+                                          body.tamanho, body.sha256)
+
+@app.get('/uploads/<upload_id>', tags=[upload_tag],
+         responses={"200": UploadSessaoViewSchema, "404": MensagemResposta})
+def obter_upload(path: UploadPathSchema):
+    """Obtém o estado de um upload em partes; recebido indica de onde retomar a transferência.
+    """
+    return upload_controller.obter_sessao(path.upload_id)
+
+@app.put('/uploads/<upload_id>', tags=[upload_tag],
+         responses={"200": UploadSessaoViewSchema, "400": MensagemResposta, "404": MensagemResposta,
+                    "408": MensagemResposta, "409": UploadSessaoViewSchema, "422": MensagemResposta,
+                    "500": MensagemResposta})
+def enviar_parte_upload(path: UploadPathSchema):
+    """Envia uma parte de um upload, com os bytes no corpo e o cabeçalho Content-Range: bytes inicio-fim/total.
+
+    A parte deve começar no offset recebido. O cabeçalho opcional X-Parte-CRC32 traz o CRC32 da parte em
+    hexadecimal; uma parte incompleta ou com CRC32 divergente não é confirmada e pode ser reenviada. Uma parte
+    enviada enquanto outra do mesmo upload está sendo gravada recebe 409; uma parte que não chega em
+    UPLOAD_PRAZO_PARTE segundos é interrompida com 408.
+    """
+    return upload_controller.enviar_parte(path.upload_id, request.headers.get('Content-Range'), request.stream,
+                                          request.headers.get('X-Parte-CRC32'))
+
+@app.post('/uploads/<upload_id>/conclusao', tags=[upload_tag],
+          responses={"200": MensagemResposta, "404": MensagemResposta, "409": UploadSessaoViewSchema,
+                     "422": MensagemResposta, "500": MensagemResposta})
+def concluir_upload(path: UploadPathSchema, body: UploadConclusaoSchema):
+    """Conclui um upload em partes: confere o CRC32 (e o SHA-256, se informado) e grava o arquivo com o nome definitivo.
+
+    Retorna o nome do arquivo e a localização ou URL, como no upload de arquivo único.
+    """
+    return upload_controller.concluir(path.upload_id, body.crc32)
+
+@app.delete('/uploads/<upload_id>', tags=[upload_tag],
+            responses={"200": MensagemResposta, "404": MensagemResposta, "409": MensagemResposta, "500": MensagemResposta})
+def cancelar_upload(path: UploadPathSchema):
+    """Cancela um upload em partes e remove o arquivo parcial.
+    """
+    return upload_controller.cancelar(path.upload_id)
+
 @app.post('/user/create', tags=[usuario_tag],
           responses={"201": UserViewSchema, "400": MensagemResposta, "422": MensagemResposta})
 def create_user(body: UserSchema):
@@ -381,13 +683,13 @@ def obter_user_por_id(query: UserBuscaSchema):
 
 
 @app.get('/users', tags=[usuario_tag],
-         responses={"200": UsersListagemSchema, "404": MensagemResposta, "422": MensagemResposta})
-def obter_users():
-    """Obtém todos os usuários do banco de dados.
+         responses={"200": UsersListagemSchema, "400": MensagemResposta, "404": MensagemResposta, "422": MensagemResposta})
+def obter_users(query: PaginacaoSchema):
+    """Obtém os usuários do banco de dados paginados por cursor.
 
-    Retorna uma lista de usuários.
+    Retorna uma página de usuários. Ordenações: id, username e name.
     """
-    return users_controller.obter_users()
+    return users_controller.obter_users(query.limit, query.cursor, query.sort, query.fields, query.include)
 
 @app.post('/peca-processual', tags=[peca_tag],
           responses={"200": PecaProcessualViewSchema, "400": MensagemResposta, "409": MensagemResposta, "422": MensagemResposta})
@@ -422,11 +724,15 @@ def obter_peca_processual_por_id(query: PecaProcessualBuscaSchema):
     return pecas_processuais_controller.obter_peca(query.peca_id)
 
 @app.get('/pecas-processuais', tags=[peca_tag],
-         responses={"200": PecaProcessualListagemSchema, "404": MensagemResposta})
-def obter_todas_pecas_processuais():
-    """Obtém todas as Peças Processuais.
+         responses={"200": PecaProcessualListagemSchema, "400": MensagemResposta, "404": MensagemResposta})
+def obter_todas_pecas_processuais(query: PaginacaoSchema):
+    """Obtém as Peças Processuais paginadas por cursor.
+
+    Ordenações: id, nome_peca e categoria.
     """
-    return pecas_processuais_controller.obter_pecas()
+    if quer_ndjson(query):
+        return pecas_processuais_controller.stream_pecas(query.sort, query.fields, query.include)
+    return pecas_processuais_controller.obter_pecas(query.limit, query.cursor, query.sort, query.fields, query.include)
 
 
 @app.post('/peca/upload', tags=[peca_tag],
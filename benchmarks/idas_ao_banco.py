@@ -0,0 +1,124 @@
+"""
+Conta as instruções enviadas ao banco por criar_cliente e create_user, antes e depois da inserção com
+ON CONFLICT DO NOTHING RETURNING
+
+As versões "antes" reproduzem o fluxo anterior (SELECT de verificação, INSERT pelo ORM e a releitura da
+instância expirada ao apresentá-la depois do commit); as versões "depois" chamam os controllers atuais.
+Cada instrução é contada por um listener before_cursor_execute na engine; BEGIN e COMMIT não passam pelo
+cursor e ficam de fora. Os registros criados são removidos no fim.
+
+Uso, na raiz do projeto e com o banco do .env acessível:
+    python -m benchmarks.idas_ao_banco [--repeticoes 20]
+"""
+import argparse
+import uuid
+from sqlalchemy import event
+from models import Session, engine
+from models.clientes import Cliente
+from models.users import User
+from controllers.clientes import ClientesController
+from controllers.users import UserController
+
+
+class ContadorInstrucoes:
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.total += 1
+
+    def medir(self, funcao, *args):
+        inicio = self.total
+        resposta, status = funcao(*args)
+        return self.total - inicio, resposta, status
+
+
+def criar_cliente_antes(nome_cliente: str, cpf_cliente: str):
+    session = Session()
+    try:
+        cliente_existente = session.query(Cliente).filter_by(cpf_cliente=cpf_cliente).first()
+        if cliente_existente:
+            return {'mensagem': 'Já existe um cliente cadastrado com o CPF informado'}, 409
+        novo_cliente = Cliente(nome_cliente=nome_cliente, cpf_cliente=cpf_cliente)
+        session.add(novo_cliente)
+        session.commit()
+        return ClientesController.apresenta_cliente(novo_cliente), 200
+    finally:
+        session.close()
+
+
+def create_user_antes(username: str, password: str, name: str):
+    session = Session()
+    try:
+        user = User(username=username, name=name)
+        existing_user = session.query(User).filter(User.username == username).first()
+        if existing_user and existing_user.id != user.id:
+            return {'mensagem': 'Nome de usuário já está em uso'}, 409
+        user.set_password(password)
+        session.add(user)
+        session.commit()
+        return UserController.apresenta_usuario(user), 201
+    finally:
+        session.close()
+
+
+def criar_cliente_depois(nome_cliente: str, cpf_cliente: str):
+    return ClientesController().criar_cliente(Cliente(nome_cliente, cpf_cliente))
+
+
+def create_user_depois(username: str, password: str, name: str):
+    return UserController().create_user(username, password, name)
+
+
+def remove_criados(criados):
+    """Remove apenas os registros que o próprio script criou, pelos ids devolvidos nas criações."""
+    session = Session()
+    try:
+        for modelo in (Cliente, User):
+            ids = [registro_id for tipo, registro_id in criados if tipo is modelo]
+            if ids:
+                session.query(modelo).filter(modelo.id.in_(ids)).delete(synchronize_session=False)
+        session.commit()
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeticoes', type=int, default=20)
+    repeticoes = parser.parse_args().repeticoes
+
+    contador = ContadorInstrucoes()
+    event.listen(engine, 'before_cursor_execute', contador)
+    cenarios = [
+        ('criar_cliente', Cliente, criar_cliente_antes, criar_cliente_depois,
+         lambda chave: (f'Cliente {chave}', str(chave)[-11:].zfill(11))),
+        ('create_user', User, create_user_antes, create_user_depois,
+         lambda chave: (f'usuario_{chave:x}', 'senha', 'Usuário')),
+    ]
+    criados = []
+    try:
+        print(f'{"operação":<15} {"versão":<7} {"criação":>8} {"conflito":>9}')
+        for nome, modelo, antes, depois, argumentos_de in cenarios:
+            for versao, funcao in (('antes', antes), ('depois', depois)):
+                criacoes, conflitos, medidas = 0, 0, 0
+                for _ in range(repeticoes):
+                    argumentos = argumentos_de(uuid.uuid4().int)
+                    instrucoes, resposta, status = contador.medir(funcao, *argumentos)
+                    if status not in (200, 201):
+                        # chave já existente no banco; a repetição é descartada
+                        continue
+                    criados.append((modelo, resposta['id']))
+                    criacoes += instrucoes
+                    # a mesma chave outra vez cai no conflito
+                    conflitos += contador.medir(funcao, *argumentos)[0]
+                    medidas += 1
+                if medidas:
+                    print(f'{nome:<15} {versao:<7} {criacoes / medidas:>8.1f} {conflitos / medidas:>9.1f}')
+    finally:
+        event.remove(engine, 'before_cursor_execute', contador)
+        remove_criados(criados)
+
+
+if __name__ == '__main__':
+    main()
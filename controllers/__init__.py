@@ -2,4 +2,6 @@ from controllers.clientes import ClientesController
 from controllers.consultas_juridicas import ConsultaJuridicaController
 from controllers.users import UserController
 from controllers.documentos import DocumentoController
-from controllers.peca_processual import PecaProcessualController
\ No newline at end of file
+from controllers.peca_processual import PecaProcessualController
+from controllers.busca import BuscaController
+from controllers.uploads import UploadController
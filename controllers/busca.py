@@ -0,0 +1,159 @@
+import re
+from sqlalchemy import select, literal, cast, func, union_all, Integer, String
+from models import Session
+from models.busca import CONFIGURACAO_BUSCA
+from models.clientes import Cliente
+from models.consultas_juridicas import ConsultaJuridica
+from models.documentos import Documento
+from models.peca_processual import PecaProcessual
+from models.conteudo import ConteudoArquivo, chave_arquivo
+from models.cpf import normaliza_cpf
+from models.paginacao import paginar
+from models.coalescencia import coalescer
+from typing import Union
+
+# ts_rank_cd com normalização 32 fica entre 0 e 1; a relevância é guardada em milionésimos para que
+# o cursor carregue um inteiro exato, e não um real arredondado
+ESCALA_RELEVANCIA = 1000000
+# trechos curtos ao redor dos termos encontrados, com até dois fragmentos por arquivo
+OPCOES_TRECHO = 'MaxFragments=2, MaxWords=30, MinWords=10'
+_CPF_PONTUADO = re.compile(r'^\s*\d{3}\.?\d{3}\.?\d{3}-?\d{2}\s*$')
+
+
+class BuscaController:
+
+    @staticmethod
+    def fontes(consulta_ts):
+        """
+        Seleções de cada tabela coberta pela busca, no formato comum (tipo, id, titulo, descricao, relevancia)
+
+        Cada seleção filtra pela coluna gerada busca com @@, o que usa o índice GIN da tabela.
+        """
+        def relevancia(entidade):
+            return cast(func.ts_rank_cd(entidade.busca, consulta_ts, 32) * ESCALA_RELEVANCIA, Integer).label('relevancia')
+
+        return [
+            select(literal('cliente', String).label('tipo'), Cliente.id.label('id'),
+                   Cliente.nome_cliente.label('titulo'), Cliente.cpf_cliente.label('descricao'),
+                   relevancia(Cliente)).where(Cliente.busca.op('@@')(consulta_ts)),
+            select(literal('consulta', String).label('tipo'), ConsultaJuridica.id.label('id'),
+                   ConsultaJuridica.nome_cliente.label('titulo'), ConsultaJuridica.detalhes_consulta.label('descricao'),
+                   relevancia(ConsultaJuridica)).where(ConsultaJuridica.busca.op('@@')(consulta_ts)),
+            select(literal('documento', String).label('tipo'), Documento.id.label('id'),
+                   Documento.documento_nome.label('titulo'), literal(None, String).label('descricao'),
+                   relevancia(Documento)).where(Documento.busca.op('@@')(consulta_ts)),
+            select(literal('peca_processual', String).label('tipo'), PecaProcessual.id.label('id'),
+                   PecaProcessual.nome_peca.label('titulo'), PecaProcessual.categoria.label('descricao'),
+                   relevancia(PecaProcessual)).where(PecaProcessual.busca.op('@@')(consulta_ts)),
+        ]
+
+    @coalescer
+    def buscar(self, q: str, limit: Union[int, None] = None, cursor: Union[str, None] = None):
+        """
+        Busca textual em clientes, consultas, documentos e peças processuais
+
+        Os termos seguem a sintaxe de websearch_to_tsquery (aspas para frases, '-' para excluir, 'or'),
+        em português e sem diferenciar acentos. Um CPF com pontuação é reconhecido pelos dígitos.
+        Os resultados são ordenados pela relevância, do mais para o menos relevante, e paginados por cursor.
+        """
+        if not q or not q.strip():
+            return {'mensagem': 'É obrigatório informar o texto da busca'}, 400
+        # o vetor guarda o CPF só com dígitos; com pontuação o parser o quebraria em vários lexemas
+        texto = (normaliza_cpf(q) if _CPF_PONTUADO.match(q) else None) or q
+
+        session = Session()
+        try:
+            consulta_ts = func.websearch_to_tsquery(CONFIGURACAO_BUSCA, texto)
+            resultados = union_all(*self.fontes(consulta_ts)).subquery('resultados')
+            ordenacoes = {'relevancia': (resultados.c.relevancia, resultados.c.tipo, resultados.c.id)}
+            try:
+                linhas, proximo_cursor = paginar(session.query(resultados), ordenacoes, '-relevancia',
+                                                 cursor=cursor, limit=limit)
+            except ValueError as e:
+                return {'mensagem': str(e)}, 400
+
+            if not linhas:
+                return {'mensagem': 'Nenhum resultado encontrado'}, 404
+
+            return {'resultados': [self.apresenta_resultado(linha) for linha in linhas], 'next_cursor': proximo_cursor}, 200
+        except Exception as e:
+            session.rollback()
+            return {'mensagem': 'Erro:' + str(e)}, 422
+
+    @staticmethod
+    def fontes_conteudo(consulta_ts):
+        """
+        Seleções de documentos e peças processuais cujo arquivo tem texto extraído que atende à busca
+
+        O filtro usa o índice GIN de conteudo_arquivo e a junção usa o índice da chave do arquivo de cada tabela.
+        """
+        relevancia = cast(func.ts_rank_cd(ConteudoArquivo.busca, consulta_ts, 32) * ESCALA_RELEVANCIA, Integer).label('relevancia')
+        return [
+            select(literal('documento', String).label('tipo'), Documento.id.label('id'),
+                   Documento.documento_nome.label('nome'), ConteudoArquivo.localizacao.label('localizacao'),
+                   ConteudoArquivo.paginas.label('paginas'), relevancia)
+            .join_from(ConteudoArquivo, Documento, ConteudoArquivo.localizacao == chave_arquivo(Documento))
+            .where(ConteudoArquivo.busca.op('@@')(consulta_ts)),
+            select(literal('peca_processual', String).label('tipo'), PecaProcessual.id.label('id'),
+                   PecaProcessual.nome_peca.label('nome'), ConteudoArquivo.localizacao.label('localizacao'),
+                   ConteudoArquivo.paginas.label('paginas'), relevancia)
+            .join_from(ConteudoArquivo, PecaProcessual, ConteudoArquivo.localizacao == chave_arquivo(PecaProcessual))
+            .where(ConteudoArquivo.busca.op('@@')(consulta_ts)),
+        ]
+
+    @coalescer
+    def buscar_conteudo(self, q: str, limit: Union[int, None] = None, cursor: Union[str, None] = None):
+        """
+        Busca no texto extraído dos arquivos de documentos e peças processuais
+
+        Cada resultado traz trechos do arquivo com os termos encontrados. Os trechos são gerados em uma segunda
+        consulta, apenas para os arquivos da página, já que ts_headline relê o texto completo de cada arquivo.
+        """
+        if not q or not q.strip():
+            return {'mensagem': 'É obrigatório informar o texto da busca'}, 400
+
+        session = Session()
+        try:
+            consulta_ts = func.websearch_to_tsquery(CONFIGURACAO_BUSCA, q)
+            resultados = union_all(*self.fontes_conteudo(consulta_ts)).subquery('resultados')
+            ordenacoes = {'relevancia': (resultados.c.relevancia, resultados.c.tipo, resultados.c.id)}
+            try:
+                linhas, proximo_cursor = paginar(session.query(resultados), ordenacoes, '-relevancia',
+                                                 cursor=cursor, limit=limit)
+            except ValueError as e:
+                return {'mensagem': str(e)}, 400
+
+            if not linhas:
+                return {'mensagem': 'Nenhum documento encontrado'}, 404
+
+            trechos = dict(session.query(
+                ConteudoArquivo.localizacao,
+                func.ts_headline(CONFIGURACAO_BUSCA, ConteudoArquivo.texto, consulta_ts, OPCOES_TRECHO)
+            ).filter(ConteudoArquivo.localizacao.in_({linha.localizacao for linha in linhas})))
+
+            return {'documentos': [self.apresenta_conteudo(linha, trechos.get(linha.localizacao)) for linha in linhas],
+                    'next_cursor': proximo_cursor}, 200
+        except Exception as e:
+            session.rollback()
+            return {'mensagem': 'Erro:' + str(e)}, 422
+
+    @staticmethod
+    def apresenta_conteudo(linha, trecho: Union[str, None]):
+        return {
+            'tipo': linha.tipo,
+            'id': linha.id,
+            'nome': linha.nome,
+            'paginas': linha.paginas,
+            'trecho': trecho,
+            'relevancia': linha.relevancia / ESCALA_RELEVANCIA
+        }
+
+    @staticmethod
+    def apresenta_resultado(linha):
+        return {
+            'tipo': linha.tipo,
+            'id': linha.id,
+            'titulo': linha.titulo,
+            'descricao': linha.descricao,
+            'relevancia': linha.relevancia / ESCALA_RELEVANCIA
+        }
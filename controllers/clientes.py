@@ -1,13 +1,91 @@
 from flask import jsonify, request
-from datetime import datetime
+import codecs
+import csv
+import io
+from datetime import datetime, timedelta
 from models.clientes import Cliente
-from models.consultas_juridicas import ConsultaJuridica
 from models import Session
-from models.fuso_horario import saopaulo_tz, now_saopaulo
+from models.fuso_horario import saopaulo_tz, now_saopaulo, meia_noite_saopaulo
+from models.cpf import normaliza_cpf
+from models.paginacao import paginar, ordenar
+from models.campos import selecao_de_campos, formata_data, formata_data_hora
+from models.ndjson import resposta_ndjson
+from models.cache import cache_agenda_hoje, cache_clientes, ClienteRegistro
+from models.remocao_arquivos import fila_remocao_arquivos, arquivos_do_documento
+from models.conteudo import remove_conteudo, localizacao_do_arquivo
+from models.sugestoes import indice_nomes, LIMITE_SUGESTOES, LIMITE_MAXIMO_SUGESTOES
+from models.coalescencia import coalescer
+from controllers.consultas_juridicas import ConsultaJuridicaController
+from controllers.documentos import DocumentoController
 from typing import List, Union
-from sqlalchemy import func
+from sqlalchemy import text, cast, literal, DateTime
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import selectinload
+
+TAMANHO_LOTE_IMPORTACAO = 5000
+MAXIMO_REJEICOES_RELATADAS = 1000
+
+# Mescla a tabela de preparação em cliente numa única instrução. O primeiro registro de cada CPF no arquivo
+# é o candidato; a instrução devolve a quantidade de clientes inseridos e até :limite linhas rejeitadas
+# (duplicadas no arquivo ou com CPF já cadastrado), sempre em pelo menos uma linha de resultado.
+MESCLA_IMPORTACAO = text("""
+WITH candidatos AS (
+    SELECT DISTINCT ON (cpf_cliente) linha, nome_cliente, cpf_cliente
+      FROM cliente_importacao
+     ORDER BY cpf_cliente, linha
+), inseridos AS (
+    INSERT INTO cliente (nome_cliente, cpf_cliente, data_cadastro, num_consultas, num_documentos)
+    SELECT nome_cliente, cpf_cliente, :agora, 0, 0 FROM candidatos ORDER BY linha
+    ON CONFLICT (cpf_cliente) DO NOTHING
+    RETURNING cpf_cliente
+)
+SELECT (SELECT count(*) FROM inseridos) AS importados, r.linha, r.cpf_cliente, r.motivo
+  FROM (SELECT 1) AS resumo
+  LEFT JOIN LATERAL (
+    SELECT i.linha, i.cpf_cliente,
+           CASE WHEN c.linha IS NULL THEN 'CPF repetido no arquivo'
+                ELSE 'Já existe um cliente cadastrado com o CPF informado' END AS motivo
+      FROM cliente_importacao i
+      LEFT JOIN candidatos c ON c.linha = i.linha
+     WHERE c.linha IS NULL
+        OR NOT EXISTS (SELECT 1 FROM inseridos n WHERE n.cpf_cliente = i.cpf_cliente)
+     ORDER BY i.linha
+     LIMIT :limite
+  ) AS r ON true
+""")
+
+# Exclui o cliente numa única instrução; suas consultas e seus documentos saem pelas chaves estrangeiras
+# ON DELETE CASCADE (documentos de outros clientes ligados às consultas excluídas ficam, desvinculados).
+# Todas as partes da instrução enxergam o mesmo snapshot, então a leitura dos documentos ainda vê as linhas
+# apagadas em cascata e devolve a localização dos arquivos a remover.
+EXCLUSAO_CLIENTE = text("""
+WITH excluido AS (
+    DELETE FROM cliente WHERE id = :cliente_id RETURNING id
+)
+SELECT e.id, d.documento_localizacao, d.documento_url
+  FROM excluido e
+  LEFT JOIN documento d ON d.cliente_id = e.id
+""")
 
 class ClientesController:
+    ORDENACOES = {
+        'id': (Cliente.id,),
+        'nome_cliente': (Cliente.nome_cliente, Cliente.id),
+        'data_cadastro': (Cliente.data_cadastro, Cliente.id),
+        'num_consultas': (Cliente.num_consultas, Cliente.id),
+        'num_documentos': (Cliente.num_documentos, Cliente.id)
+    }
+    CAMPOS = {
+        'id': (Cliente.id, None),
+        'nome_cliente': (Cliente.nome_cliente, None),
+        'cpf_cliente': (Cliente.cpf_cliente, None),
+        'data_cadastro': (Cliente.data_cadastro, formata_data_hora),
+        'data_atualizacao': (Cliente.data_atualizacao, formata_data_hora),
+        'num_consultas': (Cliente.num_consultas, None),
+        'num_documentos': (Cliente.num_documentos, None),
+        'ultima_consulta': (Cliente.ultima_consulta, formata_data)
+    }
+
     def criar_cliente(self, cliente: Cliente):
         session = Session()
         try:
@@ -20,22 +98,122 @@ class ClientesController:
 
             if len(cpf_cliente) > 11:
                     return {"mensagem": "Digite apenas números. O CPF deve ter no máximo 11 caracteres."}, 400
-            
-            cliente_existente = session.query(Cliente).filter_by(
-                cpf_cliente=cpf_cliente).first()
-            if cliente_existente:
-                return {'mensagem': 'Já existe um cliente cadastrado com o CPF informado'}, 409
 
-            novo_cliente = Cliente(
-                nome_cliente=nome_cliente, cpf_cliente=cpf_cliente)
-            session.add(novo_cliente)
+            # uma única ida ao banco: a restrição única do CPF decide o conflito, sem SELECT prévio
+            insercao = pg_insert(Cliente).values(
+                nome_cliente=nome_cliente, cpf_cliente=cpf_cliente, data_cadastro=now_saopaulo()
+            ).on_conflict_do_nothing(index_elements=[Cliente.cpf_cliente]).returning(
+                Cliente.id, Cliente.nome_cliente, Cliente.cpf_cliente, Cliente.data_cadastro, Cliente.data_atualizacao,
+                Cliente.num_consultas, Cliente.num_documentos, Cliente.ultima_consulta)
+            novo_cliente = session.execute(insercao).first()
+            if not novo_cliente:
+                session.rollback()
+                return {'mensagem': 'Já existe um cliente cadastrado com o CPF informado'}, 409
             session.commit()
+            cache_clientes.invalidar(novo_cliente.id)
+            indice_nomes.adicionar(novo_cliente.id, novo_cliente.nome_cliente)
 
-            return self.apresenta_cliente(novo_cliente), 200
+            return self.apresenta_cliente(ClienteRegistro(*novo_cliente)), 200
         except Exception as e:
             session.rollback()
             return {'mensagem': str(e)}, 422
 
+    def importar_clientes(self, arquivo):
+        """
+        Importa clientes de um CSV com as colunas nome_cliente e cpf_cliente
+
+        O arquivo é lido em lotes: cada lote é validado, tem os CPFs normalizados e é copiado com COPY para uma
+        tabela temporária. No fim, uma única instrução INSERT ... ON CONFLICT (cpf_cliente) mescla tudo em cliente.
+        Só um lote fica em memória por vez, e o relatório traz no máximo MAXIMO_REJEICOES_RELATADAS linhas.
+
+        Arguments:
+            arquivo: fluxo binário com o CSV em UTF-8
+        """
+        session = Session()
+        rejeicoes = []
+        total_rejeitados = 0
+        total_linhas = 0
+        preparados = 0
+
+        def rejeitar(linha, cpf, motivo):
+            nonlocal total_rejeitados
+            total_rejeitados += 1
+            if len(rejeicoes) < MAXIMO_REJEICOES_RELATADAS:
+                rejeicoes.append({'linha': linha, 'cpf_cliente': cpf, 'motivo': motivo})
+
+        try:
+            leitor = csv.reader(codecs.iterdecode(arquivo, 'utf-8-sig'))
+            cabecalho = [coluna.strip().lower() for coluna in next(leitor, [])]
+            if 'nome_cliente' not in cabecalho or 'cpf_cliente' not in cabecalho:
+                return {'mensagem': 'O CSV deve ter um cabeçalho com as colunas nome_cliente e cpf_cliente'}, 400
+            posicao_nome = cabecalho.index('nome_cliente')
+            posicao_cpf = cabecalho.index('cpf_cliente')
+
+            session.execute(text('CREATE TEMPORARY TABLE cliente_importacao '
+                                 '(linha INTEGER, nome_cliente VARCHAR(80), cpf_cliente VARCHAR(11)) ON COMMIT DROP'))
+            cursor = session.connection().connection.cursor()
+
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer, lineterminator='\n')
+            no_lote = 0
+            for registro in leitor:
+                linha = leitor.line_num
+                if not any(campo.strip() for campo in registro):
+                    continue
+                total_linhas += 1
+                if len(registro) <= max(posicao_nome, posicao_cpf):
+                    rejeitar(linha, None, 'Linha com colunas faltando')
+                    continue
+                nome = registro[posicao_nome].strip()
+                cpf = normaliza_cpf(registro[posicao_cpf])
+                if cpf is None:
+                    rejeitar(linha, registro[posicao_cpf].strip(), 'CPF inválido')
+                elif not nome:
+                    rejeitar(linha, cpf, 'Nome do cliente não informado')
+                elif len(nome) > 80:
+                    rejeitar(linha, cpf, 'O nome do cliente deve ter no máximo 80 caracteres')
+                else:
+                    escritor.writerow((linha, nome, cpf))
+                    no_lote += 1
+
+                if no_lote >= TAMANHO_LOTE_IMPORTACAO:
+                    buffer.seek(0)
+                    cursor.copy_expert('COPY cliente_importacao (linha, nome_cliente, cpf_cliente) FROM STDIN WITH (FORMAT csv)', buffer)
+                    preparados += no_lote
+                    buffer.seek(0)
+                    buffer.truncate()
+                    no_lote = 0
+            if no_lote:
+                buffer.seek(0)
+                cursor.copy_expert('COPY cliente_importacao (linha, nome_cliente, cpf_cliente) FROM STDIN WITH (FORMAT csv)', buffer)
+                preparados += no_lote
+
+            if preparados:
+                limite = MAXIMO_REJEICOES_RELATADAS - len(rejeicoes)
+                for importados, linha, cpf, motivo in session.execute(MESCLA_IMPORTACAO, {'agora': now_saopaulo(), 'limite': limite}):
+                    if linha is not None:
+                        rejeicoes.append({'linha': linha, 'cpf_cliente': cpf, 'motivo': motivo})
+                total_rejeitados += preparados - importados
+            session.commit()
+            if total_linhas > total_rejeitados:
+                # os ids importados não voltam da mescla; o índice de sugestões é recarregado por inteiro
+                indice_nomes.carregar_em_segundo_plano(Session.session_factory)
+        except (UnicodeDecodeError, csv.Error) as e:
+            session.rollback()
+            return {'mensagem': 'CSV inválido: o arquivo deve estar em UTF-8 e separado por vírgulas (' + str(e) + ')'}, 400
+        except Exception as e:
+            session.rollback()
+            return {'mensagem': 'Erro ao importar clientes: ' + str(e)}, 422
+
+        rejeicoes.sort(key=lambda rejeicao: rejeicao['linha'])
+        return {
+            'total_linhas': total_linhas,
+            'importados': total_linhas - total_rejeitados,
+            'rejeitados': total_rejeitados,
+            'rejeicoes': rejeicoes,
+            'rejeicoes_omitidas': total_rejeitados - len(rejeicoes)
+        }, 200
+
     def atualizar_cliente(self, cliente_id: int, nome_cliente: Union[str, None] = None, cpf_cliente: Union[str, None] = None):
         if not cliente_id:
             return {'mensagem': 'É obrigatório informar o id do cliente'}, 400
@@ -65,6 +243,8 @@ class ClientesController:
             cliente.data_atualizacao = now_saopaulo()
 
             session.commit()
+            cache_clientes.invalidar(cliente_id)
+            indice_nomes.adicionar(cliente.id, cliente.nome_cliente)
 
             return self.apresenta_cliente(cliente), 200
         except Exception as e:
@@ -76,16 +256,19 @@ class ClientesController:
             return {'mensagem': "É obrigatório informar o Id do cliente"}
         session = Session()
         try:
-            cliente = session.query(Cliente).get(cliente_id)
-            if not cliente:
+            linhas = session.execute(EXCLUSAO_CLIENTE, {'cliente_id': cliente_id}).all()
+            if not linhas:
+                session.rollback()
                 return {'mensagem': 'Cliente não encontrado'}, 404
-
-            consulta = session.query(ConsultaJuridica).filter_by(cliente_id=cliente_id).first()
-
-            session.delete(cliente)
-            if consulta:
-                session.delete(consulta)
+            remove_conteudo(session, (localizacao_do_arquivo(url, localizacao) for _, localizacao, url in linhas))
             session.commit()
+            cache_agenda_hoje.invalidar()
+            cache_clientes.invalidar(cliente_id)
+            indice_nomes.remover(cliente_id)
+
+            # os arquivos são removidos em segundo plano, fora do tempo de resposta
+            fila_remocao_arquivos.enfileirar(
+                arquivo for _, localizacao, url in linhas for arquivo in arquivos_do_documento(localizacao, url))
 
             return {'mesangem': 'Cliente excluído com sucesso'}, 200
         except Exception as e:
@@ -95,51 +278,201 @@ class ClientesController:
     def obter_cliente_por_id(self, cliente_id: int):
         if not cliente_id:
             return {'mensagem': 'É obrigatório informar o Id do cliente'}, 400
+        cliente = cache_clientes.obter_por_id(cliente_id)
+        if cliente:
+            return self.apresenta_cliente(cliente), 200
+
+        geracao = cache_clientes.geracao
         session = Session()
         try:
             cliente = session.query(Cliente).get(cliente_id)
             if not cliente:
                 return {'mensagem': 'Cliente não encontrado'}, 404
 
+            registro = self.registro_cliente(cliente)
+            cache_clientes.armazenar(registro, geracao)
+            return self.apresenta_cliente(registro), 200
+        except Exception as e:
+            session.rollback()
+            return {'mensagem': str(e)}, 422
+
+    def obter_cliente_por_cpf(self, cpf_cliente: str):
+        if not cpf_cliente:
+            return {'mensagem': 'É obrigatório informar o CPF do cliente'}, 400
+        cliente = cache_clientes.obter_por_cpf(cpf_cliente)
+        if cliente:
             return self.apresenta_cliente(cliente), 200
+
+        geracao = cache_clientes.geracao
+        session = Session()
+        try:
+            cliente = session.query(Cliente).filter(Cliente.cpf_cliente == cpf_cliente).first()
+            if not cliente:
+                return {'mensagem': 'Cliente não encontrado'}, 404
+
+            registro = self.registro_cliente(cliente)
+            cache_clientes.armazenar(registro, geracao)
+            return self.apresenta_cliente(registro), 200
+        except Exception as e:
+            session.rollback()
+            return {'mensagem': str(e)}, 422
+
+    def obter_sugestoes(self, q: str, limit: Union[int, None] = None):
+        """
+        Sugere clientes cujo nome tem palavras começando com cada termo de q, para autocompletar
+
+        As sugestões vêm do índice em memória do worker; enquanto ele carrega, a busca vai ao banco
+        pelo índice de trigramas do nome.
+        """
+        if not q or not q.strip():
+            return {'mensagem': 'É obrigatório informar o texto da busca'}, 400
+        limite = LIMITE_SUGESTOES if limit is None else limit
+        if limite < 1 or limite > LIMITE_MAXIMO_SUGESTOES:
+            return {'mensagem': f'O limite deve estar entre 1 e {LIMITE_MAXIMO_SUGESTOES}'}, 400
+
+        sugestoes = indice_nomes.sugerir(q, limite, Session.session_factory)
+        if sugestoes is not None:
+            return {'sugestoes': sugestoes, 'origem': 'memoria'}, 200
+
+        session = Session()
+        try:
+            query = session.query(Cliente.id, Cliente.nome_cliente)
+            for termo in q.split():
+                # % e _ digitados são procurados literalmente, não como curingas
+                termo = termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                query = query.filter(Cliente.nome_cliente.ilike(f'%{termo}%', escape='\\'))
+            linhas = query.order_by(Cliente.nome_cliente, Cliente.id).limit(limite).all()
+            return {'sugestoes': [{'id': cliente_id, 'nome_cliente': nome} for cliente_id, nome in linhas],
+                    'origem': 'banco'}, 200
         except Exception as e:
             session.rollback()
             return {'mensagem': str(e)}, 422
 
-    def obter_clientes(self, nome: Union[str, None] = None, cpf: Union[str, None] = None, data_cadastro: Union[str, None] = None, data_atualizacao: Union[str, None] = None):
+    def obter_dossie(self, cliente_id: int):
+        if not cliente_id:
+            return {'mensagem': 'É obrigatório informar o Id do cliente'}, 400
         session = Session()
         try:
-            query = session.query(Cliente)
+            # três consultas fixas: o cliente e um SELECT ... IN para cada relacionamento
+            cliente = session.query(Cliente).options(
+                selectinload(Cliente.consultas), selectinload(Cliente.documentos)
+            ).filter(Cliente.id == cliente_id).one_or_none()
+            if not cliente:
+                return {'mensagem': 'Cliente não encontrado'}, 404
 
-            if nome:
-                query = query.filter(Cliente.nome_cliente.ilike(f'%{nome}%'))
-            if cpf:
-                query = query.filter(Cliente.cpf_cliente == cpf)
-            if data_cadastro:
-                data_cadastro = datetime.strptime(data_cadastro, '%d/%m/%Y').date()
-                query = query.filter(func.date(Cliente.data_cadastro) == data_cadastro)
-            if data_atualizacao:
-                data_atualizacao = datetime.strptime(data_atualizacao, '%d/%m/%Y').date()
-                query = query.filter(func.date(Cliente.data_atualizacao) == data_atualizacao)
+            consultas = sorted(cliente.consultas, key=lambda c: (c.data_consulta, c.horario_consulta, c.id))
+            documentos = sorted(cliente.documentos, key=lambda d: d.id)
+
+            resultado = self.apresenta_cliente(cliente)
+            resultado.update(ConsultaJuridicaController.apresenta_consultas(consultas))
+            resultado.update(DocumentoController.apresenta_documentos(documentos))
+            return resultado, 200
+        except Exception as e:
+            session.rollback()
+            return {'mensagem': str(e)}, 422
 
-            clientes = query.all()
+    @coalescer
+    def obter_clientes(self, nome: Union[str, None] = None, cpf: Union[str, None] = None, data_cadastro: Union[str, None] = None, data_atualizacao: Union[str, None] = None,
+                       limit: Union[int, None] = None, cursor: Union[str, None] = None, sort: Union[str, None] = None,
+                       fields: Union[str, None] = None, include: Union[str, None] = None,
+                       data_cadastro_de: Union[str, None] = None, data_cadastro_ate: Union[str, None] = None,
+                       data_atualizacao_de: Union[str, None] = None, data_atualizacao_ate: Union[str, None] = None):
+        session = Session()
+        try:
+            try:
+                query, apresenta = selecao_de_campos(session, Cliente, self.apresenta_cliente, self.CAMPOS, {},
+                                                     self.ORDENACOES, fields, include)
+                query = self.filtra_clientes(query, nome, cpf, data_cadastro, data_atualizacao,
+                                             data_cadastro_de, data_cadastro_ate, data_atualizacao_de, data_atualizacao_ate)
+                clientes, proximo_cursor = paginar(query, self.ORDENACOES, 'id', sort, cursor, limit)
+            except ValueError as e:
+                return {'mensagem': str(e)}, 400
 
             if not clientes:
                 return {'mensagem': 'Nenhum cliente encontrado'}, 404
 
-            return self.apresenta_clientes(clientes), 200
+            return {'clientes': [apresenta(cliente) for cliente in clientes], 'next_cursor': proximo_cursor}, 200
         except Exception as e:
             session.rollback()
             return {'mensagem': 'Erro:' + str(e)}, 422
 
+    def stream_clientes(self, nome: Union[str, None] = None, cpf: Union[str, None] = None, data_cadastro: Union[str, None] = None, data_atualizacao: Union[str, None] = None,
+                        sort: Union[str, None] = None, fields: Union[str, None] = None, include: Union[str, None] = None,
+                        data_cadastro_de: Union[str, None] = None, data_cadastro_ate: Union[str, None] = None,
+                        data_atualizacao_de: Union[str, None] = None, data_atualizacao_ate: Union[str, None] = None):
+        session = Session()
+        try:
+            query, apresenta = selecao_de_campos(session, Cliente, self.apresenta_cliente, self.CAMPOS, {},
+                                                 self.ORDENACOES, fields, include)
+            query = self.filtra_clientes(query, nome, cpf, data_cadastro, data_atualizacao,
+                                         data_cadastro_de, data_cadastro_ate, data_atualizacao_de, data_atualizacao_ate)
+            query = ordenar(query, self.ORDENACOES, 'id', sort)
+        except ValueError as e:
+            return {'mensagem': str(e)}, 400
+
+        return resposta_ndjson(query, apresenta)
+
+    @staticmethod
+    def filtra_clientes(query, nome: Union[str, None] = None, cpf: Union[str, None] = None, data_cadastro: Union[str, None] = None, data_atualizacao: Union[str, None] = None,
+                        data_cadastro_de: Union[str, None] = None, data_cadastro_ate: Union[str, None] = None,
+                        data_atualizacao_de: Union[str, None] = None, data_atualizacao_ate: Union[str, None] = None):
+        """
+        Aplica os filtros da listagem de clientes
+
+        Os filtros de data aceitam um dia exato ou um intervalo de dias (dd/mm/aaaa), com as duas pontas inclusivas.
+
+        Raises:
+            ValueError: se alguma data estiver em formato inválido
+        """
+        if nome:
+            query = query.filter(Cliente.nome_cliente.ilike(f'%{nome}%'))
+        if cpf:
+            query = query.filter(Cliente.cpf_cliente == cpf)
+        query = ClientesController.filtra_periodo(query, Cliente.data_cadastro, data_cadastro, data_cadastro_de, data_cadastro_ate)
+        query = ClientesController.filtra_periodo(query, Cliente.data_atualizacao, data_atualizacao, data_atualizacao_de, data_atualizacao_ate)
+        return query
+
+    @staticmethod
+    def filtra_periodo(query, coluna, dia: Union[str, None] = None, de: Union[str, None] = None, ate: Union[str, None] = None):
+        """
+        Filtra uma coluna de data e hora por dias do calendário de São Paulo
+
+        As datas e horas dos clientes são gravadas sem fuso, convertidas para o TimeZone da sessão do banco; cada
+        dia vai da meia-noite de São Paulo até a meia-noite seguinte. Os limites, com fuso, são convertidos para
+        timestamp sem fuso pelo próprio banco, da mesma forma que as gravações, e o filtro é um intervalo
+        semiaberto sobre a própria coluna (coluna >= inicio AND coluna < fim), o que permite varrer o índice
+        B-tree em vez da tabela inteira.
+        """
+        try:
+            if dia:
+                de = ate = dia
+            inicio = meia_noite_saopaulo(datetime.strptime(de, '%d/%m/%Y').date()) if de else None
+            fim = meia_noite_saopaulo(datetime.strptime(ate, '%d/%m/%Y').date() + timedelta(days=1)) if ate else None
+        except ValueError:
+            raise ValueError('As datas devem estar no formato dd/mm/aaaa')
+        if inicio:
+            query = query.filter(coluna >= cast(literal(inicio, DateTime(timezone=True)), DateTime))
+        if fim:
+            query = query.filter(coluna < cast(literal(fim, DateTime(timezone=True)), DateTime))
+        return query
+
+    @staticmethod
+    def registro_cliente(cliente: Cliente) -> ClienteRegistro:
+        return ClienteRegistro(cliente.id, cliente.nome_cliente, cliente.cpf_cliente, cliente.data_cadastro,
+                               cliente.data_atualizacao, cliente.num_consultas, cliente.num_documentos,
+                               cliente.ultima_consulta)
+
     @staticmethod
-    def apresenta_cliente(cliente: Cliente):
+    def apresenta_cliente(cliente: Union[Cliente, ClienteRegistro]):
         return {
             'id': cliente.id,
             'nome_cliente': cliente.nome_cliente,
             'cpf_cliente': cliente.cpf_cliente,
             'data_cadastro': cliente.data_cadastro.astimezone(saopaulo_tz).strftime('%d/%m/%Y %H:%M:%S'),
-            'data_atualizacao': cliente.data_atualizacao.astimezone(saopaulo_tz).strftime('%d/%m/%Y %H:%M:%S') if cliente.data_atualizacao else None
+            'data_atualizacao': cliente.data_atualizacao.astimezone(saopaulo_tz).strftime('%d/%m/%Y %H:%M:%S') if cliente.data_atualizacao else None,
+            'num_consultas': cliente.num_consultas,
+            'num_documentos': cliente.num_documentos,
+            'ultima_consulta': cliente.ultima_consulta.strftime('%d/%m/%Y') if cliente.ultima_consulta else None
         }
 
     @staticmethod
@@ -151,6 +484,9 @@ class ClientesController:
                 'nome_cliente': cliente.nome_cliente,
                 'cpf_cliente': cliente.cpf_cliente,
                 'data_cadastro': cliente.data_cadastro.astimezone(saopaulo_tz).strftime('%d/%m/%Y %H:%M:%S'),
-                'data_atualizacao': cliente.data_atualizacao.astimezone(saopaulo_tz).strftime('%d/%m/%Y %H:%M:%S') if cliente.data_atualizacao else None
+                'data_atualizacao': cliente.data_atualizacao.astimezone(saopaulo_tz).strftime('%d/%m/%Y %H:%M:%S') if cliente.data_atualizacao else None,
+                'num_consultas': cliente.num_consultas,
+                'num_documentos': cliente.num_documentos,
+                'ultima_consulta': cliente.ultima_consulta.strftime('%d/%m/%Y') if cliente.ultima_consulta else None
             })
         return {"clientes": result}
@@ -1,44 +1,208 @@
+from sqlalchemy import select, literal, exists, tuple_, union_all, String, Date, Time
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime
-from models.consultas_juridicas import ConsultaJuridica 
+from models.consultas_juridicas import ConsultaJuridica, PERIODO_MANHA, PERIODO_TARDE
+from models.agenda_resumo import AgendaResumo
 from models.clientes import Cliente 
 from models import Session
 from models.fuso_horario import now_saopaulo
+from models.paginacao import paginar, ordenar, sem_nulos
+from models.campos import selecao_de_campos, formata_data, formata_horario
+from models.ndjson import resposta_ndjson
+from models.agenda import agrupa_ocupados, horarios_livres
+from models.cache import cache_agenda_hoje, cache_clientes
+from models.coalescencia import coalescer
+from models.sugestoes import indice_nomes
 from typing import Union, List
 
+MENSAGEM_CONFLITO_PERIODO = 'Já existe uma consulta agendada para este CPF neste período'
+MENSAGENS_CONFLITO = {
+    'consulta_unico': 'Já existe uma consulta agendada para este CPF nesta data',
+    # bases que ainda não passaram por flask consultas-duplicadas
+    'consulta_periodo_unico': MENSAGEM_CONFLITO_PERIODO,
+    'cliente_cpf_cliente_key': 'Já existe um cliente cadastrado com o CPF informado'
+}
+
+TAMANHO_MAXIMO_LOTE = 1000
+DIAS_MAXIMOS_DISPONIBILIDADE = 366
+DIAS_MAXIMOS_RESUMO = 731
+
 class ConsultaJuridicaController:
+    ORDENACOES = {
+        'id': (ConsultaJuridica.id,),
+        'data_consulta': (sem_nulos(ConsultaJuridica.data_consulta), sem_nulos(ConsultaJuridica.horario_consulta),
+                          ConsultaJuridica.id),
+        'nome_cliente': (sem_nulos(ConsultaJuridica.nome_cliente), ConsultaJuridica.id)
+    }
+    CAMPOS = {
+        'id': (ConsultaJuridica.id, None),
+        'nome_cliente': (ConsultaJuridica.nome_cliente, None),
+        'cpf_cliente': (ConsultaJuridica.cpf_cliente, None),
+        'data_consulta': (ConsultaJuridica.data_consulta, formata_data),
+        'horario_consulta': (ConsultaJuridica.horario_consulta, formata_horario),
+        'detalhes_consulta': (ConsultaJuridica.detalhes_consulta, None)
+    }
+    INCLUSOES = {
+        'cliente': (Cliente, ConsultaJuridica.cliente_id == Cliente.id, {
+            'id': (Cliente.id, None),
+            'nome_cliente': (Cliente.nome_cliente, None),
+            'cpf_cliente': (Cliente.cpf_cliente, None)
+        })
+    }
 
     def criar_consulta(self, consulta: ConsultaJuridica):
-        session = Session()
-        
         if not consulta:
             return {'mensagem': 'Parâmetros obrigatórios não informados'}, 400
+        session = Session()
         try:
-            if consulta.cpf_cliente and consulta.data_consulta and consulta.horario_consulta:
-                if not consulta.valida_consulta_periodo(consulta.cpf_cliente, consulta.data_consulta, consulta.horario_consulta):
-                    return {'mensagem': 'Já existe uma consulta agendada para este CPF neste período'}, 409                
-            if consulta.cpf_cliente and consulta.data_consulta:
-                if not consulta.valida_consulta_dia(consulta.cpf_cliente, consulta.data_consulta):
-                    return {'mensagem': 'Já existe uma consulta agendada para este CPF nesta data'}, 409
-            
-            cliente = session.query(Cliente).filter_by(cpf_cliente=consulta.cpf_cliente).first()
-            if not cliente:
-                cliente = Cliente(consulta.nome_cliente, consulta.cpf_cliente)
-                session.add(cliente)
-                session.commit()
+            # Uma única instrução: o cliente é criado pelo CPF, ou o existente é lido sem ser regravado,
+            # e a consulta é inserida em seguida. Conflitos de agenda são detectados pelas restrições da tabela.
+            novo_cliente = pg_insert(Cliente).values(nome_cliente=consulta.nome_cliente,
+                                                     cpf_cliente=consulta.cpf_cliente,
+                                                     data_cadastro=now_saopaulo())
+            novo_cliente = novo_cliente.on_conflict_do_nothing(
+                index_elements=[Cliente.cpf_cliente]
+            ).returning(Cliente.id).cte('cliente_novo')
+            cliente = union_all(
+                select(novo_cliente.c.id),
+                select(Cliente.id).where(Cliente.cpf_cliente == consulta.cpf_cliente)
+            ).limit(1).subquery('cliente')
 
-            consulta.cliente_id = cliente.id
-            session.add(consulta)
+            nova_consulta = pg_insert(ConsultaJuridica).from_select(
+                ['nome_cliente', 'cpf_cliente', 'data_consulta', 'horario_consulta', 'detalhes_consulta', 'cliente_id'],
+                select(literal(consulta.nome_cliente, String),
+                       literal(consulta.cpf_cliente, String),
+                       literal(consulta.data_consulta, Date),
+                       literal(consulta.horario_consulta, Time),
+                       literal(consulta.detalhes_consulta, String),
+                       cliente.c.id)
+            ).returning(ConsultaJuridica.id, ConsultaJuridica.cliente_id).cte('consulta_nova')
+            # cliente_criado indica se o cliente nasceu nesta instrução, para entrar no índice de sugestões
+            insercao = select(nova_consulta.c.id, nova_consulta.c.cliente_id,
+                              exists(select(novo_cliente.c.id)).label('cliente_criado'))
+
+            inserida = session.execute(insercao).one_or_none()
+            if inserida is None:
+                # o cliente foi criado por outra transação depois do início da instrução: o INSERT não o
+                # gravou e a leitura não o enxerga; uma nova instrução já o encontra
+                inserida = session.execute(insercao).one()
+            consulta.id, consulta.cliente_id, cliente_criado = inserida
             session.commit()
-            
+            cache_agenda_hoje.invalidar(consulta.data_consulta)
+            cache_clientes.invalidar(consulta.cliente_id)
+            if cliente_criado:
+                indice_nomes.adicionar(consulta.cliente_id, consulta.nome_cliente)
+
             return self.apresenta_consulta(consulta), 200
-        
+
+        except IntegrityError as e:
+            session.rollback()
+            return self.mensagem_conflito(session, e, consulta.cpf_cliente, consulta.data_consulta,
+                                          consulta.horario_consulta)
+
         except Exception as e:
+            session.rollback()
             return {'mensagem': str(e)}, 400
 
         finally:
             session.close()  
 
+    def criar_consultas_em_lote(self, itens: List):
+        if not itens:
+            return {'mensagem': 'Nenhuma consulta informada'}, 400
+        if len(itens) > TAMANHO_MAXIMO_LOTE:
+            return {'mensagem': f'O lote deve ter no máximo {TAMANHO_MAXIMO_LOTE} consultas'}, 400
+
+        resultados = [None] * len(itens)
+        pendentes = {}
+
+        # validação em memória, incluindo conflitos entre itens do próprio lote
+        for indice, item in enumerate(itens):
+            if not all([item.nome_cliente, item.cpf_cliente, item.data_consulta, item.horario_consulta]):
+                resultados[indice] = {'indice': indice, 'status': 400, 'mensagem': 'Faltam parâmetros para realizar o cadastro'}
+                continue
+            if len(item.cpf_cliente) > 11:
+                resultados[indice] = {'indice': indice, 'status': 400, 'mensagem': 'Digite apenas números. O CPF deve ter no máximo 11 caracteres.'}
+                continue
+            try:
+                consulta = ConsultaJuridica(item.nome_cliente, item.cpf_cliente, item.data_consulta,
+                                            item.horario_consulta, item.detalhes_consulta)
+            except ValueError:
+                resultados[indice] = {'indice': indice, 'status': 400, 'mensagem': 'Dados informados inválidos ou com erro'}
+                continue
+
+            chave = (consulta.cpf_cliente, consulta.data_consulta)
+            if chave in pendentes:
+                _, anterior = pendentes[chave]
+                resultados[indice] = self.resultado_conflito(indice, anterior.horario_consulta, consulta.horario_consulta)
+                continue
+            pendentes[chave] = (indice, consulta)
+
+        session = Session()
+        try:
+            if pendentes:
+                # uma única consulta para todos os conflitos com a agenda já gravada
+                existentes = session.query(ConsultaJuridica.cpf_cliente,
+                                           ConsultaJuridica.data_consulta,
+                                           ConsultaJuridica.horario_consulta).filter(
+                    tuple_(ConsultaJuridica.cpf_cliente, ConsultaJuridica.data_consulta).in_(list(pendentes))).all()
+                for existente in existentes:
+                    indice, consulta = pendentes.pop((existente.cpf_cliente, existente.data_consulta))
+                    resultados[indice] = self.resultado_conflito(indice, existente.horario_consulta, consulta.horario_consulta)
+
+            if pendentes:
+                clientes = {}
+                for _, consulta in pendentes.values():
+                    clientes.setdefault(consulta.cpf_cliente, consulta.nome_cliente)
+                agora = now_saopaulo()
+                novos_clientes = pg_insert(Cliente).values([
+                    {'nome_cliente': nome, 'cpf_cliente': cpf, 'data_cadastro': agora} for cpf, nome in clientes.items()
+                ]).on_conflict_do_nothing(index_elements=[Cliente.cpf_cliente]).returning(Cliente.id, Cliente.cpf_cliente)
+                ids_clientes = {cpf: cliente_id for cliente_id, cpf in session.execute(novos_clientes)}
+                criados = dict(ids_clientes)
+                # clientes já cadastrados são apenas lidos, sem gerar novas versões das linhas
+                existentes = [cpf for cpf in clientes if cpf not in ids_clientes]
+                if existentes:
+                    ids_clientes.update(session.query(Cliente.cpf_cliente, Cliente.id).filter(
+                        Cliente.cpf_cliente.in_(existentes)))
+
+                for _, consulta in pendentes.values():
+                    consulta.cliente_id = ids_clientes[consulta.cpf_cliente]
+
+                # inserção multi-linha; linhas que colidirem com agendamentos concorrentes são ignoradas
+                insercao = pg_insert(ConsultaJuridica).values([{
+                    'nome_cliente': consulta.nome_cliente,
+                    'cpf_cliente': consulta.cpf_cliente,
+                    'data_consulta': consulta.data_consulta,
+                    'horario_consulta': consulta.horario_consulta,
+                    'detalhes_consulta': consulta.detalhes_consulta,
+                    'cliente_id': consulta.cliente_id
+                } for _, consulta in pendentes.values()]).on_conflict_do_nothing().returning(
+                    ConsultaJuridica.id, ConsultaJuridica.cpf_cliente, ConsultaJuridica.data_consulta)
+                inseridas = {(cpf, data): consulta_id for consulta_id, cpf, data in session.execute(insercao)}
+                session.commit()
+                cache_agenda_hoje.invalidar(*{data for _, data in inseridas})
+                cache_clientes.invalidar(*ids_clientes.values())
+                for cpf, cliente_id in criados.items():
+                    indice_nomes.adicionar(cliente_id, clientes[cpf])
+
+                for chave, (indice, consulta) in pendentes.items():
+                    if chave in inseridas:
+                        consulta.id = inseridas[chave]
+                        resultados[indice] = {'indice': indice, 'status': 200, 'consulta': self.apresenta_consulta(consulta)}
+                    else:
+                        resultados[indice] = {'indice': indice, 'status': 409, 'mensagem': MENSAGENS_CONFLITO['consulta_unico']}
+
+            return {'resultados': resultados}, 200
+
+        except Exception as e:
+            session.rollback()
+            return {'mensagem': str(e)}, 400
+
+        finally:
+            session.close()
+
     def atualizar_consulta(self, 
                            consulta_id: int, 
                            nome_cliente: Union[str, None] = None, 
@@ -53,14 +217,8 @@ class ConsultaJuridicaController:
         consulta = session.query(ConsultaJuridica).get(consulta_id)
         if not consulta:
             return {'mensagem': 'Consulta Jurídica não encontrada'}, 404
+        data_anterior = consulta.data_consulta
         try:
-            if cpf_cliente and data_consulta and horario_consulta:
-                if not consulta.valida_consulta_periodo(cpf_cliente, data_consulta, horario_consulta):
-                    return {'mensagem': 'Já existe uma consulta agendada para este CPF neste período'}, 409                
-            if cpf_cliente and data_consulta:
-                if not consulta.valida_consulta_dia(cpf_cliente, data_consulta):
-                    return {'mensagem': 'Já existe uma consulta agendada para este CPF nesta data'}, 409
-
             if nome_cliente: 
                 consulta.nome_cliente = nome_cliente
             if cpf_cliente: 
@@ -79,6 +237,9 @@ class ConsultaJuridicaController:
                     consulta.horario_consulta = horario_consulta
             if detalhes_consulta: 
                 consulta.detalhes_consulta = detalhes_consulta
+            # valores enviados, usados na mensagem de um eventual conflito depois do rollback; a consulta do
+            # cliente abaixo já pode gravar a consulta por autoflush
+            agendamento = (consulta.cpf_cliente, consulta.data_consulta, consulta.horario_consulta)
 
             cliente = session.query(Cliente).filter(Cliente.id == consulta.cliente_id).first()
 
@@ -92,8 +253,14 @@ class ConsultaJuridicaController:
             session.add(cliente)
             session.add(consulta)
             session.commit()
+            cache_agenda_hoje.invalidar(data_anterior, consulta.data_consulta)
+            cache_clientes.invalidar(cliente.id)
+            indice_nomes.adicionar(cliente.id, cliente.nome_cliente)
 
             return self.apresenta_consulta(consulta), 200
+        except IntegrityError as e:
+            session.rollback()
+            return self.mensagem_conflito(session, e, *agendamento, ignorar_id=consulta_id)
         except ValueError as e:
             return {'mensagem': str(e)}, 422
         finally:
@@ -107,8 +274,12 @@ class ConsultaJuridicaController:
             consulta_juridica = session.query(ConsultaJuridica).get(consulta_id)
             if not consulta_juridica:
                 return {'mensagem': 'Consulta Jurídica não encontrada'}, 404
+            data_consulta = consulta_juridica.data_consulta
+            cliente_id = consulta_juridica.cliente_id
             session.delete(consulta_juridica)
             session.commit()
+            cache_agenda_hoje.invalidar(data_consulta)
+            cache_clientes.invalidar(cliente_id)
             return {'mensagem': 'Consulta Jurídica excluída'}, 200
         except Exception as e:
             session.rollback()
@@ -119,36 +290,80 @@ class ConsultaJuridicaController:
     def obter_consultas(self, 
                         data: Union[str, None] = None, 
                         nome: Union[str, None] = None, 
-                        cpf: Union[str, None] = None):
+                        cpf: Union[str, None] = None,
+                        limit: Union[int, None] = None,
+                        cursor: Union[str, None] = None,
+                        sort: Union[str, None] = None,
+                        data_de: Union[str, None] = None,
+                        data_ate: Union[str, None] = None,
+                        horario_de: Union[str, None] = None,
+                        horario_ate: Union[str, None] = None,
+                        cliente_id: Union[int, None] = None,
+                        fields: Union[str, None] = None,
+                        include: Union[str, None] = None):
         session = Session()
         try:
-            if data:
-                consultas = session.query(ConsultaJuridica).filter_by(data_consulta=datetime.strptime(data, '%d/%m/%Y').date()).all()
-            elif nome:
-                consultas = session.query(ConsultaJuridica).filter(ConsultaJuridica.nome_cliente.ilike(f'%{nome}%')).all()
-            elif cpf:
-                consultas = session.query(ConsultaJuridica).filter_by(cpf_cliente=cpf).all()
-            else:
-                consultas = session.query(ConsultaJuridica).all()
+            try:
+                query, apresenta = selecao_de_campos(session, ConsultaJuridica, self.apresenta_consulta, self.CAMPOS,
+                                                     self.INCLUSOES, self.ORDENACOES, fields, include)
+                query = self.filtra_consultas(query, data, nome, cpf,
+                                              data_de, data_ate, horario_de, horario_ate, cliente_id)
+                consultas, proximo_cursor = paginar(query, self.ORDENACOES, 'id', sort, cursor, limit)
+            except ValueError as e:
+                return {'mensagem': str(e)}, 400
 
             if not consultas:
                 return {'mensagem': 'Nenhuma consulta encontrada'}, 404
 
-            return self.apresenta_consultas(consultas), 200
+            return {'consultas': [apresenta(consulta) for consulta in consultas], 'next_cursor': proximo_cursor}, 200
         except Exception as e:
             session.rollback()
             return {'mensagem': 'Ocorreu um erro ao obter consultas: ' + str(e)}, 500
         finally:
             session.close()
 
+    def stream_consultas(self,
+                         data: Union[str, None] = None,
+                         nome: Union[str, None] = None,
+                         cpf: Union[str, None] = None,
+                         sort: Union[str, None] = None,
+                         data_de: Union[str, None] = None,
+                         data_ate: Union[str, None] = None,
+                         horario_de: Union[str, None] = None,
+                         horario_ate: Union[str, None] = None,
+                         cliente_id: Union[int, None] = None,
+                         fields: Union[str, None] = None,
+                         include: Union[str, None] = None):
+        session = Session()
+        try:
+            query, apresenta = selecao_de_campos(session, ConsultaJuridica, self.apresenta_consulta, self.CAMPOS,
+                                                 self.INCLUSOES, self.ORDENACOES, fields, include)
+            query = self.filtra_consultas(query, data, nome, cpf,
+                                          data_de, data_ate, horario_de, horario_ate, cliente_id)
+            query = ordenar(query, self.ORDENACOES, 'id', sort)
+        except ValueError as e:
+            return {'mensagem': str(e)}, 400
+
+        return resposta_ndjson(query, apresenta)
+
+    @coalescer
     def obter_consultas_hoje(self):
+        hoje = now_saopaulo().date()
+        resposta = cache_agenda_hoje.obter(hoje)
+        if resposta:
+            return resposta
+        geracao = cache_agenda_hoje.geracao
+
         session = Session()
         try:
-            consultas = session.query(ConsultaJuridica).filter_by(data_consulta=datetime.today().date()).all()
+            consultas = session.query(ConsultaJuridica).filter_by(data_consulta=hoje).all()
             if not consultas:
-                return {'mensagem': 'Nenhuma consulta encontrada para hoje'}, 404
+                resposta = {'mensagem': 'Nenhuma consulta encontrada para hoje'}, 404
+            else:
+                resposta = self.apresenta_consultas(consultas), 200
 
-            return self.apresenta_consultas(consultas), 200
+            cache_agenda_hoje.armazenar(hoje, resposta, geracao)
+            return resposta
         except Exception as e:
             session.rollback()
             return {'mensagem': 'Ocorreu um erro ao obter consultas: ' + str(e)}, 500
@@ -171,6 +386,64 @@ class ConsultaJuridicaController:
         finally:
             session.close()
 
+    def obter_disponibilidade(self, de: str, ate: str, duracao: Union[int, None] = 60):
+        try:
+            data_inicial, data_final = self.intervalo_de_datas(de, ate, DIAS_MAXIMOS_DISPONIBILIDADE)
+        except ValueError as e:
+            return {'mensagem': str(e)}, 400
+        duracao = duracao or 60
+        if duracao < 15 or duracao > 300:
+            return {'mensagem': 'A duração deve estar entre 15 e 300 minutos'}, 400
+
+        session = Session()
+        try:
+            agendados = session.query(ConsultaJuridica.data_consulta, ConsultaJuridica.horario_consulta).filter(
+                ConsultaJuridica.data_consulta.between(data_inicial, data_final)).all()
+
+            return {
+                'duracao': duracao,
+                'dias': horarios_livres(agrupa_ocupados(agendados), data_inicial, data_final, duracao)
+            }, 200
+        except Exception as e:
+            session.rollback()
+            return {'mensagem': 'Ocorreu um erro ao obter a disponibilidade: ' + str(e)}, 500
+        finally:
+            session.close()
+
+    def obter_resumo(self, de: str, ate: str):
+        try:
+            data_inicial, data_final = self.intervalo_de_datas(de, ate, DIAS_MAXIMOS_RESUMO)
+        except ValueError as e:
+            return {'mensagem': str(e)}, 400
+
+        session = Session()
+        try:
+            # lê a tabela agregada mantida por trigger: no máximo três linhas por dia do intervalo
+            contagens = session.query(AgendaResumo.data_consulta, AgendaResumo.periodo_consulta, AgendaResumo.total).filter(
+                AgendaResumo.data_consulta.between(data_inicial, data_final),
+                AgendaResumo.total > 0).order_by(AgendaResumo.data_consulta).all()
+
+            dias = {}
+            for data_consulta, periodo, total in contagens:
+                dia = dias.get(data_consulta)
+                if dia is None:
+                    dia = dias[data_consulta] = {'data': data_consulta.strftime('%d/%m/%Y'),
+                                                 'manha': 0, 'tarde': 0, 'fora_expediente': 0, 'total': 0}
+                if periodo == PERIODO_MANHA:
+                    dia['manha'] += total
+                elif periodo == PERIODO_TARDE:
+                    dia['tarde'] += total
+                else:
+                    dia['fora_expediente'] += total
+                dia['total'] += total
+
+            return {'dias': list(dias.values())}, 200
+        except Exception as e:
+            session.rollback()
+            return {'mensagem': 'Ocorreu um erro ao obter o resumo da agenda: ' + str(e)}, 500
+        finally:
+            session.close()
+
     def obter_consulta_por_id(self, consulta_id: int):
         session = Session()
         try:
@@ -187,6 +460,100 @@ class ConsultaJuridicaController:
         finally:
             session.close()
     
+    @staticmethod
+    def intervalo_de_datas(de: str, ate: str, dias_maximos: int):
+        """
+        Converte e valida um intervalo de datas no formato dd/mm/aaaa, com as duas pontas inclusivas
+
+        Raises:
+            ValueError: se as datas forem inválidas, estiverem invertidas ou o intervalo exceder dias_maximos
+        """
+        try:
+            data_inicial = datetime.strptime(de, '%d/%m/%Y').date()
+            data_final = datetime.strptime(ate, '%d/%m/%Y').date()
+        except (TypeError, ValueError):
+            raise ValueError('As datas devem estar no formato dd/mm/aaaa')
+        if data_final < data_inicial:
+            raise ValueError('A data final deve ser igual ou posterior à data inicial')
+        if (data_final - data_inicial).days >= dias_maximos:
+            raise ValueError(f'O intervalo deve ter no máximo {dias_maximos} dias')
+        return data_inicial, data_final
+
+    @staticmethod
+    def filtra_consultas(query,
+                         data: Union[str, None] = None,
+                         nome: Union[str, None] = None,
+                         cpf: Union[str, None] = None,
+                         data_de: Union[str, None] = None,
+                         data_ate: Union[str, None] = None,
+                         horario_de: Union[str, None] = None,
+                         horario_ate: Union[str, None] = None,
+                         cliente_id: Union[int, None] = None):
+        """Aplica à query os filtros informados, combinados entre si.
+
+        As combinações suportadas são atendidas pelos índices de consulta_juridica: intervalo de datas e
+        horários por (data_consulta, horario_consulta), CPF por (cpf_cliente, data_consulta), cliente por
+        (cliente_id, data_consulta) e apenas horários por (horario_consulta).
+        """
+        try:
+            if data:
+                query = query.filter(ConsultaJuridica.data_consulta == datetime.strptime(data, '%d/%m/%Y').date())
+            if data_de:
+                query = query.filter(ConsultaJuridica.data_consulta >= datetime.strptime(data_de, '%d/%m/%Y').date())
+            if data_ate:
+                query = query.filter(ConsultaJuridica.data_consulta <= datetime.strptime(data_ate, '%d/%m/%Y').date())
+        except ValueError:
+            raise ValueError('As datas devem estar no formato dd/mm/aaaa')
+        try:
+            if horario_de:
+                query = query.filter(ConsultaJuridica.horario_consulta >= datetime.strptime(horario_de, '%H:%M').time())
+            if horario_ate:
+                query = query.filter(ConsultaJuridica.horario_consulta <= datetime.strptime(horario_ate, '%H:%M').time())
+        except ValueError:
+            raise ValueError('Os horários devem estar no formato HH:MM')
+        if cpf:
+            query = query.filter(ConsultaJuridica.cpf_cliente == cpf)
+        if cliente_id:
+            query = query.filter(ConsultaJuridica.cliente_id == cliente_id)
+        if nome:
+            query = query.filter(ConsultaJuridica.nome_cliente.ilike(f'%{nome}%'))
+        return query
+
+    @staticmethod
+    def mensagem_agenda(horario_existente, horario_novo) -> str:
+        """Escolhe entre a mensagem de conflito no mesmo período e a de conflito no mesmo dia."""
+        if ConsultaJuridica.periodo_do_horario(horario_existente) == ConsultaJuridica.periodo_do_horario(horario_novo):
+            return MENSAGEM_CONFLITO_PERIODO
+        return MENSAGENS_CONFLITO['consulta_unico']
+
+    @classmethod
+    def resultado_conflito(cls, indice: int, horario_existente, horario_novo):
+        """Monta o resultado 409 de um item do lote, com a mesma regra das restrições de agendamento."""
+        return {'indice': indice, 'status': 409, 'mensagem': cls.mensagem_agenda(horario_existente, horario_novo)}
+
+    @classmethod
+    def mensagem_conflito(cls, session, erro: IntegrityError, cpf_cliente, data_consulta, horario_consulta,
+                          ignorar_id: Union[int, None] = None):
+        """
+        Traduz a violação de uma restrição de agendamento na resposta 409 correspondente
+
+        A restrição consulta_unico cobre o dia inteiro; o período da consulta já gravada, lido depois do
+        rollback, decide qual das duas mensagens é devolvida.
+        """
+        restricao = getattr(getattr(erro.orig, 'diag', None), 'constraint_name', None)
+        mensagem = MENSAGENS_CONFLITO.get(restricao)
+        if not mensagem:
+            return {'mensagem': str(erro.orig)}, 400
+        if restricao == 'consulta_unico' and horario_consulta:
+            query = session.query(ConsultaJuridica.horario_consulta).filter(
+                ConsultaJuridica.cpf_cliente == cpf_cliente, ConsultaJuridica.data_consulta == data_consulta)
+            if ignorar_id:
+                query = query.filter(ConsultaJuridica.id != ignorar_id)
+            existente = query.first()
+            if existente and existente.horario_consulta:
+                mensagem = cls.mensagem_agenda(existente.horario_consulta, horario_consulta)
+        return {'mensagem': mensagem}, 409
+
     @staticmethod
     def apresenta_consulta(consulta: ConsultaJuridica):
         return {
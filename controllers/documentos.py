@@ -1,15 +1,47 @@
 from typing import Union, List, Tuple
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
-from smb.SMBConnection import SMBConnection
 import socket
 from models.upload import documents
 from models.documentos import Documento
+from models.clientes import Cliente
+from models.consultas_juridicas import ConsultaJuridica
 from models import Session
+from models.samba import pool_samba, samba_config, fluxo_para_envio, ErroConexaoSamba
+from models.paginacao import paginar, ordenar, sem_nulos
+from models.campos import selecao_de_campos, formata_data, formata_horario, vazio_como_nulo
+from models.ndjson import resposta_ndjson
+from models.cache import cache_clientes
+from models.extracao import extrator_conteudo
+from models.conteudo import remove_conteudo, remove_conteudo_do_arquivo, localizacao_do_arquivo
 import os
-from dotenv import load_dotenv
 
 class DocumentoController:
+    ORDENACOES = {
+        'id': (Documento.id,),
+        'documento_nome': (Documento.documento_nome, Documento.id),
+        'cliente_id': (sem_nulos(Documento.cliente_id), Documento.id)
+    }
+    CAMPOS = {
+        'id': (Documento.id, None),
+        'documento_nome': (Documento.documento_nome, None),
+        'cliente_id': (Documento.cliente_id, None),
+        'consulta_id': (Documento.consulta_id, None),
+        'documento_localizacao': (Documento.documento_localizacao, vazio_como_nulo),
+        'documento_url': (Documento.documento_url, vazio_como_nulo)
+    }
+    INCLUSOES = {
+        'cliente': (Cliente, Documento.cliente_id == Cliente.id, {
+            'id': (Cliente.id, None),
+            'nome_cliente': (Cliente.nome_cliente, None),
+            'cpf_cliente': (Cliente.cpf_cliente, None)
+        }),
+        'consulta': (ConsultaJuridica, Documento.consulta_id == ConsultaJuridica.id, {
+            'id': (ConsultaJuridica.id, None),
+            'data_consulta': (ConsultaJuridica.data_consulta, formata_data),
+            'horario_consulta': (ConsultaJuridica.horario_consulta, formata_horario)
+        })
+    }
 
     def criar_documento(self, documento_nome: str, cliente_id: int, consulta_id: Union[int, None] = None, documento_localizacao: Union[str, None] = None, documento_url: Union[str, None] = None):
         session = Session()
@@ -21,6 +53,8 @@ class DocumentoController:
             documento = Documento(documento_nome=documento_nome, cliente_id=cliente_id, consulta_id=consulta_id, documento_localizacao=documento_localizacao, documento_url=documento_url)
             session.add(documento)
             session.commit()
+            # os contadores do cliente mudam junto com os documentos
+            cache_clientes.invalidar(cliente_id)
             
             return self.apresenta_documento(documento), 200
         
@@ -42,6 +76,7 @@ class DocumentoController:
             if not documento:
                 return {'mensagem': "Documento não encontrado"}, 404
             
+            cliente_anterior = documento.cliente_id
             documento.documento_nome = documento_nome
             documento.cliente_id = cliente_id
             documento.consulta_id = consulta_id
@@ -50,6 +85,7 @@ class DocumentoController:
 
             session.add(documento)
             session.commit()
+            cache_clientes.invalidar(cliente_anterior, cliente_id)
             
             return self.apresenta_documento(documento), 200
         
@@ -69,8 +105,11 @@ class DocumentoController:
             if not documento:
                 return {'mensagem': 'Documento não encontrado'}, 404
             documento_id = documento.id
+            cliente_id = documento.cliente_id
+            remove_conteudo(session, [localizacao_do_arquivo(documento.documento_url, documento.documento_localizacao)])
             session.delete(documento)
             session.commit()
+            cache_clientes.invalidar(cliente_id)
             return {'mensagem': 'Documento ' + str(documento_id) + " excluído com sucesso!"}, 200
         except Exception as e:
             session.rollback()
@@ -94,20 +133,38 @@ class DocumentoController:
         finally:
             session.close()
 
-    def obter_todos_documentos(self):
+    def obter_todos_documentos(self, limit: Union[int, None] = None, cursor: Union[str, None] = None, sort: Union[str, None] = None,
+                               fields: Union[str, None] = None, include: Union[str, None] = None):
         session = Session()
         try:
-            documentos = session.query(Documento).all()
+            try:
+                query, apresenta = selecao_de_campos(session, Documento, self.apresenta_documento, self.CAMPOS,
+                                                     self.INCLUSOES, self.ORDENACOES, fields, include)
+                documentos, proximo_cursor = paginar(query, self.ORDENACOES, 'id', sort, cursor, limit)
+            except ValueError as e:
+                return {'mensagem': str(e)}, 400
+
             if not documentos:
                 return {'mensagem': 'Nenhum documento encontrado'}, 404
 
-            return self.apresenta_documentos(documentos), 200
+            return {'documentos': [apresenta(documento) for documento in documentos], 'next_cursor': proximo_cursor}, 200
         except Exception as e:
             session.rollback()
             return {'mensagem': 'Ocorreu um erro ao obter os documentos: ' + str(e)}, 400
         finally:
             session.close()
             
+    def stream_documentos(self, sort: Union[str, None] = None, fields: Union[str, None] = None, include: Union[str, None] = None):
+        session = Session()
+        try:
+            query, apresenta = selecao_de_campos(session, Documento, self.apresenta_documento, self.CAMPOS,
+                                                 self.INCLUSOES, self.ORDENACOES, fields, include)
+            query = ordenar(query, self.ORDENACOES, 'id', sort)
+        except ValueError as e:
+            return {'mensagem': str(e)}, 400
+
+        return resposta_ndjson(query, apresenta)
+
     def atualizar_documento_no_armazenamento(self, documento: FileStorage, local_ou_samba: str, local_ou_samba_antigo: str, nome_cliente: str, filename_antigo: str) -> Tuple[dict, int]:
         delete_result, delete_status = self.excluir_documento_do_armazenamento(local_ou_samba_antigo, nome_cliente, filename_antigo)
         
@@ -123,40 +180,35 @@ class DocumentoController:
                 file_path = os.path.join(cliente_path, filename)
                 if os.path.exists(file_path):
                     os.remove(file_path)
+                    remove_conteudo_do_arquivo(file_path)
                     return {"mensagem": "Documento excluído com sucesso do armazenamento local"}, 200
                 else:
                     return {"mensagem": "Documento não encontrado no armazenamento local"}, 404
 
             elif local_ou_samba == 'samba':
-                load_dotenv()
-                server_name = os.getenv('SERVER_NAME')
-                username = os.getenv('USERNAME')
-                password = os.getenv('PASSWORD')
-                share_name = os.getenv('SHARENAME')
-                machine_name = os.getenv('MACHINE_NAME')
-                server_ip = os.getenv('SERVER_IP')
-                remote_path = os.getenv('REMOTE_PATH')
+                share_name = samba_config.share_name
+                remote_path = samba_config.remote_path
+                server_name = samba_config.server_name
 
-                conn = SMBConnection(username, password, machine_name, server_name, domain='WORKGROUP', use_ntlm_v2=True)
+                with pool_samba.conexao() as conn:
+                    remote_cliente_path = os.path.join(remote_path, nome_cliente)
+                    remote_file_path = os.path.join(remote_cliente_path, filename)
 
-                if not conn.connect(server_ip, 445):
-                    return {"mensagem": "Erro ao conectar ao servidor Samba"}, 500
+                    files = conn.listPath(share_name, remote_cliente_path)
+                    file_exists = any(file.filename == filename for file in files)
 
-                remote_cliente_path = os.path.join(remote_path, nome_cliente)
-                remote_file_path = os.path.join(remote_cliente_path, filename)
-
-                files = conn.listPath(share_name, remote_cliente_path)
-                file_exists = any(file.filename == filename for file in files)
-
-                if file_exists:
-                    conn.deleteFiles(share_name, remote_file_path)
-                    return {"mensagem": "Documento excluído com sucesso do samba"}, 200
-                else:
-                    return {"mensagem": "Documento não encontrado no samba"}, 404
+                    if file_exists:
+                        conn.deleteFiles(share_name, remote_file_path)
+                        remove_conteudo_do_arquivo(f"smb://{server_name}/{share_name}/{remote_file_path}")
+                        return {"mensagem": "Documento excluído com sucesso do samba"}, 200
+                    else:
+                        return {"mensagem": "Documento não encontrado no samba"}, 404
 
             else:
                 return {"mensagem": "Opção inválida para 'local_ou_samba'"}, 400
 
+        except ErroConexaoSamba as e:
+            return {"mensagem": str(e)}, 500
         except Exception as e:
             return {"mensagem": f"Ocorreu um erro: {e}"}, 500
 
@@ -182,6 +234,7 @@ class DocumentoController:
                 documento.save(file_path)
                 if not os.path.exists(file_path):
                     return {"mensagem": "Erro ao salvar o arquivo localmente"}, 500
+                extrator_conteudo.agendar(file_path, file_path, Session.session_factory)
                 return {
                     "mensagem": "Documento enviado com sucesso",
                     "detalhes": {
@@ -191,56 +244,47 @@ class DocumentoController:
                 }, 200
 
             elif local_ou_samba == 'samba':
-                load_dotenv()
-                server_name = os.getenv('SERVER_NAME')
-                username = os.getenv('USERNAME')
-                password = os.getenv('PASSWORD')
-                share_name = os.getenv('SHARENAME')
-                machine_name = os.getenv('MACHINE_NAME')
-                server_ip = os.getenv('SERVER_IP')
-                remote_path = os.getenv('REMOTE_PATH')
-
-                conn = SMBConnection(username, password, machine_name, server_name, domain='WORKGROUP', use_ntlm_v2=True)
-
-                if not conn.connect(server_ip, 445):
-                    return {"mensagem": "Erro ao conectar ao servidor Samba"}, 500
+                share_name = samba_config.share_name
+                remote_path = samba_config.remote_path
+                server_name = samba_config.server_name
 
-                cliente_path = os.path.join(documents.config.destination, nome_cliente)
-                if not os.path.exists(cliente_path):
-                    os.makedirs(cliente_path)
-                file_path = os.path.join(cliente_path, filename)
-                documento.save(file_path)
-
-                remote_cliente_path = os.path.join(remote_path, nome_cliente)
+                with pool_samba.conexao() as conn:
+                    remote_cliente_path = os.path.join(remote_path, nome_cliente)
                 
-                # Verifique se a subpasta com o nome do cliente existe no servidor Samba
-                try:
-                    conn.listPath(share_name, remote_cliente_path)
-                except:
-                    # Se a subpasta não existir, crie-a
-                    conn.createDirectory(share_name, remote_cliente_path)
-
-                filename = self.get_unique_filename_samba(conn, share_name, remote_cliente_path, filename)
-                remote_file_path = os.path.join(remote_cliente_path, filename)
-
-                with open(file_path, 'rb') as file_obj:
-                    conn.storeFile(share_name, remote_file_path, file_obj)
-
-                files_on_samba = conn.listPath(share_name, remote_cliente_path)
-                if not any(file.filename == filename for file in files_on_samba):
-                    return {"mensagem": "Erro ao salvar o arquivo no samba"}, 500
-
+                    # Verifique se a subpasta com o nome do cliente existe no servidor Samba
+                    try:
+                        conn.listPath(share_name, remote_cliente_path)
+                    except:
+                        # Se a subpasta não existir, crie-a
+                        conn.createDirectory(share_name, remote_cliente_path)
+
+                    filename = self.get_unique_filename_samba(conn, share_name, remote_cliente_path, filename)
+                    remote_file_path = os.path.join(remote_cliente_path, filename)
+
+                    # o arquivo recebido vai direto para o Samba, sem cópia na pasta de uploads
+                    with fluxo_para_envio(documento.stream) as (fluxo, tamanho):
+                        enviados = conn.storeFile(share_name, remote_file_path, fluxo)
+
+                    if enviados != tamanho:
+                        conn.deleteFiles(share_name, remote_file_path)
+                        return {"mensagem": "Erro ao salvar o arquivo no samba"}, 500
+
+                documento_url = f"smb://{server_name}/{share_name}/{remote_file_path}"
+                extrator_conteudo.agendar(documento_url, remote_file_path, Session.session_factory,
+                                          compartilhamento=share_name)
                 return {
                     "mensagem": "Documento enviado com sucesso",
                     "detalhes": {
                         "nome_arquivo": os.path.basename(remote_file_path),
-                        "documento_url": f"smb://{server_name}/{share_name}/{remote_file_path}"
+                        "documento_url": documento_url
                     }
                 }, 200
 
             else:
                 return {"mensagem": "Opção inválida para 'local_ou_samba'"}, 400
 
+        except ErroConexaoSamba as e:
+            return {"mensagem": str(e)}, 500
         except Exception as e:
             return {"mensagem": f"Ocorreu um erro: {e}"}, 500
         
@@ -1,17 +1,33 @@
 from typing import Union, List, Tuple
 from models.peca_processual import PecaProcessual
 from models import Session
+from models.samba import pool_samba, samba_config, fluxo_para_envio, ErroConexaoSamba
+from models.paginacao import paginar, ordenar
+from models.campos import selecao_de_campos
+from models.ndjson import resposta_ndjson
+from models.coalescencia import coalescer
 from models.upload import pecas
+from models.extracao import extrator_conteudo
+from models.conteudo import remove_conteudo, remove_conteudo_do_arquivo, localizacao_do_arquivo
 from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
-from smb.SMBConnection import SMBConnection
 import os
-from dotenv import load_dotenv
 
 
 class PecaProcessualController:
-    
-    
+    ORDENACOES = {
+        'id': (PecaProcessual.id,),
+        'nome_peca': (PecaProcessual.nome_peca, PecaProcessual.id),
+        'categoria': (PecaProcessual.categoria, PecaProcessual.id)
+    }
+    CAMPOS = {
+        'id': (PecaProcessual.id, None),
+        'documento_url': (PecaProcessual.documento_url, None),
+        'documento_localizacao': (PecaProcessual.documento_localizacao, None),
+        'categoria': (PecaProcessual.categoria, None),
+        'nome_peca': (PecaProcessual.nome_peca, None)
+    }
+
     def allowed_file(self, filename: str) -> bool:
         ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx'}
         return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -89,6 +105,7 @@ class PecaProcessualController:
             if not peca:
                 return {'mensagem': 'Peça processual não encontrada'}, 404
 
+            remove_conteudo(session, [localizacao_do_arquivo(peca.documento_url, peca.documento_localizacao)])
             session.delete(peca)
             session.commit()
 
@@ -118,15 +135,23 @@ class PecaProcessualController:
         finally:
             session.close()
 
-    def obter_pecas(self):
+    @coalescer
+    def obter_pecas(self, limit: Union[int, None] = None, cursor: Union[str, None] = None, sort: Union[str, None] = None,
+                    fields: Union[str, None] = None, include: Union[str, None] = None):
         session = Session()
 
         try:
-            pecas = session.query(PecaProcessual).all()
+            try:
+                query, apresenta = selecao_de_campos(session, PecaProcessual, self.apresenta_peca, self.CAMPOS, {},
+                                                     self.ORDENACOES, fields, include)
+                pecas, proximo_cursor = paginar(query, self.ORDENACOES, 'id', sort, cursor, limit)
+            except ValueError as e:
+                return {'mensagem': str(e)}, 400
+
             if not pecas:
                 return {'mensagem': 'Nenhuma peça processual encontrada'}, 404
 
-            return self.apresenta_pecas(pecas), 200
+            return {'pecas_processuais': [apresenta(peca) for peca in pecas], 'next_cursor': proximo_cursor}, 200
 
         except Exception as e:
             session.rollback()
@@ -135,6 +160,17 @@ class PecaProcessualController:
         finally:
             session.close()
             
+    def stream_pecas(self, sort: Union[str, None] = None, fields: Union[str, None] = None, include: Union[str, None] = None):
+        session = Session()
+        try:
+            query, apresenta = selecao_de_campos(session, PecaProcessual, self.apresenta_peca, self.CAMPOS, {},
+                                                 self.ORDENACOES, fields, include)
+            query = ordenar(query, self.ORDENACOES, 'id', sort)
+        except ValueError as e:
+            return {'mensagem': str(e)}, 400
+
+        return resposta_ndjson(query, apresenta)
+
     def upload_peca(self, peca: FileStorage, local_ou_samba: str, categoria: str) -> Tuple[dict, int]:
         if not peca:
             return {"mensagem": "Nenhuma peça foi enviada"}, 400
@@ -157,6 +193,7 @@ class PecaProcessualController:
                 peca.save(file_path)
                 if not os.path.exists(file_path):
                     return {"mensagem": "Erro ao salvar a peça localmente"}, 500
+                extrator_conteudo.agendar(file_path, file_path, Session.session_factory)
                 return {
                     "mensagem": "Peça enviada com sucesso",
                     "detalhes": {
@@ -166,54 +203,45 @@ class PecaProcessualController:
                 }, 200
 
             elif local_ou_samba == 'samba':
-                load_dotenv()
-                server_name = os.getenv('SERVER_NAME')
-                username = os.getenv('USERNAME')
-                password = os.getenv('PASSWORD')
-                share_name = os.getenv('SHARENAME')
-                machine_name = os.getenv('MACHINE_NAME')
-                server_ip = os.getenv('SERVER_IP')
-                remote_path = os.getenv('REMOTE_PATH')
-
-                conn = SMBConnection(username, password, machine_name, server_name, domain='WORKGROUP', use_ntlm_v2=True)
+                share_name = samba_config.share_name
+                remote_path = samba_config.remote_path
+                server_name = samba_config.server_name
 
-                if not conn.connect(server_ip, 445):
-                    return {"mensagem": "Erro ao conectar ao servidor Samba"}, 500
-
-                categoria_path = os.path.join(pecas.config.destination, categoria)
-                if not os.path.exists(categoria_path):
-                    os.makedirs(categoria_path)
-                file_path = os.path.join(categoria_path, filename)
-                peca.save(file_path)
-
-                remote_categoria_path = os.path.join(remote_path, categoria)
+                with pool_samba.conexao() as conn:
+                    remote_categoria_path = os.path.join(remote_path, categoria)
                 
-                try:
-                    conn.listPath(share_name, remote_categoria_path)
-                except:
-                    conn.createDirectory(share_name, remote_categoria_path)
+                    try:
+                        conn.listPath(share_name, remote_categoria_path)
+                    except:
+                        conn.createDirectory(share_name, remote_categoria_path)
 
-                filename = self.get_unique_filename_samba(conn, share_name, remote_categoria_path, filename)
-                remote_file_path = os.path.join(remote_categoria_path, filename)
+                    filename = self.get_unique_filename_samba(conn, share_name, remote_categoria_path, filename)
+                    remote_file_path = os.path.join(remote_categoria_path, filename)
 
-                with open(file_path, 'rb') as file_obj:
-                    conn.storeFile(share_name, remote_file_path, file_obj)
+                    # o arquivo recebido vai direto para o Samba, sem cópia na pasta de uploads
+                    with fluxo_para_envio(peca.stream) as (fluxo, tamanho):
+                        enviados = conn.storeFile(share_name, remote_file_path, fluxo)
 
-                files_on_samba = conn.listPath(share_name, remote_categoria_path)
-                if not any(file.filename == filename for file in files_on_samba):
-                    return {"mensagem": "Erro ao salvar o arquivo no samba"}, 500
+                    if enviados != tamanho:
+                        conn.deleteFiles(share_name, remote_file_path)
+                        return {"mensagem": "Erro ao salvar o arquivo no samba"}, 500
 
+                documento_url = f"smb://{server_name}/{share_name}/{remote_file_path}"
+                extrator_conteudo.agendar(documento_url, remote_file_path, Session.session_factory,
+                                          compartilhamento=share_name)
                 return {
                     "mensagem": "Documento enviado com sucesso",
                     "detalhes": {
                         "nome_arquivo": os.path.basename(remote_file_path),
-                        "documento_url": f"smb://{server_name}/{share_name}/{remote_file_path}"
+                        "documento_url": documento_url
                     }
                 }, 200
 
             else:
                 return {"mensagem": "Opção inválida para 'local_ou_samba'"}, 400
 
+        except ErroConexaoSamba as e:
+            return {"mensagem": str(e)}, 500
         except Exception as e:
             return {"mensagem": f"Ocorreu um erro: {e}"}, 500
 
@@ -232,40 +260,35 @@ class PecaProcessualController:
                 file_path = os.path.join(categoria_path, filename)
                 if os.path.exists(file_path):
                     os.remove(file_path)
+                    remove_conteudo_do_arquivo(file_path)
                     return {"mensagem": "Peça excluída com sucesso do armazenamento local"}, 200
                 else:
                     return {"mensagem": "Peça não encontrada no armazenamento local"}, 404
 
             elif local_ou_samba == 'samba':
-                load_dotenv()
-                server_name = os.getenv('SERVER_NAME')
-                username = os.getenv('USERNAME')
-                password = os.getenv('PASSWORD')
-                share_name = os.getenv('SHARENAME')
-                machine_name = os.getenv('MACHINE_NAME')
-                server_ip = os.getenv('SERVER_IP')
-                remote_path = os.getenv('REMOTE_PATH')
-
-                conn = SMBConnection(username, password, machine_name, server_name, domain='WORKGROUP', use_ntlm_v2=True)
+                share_name = samba_config.share_name
+                remote_path = samba_config.remote_path
+                server_name = samba_config.server_name
 
-                if not conn.connect(server_ip, 445):
-                    return {"mensagem": "Erro ao conectar ao servidor Samba"}, 500
+                with pool_samba.conexao() as conn:
+                    remote_categoria_path = os.path.join(remote_path, categoria)
+                    remote_file_path = os.path.join(remote_categoria_path, filename)
 
-                remote_categoria_path = os.path.join(remote_path, categoria)
-                remote_file_path = os.path.join(remote_categoria_path, filename)
+                    files = conn.listPath(share_name, remote_categoria_path)
+                    file_exists = any(file.filename == filename for file in files)
 
-                files = conn.listPath(share_name, remote_categoria_path)
-                file_exists = any(file.filename == filename for file in files)
-
-                if file_exists:
-                    conn.deleteFiles(share_name, remote_file_path)
-                    return {"mensagem": "Peça excluída com sucesso do samba"}, 200
-                else:
-                    return {"mensagem": "Peça não encontrada no samba"}, 404
+                    if file_exists:
+                        conn.deleteFiles(share_name, remote_file_path)
+                        remove_conteudo_do_arquivo(f"smb://{server_name}/{share_name}/{remote_file_path}")
+                        return {"mensagem": "Peça excluída com sucesso do samba"}, 200
+                    else:
+                        return {"mensagem": "Peça não encontrada no samba"}, 404
 
             else:
                 return {"mensagem": "Opção inválida para 'local_ou_samba'"}, 400
 
+        except ErroConexaoSamba as e:
+            return {"mensagem": str(e)}, 500
         except Exception as e:
             return {"mensagem": f"Ocorreu um erro: {e}"}, 500
 
@@ -0,0 +1,357 @@
+import hashlib
+import io
+import os
+import re
+import shutil
+import uuid
+from datetime import datetime
+from typing import Tuple, Union
+from smb.smb_structs import OperationFailure
+from sqlalchemy import update, func
+from werkzeug.utils import secure_filename
+from models import Session
+from models.samba import pool_samba, samba_config, ErroConexaoSamba
+from models.remocao_arquivos import caminho_local_permitido, caminho_samba_permitido
+from models.sessao_upload import SessaoUpload, LeitorParte, EscritorHash, BLOCO_LEITURA, PRAZO_GRAVACAO, \
+    PrazoGravacaoEsgotado, prazo_local_da_concessao, remove_sessoes_expiradas, sem_gravacao
+from models.upload import documents, pecas
+from models.fuso_horario import now_saopaulo
+from models.extracao import extrator_conteudo
+from controllers.documentos import DocumentoController
+from controllers.peca_processual import PecaProcessualController
+
+# uma parte fica presa a um worker durante a transferência; partes maiores são recusadas
+TAMANHO_MAXIMO_PARTE = 64 * 1024 * 1024
+_CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadController:
+    """
+    Uploads em partes, com retomada: cria-se uma sessão, enviam-se as partes com PUT e Content-Range
+    e conclui-se o upload, que renomeia o arquivo parcial para o nome definitivo
+
+    Os uploads de documentos são organizados por cliente e os de peças processuais por categoria, nas
+    mesmas pastas dos uploads de arquivo único.
+    """
+    TIPOS = {
+        'documento': (DocumentoController(), documents),
+        'peca': (PecaProcessualController(), pecas)
+    }
+
+    def criar_sessao(self, tipo: str, local_ou_samba: str, pasta: str, nome_arquivo: str, tamanho: int,
+                     sha256: Union[str, None] = None) -> Tuple[dict, int]:
+        if tipo not in self.TIPOS:
+            return {'mensagem': "Tipo inválido. Opções: " + ', '.join(self.TIPOS)}, 400
+        if local_ou_samba not in ('local', 'samba'):
+            return {'mensagem': "Opção inválida para 'local_ou_samba'"}, 400
+        # a pasta vem do cliente: só um nome simples, sem separadores nem '..', dentro da pasta de uploads
+        pasta = secure_filename(pasta or '')
+        if not pasta:
+            return {'mensagem': 'É obrigatório informar um cliente ou uma categoria válidos para o arquivo'}, 400
+        if not tamanho or tamanho < 1:
+            return {'mensagem': 'O tamanho do arquivo deve ser maior que zero'}, 400
+        if sha256 and not re.fullmatch(r'[0-9a-fA-F]{64}', sha256):
+            return {'mensagem': 'O sha256 deve ter 64 dígitos hexadecimais'}, 400
+        controller, upload_set = self.TIPOS[tipo]
+        if not nome_arquivo or not controller.allowed_file(nome_arquivo):
+            return {'mensagem': 'Tipo de arquivo não permitido'}, 400
+
+        upload_id = uuid.uuid4().hex
+        # o arquivo parcial fica oculto na pasta de destino, para que a conclusão seja apenas uma renomeação
+        nome_parcial = f'.{upload_id}.parte'
+        try:
+            if local_ou_samba == 'local':
+                pasta_local = os.path.join(upload_set.config.destination, pasta)
+                if not caminho_local_permitido(pasta_local, upload_set.config.destination):
+                    return {'mensagem': 'Pasta inválida'}, 400
+                os.makedirs(pasta_local, exist_ok=True)
+                caminho_parcial = os.path.join(pasta_local, nome_parcial)
+                open(caminho_parcial, 'wb').close()
+            else:
+                pasta_remota = os.path.join(samba_config.remote_path, pasta)
+                if not caminho_samba_permitido(samba_config.share_name, pasta_remota):
+                    return {'mensagem': 'Pasta inválida'}, 400
+                with pool_samba.conexao() as conn:
+                    try:
+                        conn.listPath(samba_config.share_name, pasta_remota)
+                    except OperationFailure:
+                        conn.createDirectory(samba_config.share_name, pasta_remota)
+                    caminho_parcial = os.path.join(pasta_remota, nome_parcial)
+                    conn.storeFile(samba_config.share_name, caminho_parcial, io.BytesIO(b''))
+        except ErroConexaoSamba as e:
+            return {"mensagem": str(e)}, 500
+        except Exception as e:
+            return {"mensagem": f"Ocorreu um erro: {e}"}, 500
+
+        session = Session()
+        # as sessões abandonadas são recolhidas a cada nova sessão
+        remove_sessoes_expiradas(session)
+        try:
+            agora = now_saopaulo()
+            sessao = SessaoUpload(id=upload_id, tipo=tipo, destino=local_ou_samba, pasta=pasta,
+                                  nome_arquivo=secure_filename(nome_arquivo), tamanho=tamanho, recebido=0, crc32=0,
+                                  sha256=sha256.lower() if sha256 else None, caminho_parcial=caminho_parcial,
+                                  criado_em=agora, atualizado_em=agora)
+            session.add(sessao)
+            session.commit()
+            return self.apresenta_sessao(sessao), 200
+        except Exception as e:
+            session.rollback()
+            return {'mensagem': str(e)}, 422
+
+    def obter_sessao(self, upload_id: str) -> Tuple[dict, int]:
+        session = Session()
+        try:
+            sessao = session.query(SessaoUpload).get(upload_id)
+            if not sessao:
+                return {'mensagem': 'Upload não encontrado'}, 404
+            return self.apresenta_sessao(sessao), 200
+        except Exception as e:
+            session.rollback()
+            return {'mensagem': str(e)}, 422
+
+    def enviar_parte(self, upload_id: str, content_range: Union[str, None], fluxo,
+                     crc32_parte: Union[str, None] = None) -> Tuple[dict, int]:
+        """
+        Grava uma parte do arquivo direto no destino, a partir do offset confirmado da sessão
+
+        A parte só é confirmada se chegar completa e, quando o cliente informa o CRC32 da parte, íntegra.
+        Uma parte recusada não avança o offset e pode ser reenviada; os bytes gravados dela são sobrescritos.
+        A gravação acontece sob uma concessão de UPLOAD_PRAZO_PARTE segundos, confirmada antes da transferência:
+        outra requisição para o mesmo upload recebe 409 e uma parte que não chega no prazo é interrompida.
+
+        Arguments:
+            upload_id: id da sessão de upload
+            content_range: cabeçalho Content-Range no formato 'bytes inicio-fim/total'
+            fluxo: corpo da requisição
+            crc32_parte: CRC32 da parte em hexadecimal, opcional
+        """
+        correspondencia = _CONTENT_RANGE.match(content_range or '')
+        if not correspondencia:
+            return {'mensagem': "Informe o cabeçalho Content-Range no formato 'bytes inicio-fim/total'"}, 400
+        inicio, fim, total = (int(valor) for valor in correspondencia.groups())
+        tamanho_parte = fim - inicio + 1
+        if tamanho_parte < 1 or tamanho_parte > TAMANHO_MAXIMO_PARTE:
+            return {'mensagem': f'Cada parte deve ter entre 1 e {TAMANHO_MAXIMO_PARTE} bytes'}, 400
+        try:
+            crc_esperado = int(crc32_parte, 16) if crc32_parte else None
+        except ValueError:
+            return {'mensagem': 'O CRC32 da parte deve estar em hexadecimal'}, 400
+
+        session = Session()
+        concessao = None
+        try:
+            sessao = session.query(SessaoUpload).get(upload_id)
+            if not sessao:
+                return {'mensagem': 'Upload não encontrado'}, 404
+            if total != sessao.tamanho or fim >= sessao.tamanho:
+                return {'mensagem': 'O intervalo da parte não corresponde ao tamanho do arquivo'}, 400
+            if inicio != sessao.recebido:
+                # o cliente retoma a partir do offset confirmado
+                return dict(self.apresenta_sessao(sessao), mensagem='A parte deve começar no offset recebido'), 409
+            destino, caminho_parcial, crc_inicial = sessao.destino, sessao.caminho_parcial, sessao.crc32
+
+            # a concessão é confirmada antes da transferência, que acontece sem transação aberta
+            prazo = prazo_local_da_concessao()
+            concessao = self.obtem_concessao(session, upload_id, SessaoUpload.recebido == inicio)
+            if concessao is None:
+                return self.resposta_sem_concessao(
+                    session, upload_id, 'Outra requisição está gravando neste upload ou o offset mudou; '
+                                        'consulte o upload e tente novamente')
+
+            leitor = LeitorParte(fluxo, tamanho_parte, crc_inicial, prazo)
+            if destino == 'local':
+                with open(caminho_parcial, 'r+b') as arquivo:
+                    arquivo.seek(inicio)
+                    shutil.copyfileobj(leitor, arquivo, BLOCO_LEITURA)
+            else:
+                with pool_samba.conexao() as conn:
+                    conn.storeFileFromOffset(samba_config.share_name, caminho_parcial, leitor, offset=inicio)
+
+            if leitor.lidos != tamanho_parte:
+                self.libera_concessao(session, upload_id, concessao)
+                return dict(self.apresenta_sessao(sessao), mensagem='A parte chegou incompleta e deve ser reenviada'), 400
+            if crc_esperado is not None and crc_esperado != leitor.crc32_parte:
+                self.libera_concessao(session, upload_id, concessao)
+                return dict(self.apresenta_sessao(sessao), mensagem='O CRC32 da parte não confere; reenvie a parte'), 422
+
+            # a confirmação avança o offset e devolve a concessão, desde que ela ainda seja desta requisição
+            resultado = session.execute(
+                update(SessaoUpload)
+                .where(SessaoUpload.id == upload_id, SessaoUpload.recebido == inicio,
+                       SessaoUpload.gravando_ate == concessao)
+                .values(recebido=fim + 1, crc32=leitor.crc32, atualizado_em=now_saopaulo(), gravando_ate=None)
+                .execution_options(synchronize_session=False))
+            if resultado.rowcount != 1:
+                session.rollback()
+                return {'mensagem': 'A concessão de gravação venceu antes da confirmação; reenvie a parte'}, 409
+            session.commit()
+            return self.apresenta_sessao(sessao), 200
+        except PrazoGravacaoEsgotado:
+            self.libera_concessao(session, upload_id, concessao)
+            return {'mensagem': 'A parte não chegou dentro do prazo e deve ser reenviada'}, 408
+        except Exception as e:
+            self.libera_concessao(session, upload_id, concessao)
+            return {'mensagem': f"Ocorreu um erro: {e}"}, 500
+
+    def concluir(self, upload_id: str, crc32: Union[str, None] = None) -> Tuple[dict, int]:
+        """
+        Confere a integridade do arquivo recebido e o renomeia para o nome definitivo
+
+        O CRC32 acumulado é comparado com o informado pelo cliente, sem reler o arquivo. O SHA-256, se
+        informado na criação da sessão, exige uma releitura do arquivo no destino.
+        """
+        try:
+            crc_esperado = int(crc32, 16) if crc32 else None
+        except ValueError:
+            return {'mensagem': 'O CRC32 deve estar em hexadecimal'}, 400
+
+        session = Session()
+        concessao = None
+        try:
+            sessao = session.query(SessaoUpload).get(upload_id)
+            if not sessao:
+                return {'mensagem': 'Upload não encontrado'}, 404
+            if sessao.recebido != sessao.tamanho:
+                return dict(self.apresenta_sessao(sessao), mensagem='O arquivo ainda não foi recebido por completo'), 409
+            if crc_esperado is not None and crc_esperado != sessao.crc32:
+                return {'mensagem': 'O CRC32 do arquivo não confere'}, 422
+            # com o arquivo completo nenhuma parte é mais aceita, então a releitura para o SHA-256 acontece
+            # antes da concessão e sem transação aberta
+            sha256, destino, caminho_parcial = sessao.sha256, sessao.destino, sessao.caminho_parcial
+            tipo, nome_original = sessao.tipo, sessao.nome_arquivo
+            session.commit()
+            if sha256 and self.sha256_parcial(destino, caminho_parcial) != sha256:
+                return {'mensagem': 'O SHA-256 do arquivo não confere'}, 422
+
+            # a concessão impede que duas conclusões ou um cancelamento renomeiem o mesmo arquivo parcial
+            concessao = self.obtem_concessao(session, upload_id)
+            if concessao is None:
+                return self.resposta_sem_concessao(session, upload_id,
+                                                   'Outra requisição está concluindo ou cancelando este upload')
+            controller, upload_set = self.TIPOS[tipo]
+            if destino == 'local':
+                pasta_local = os.path.dirname(caminho_parcial)
+                nome_arquivo = controller.get_unique_filename(pasta_local, nome_original)
+                file_path = os.path.join(pasta_local, nome_arquivo)
+                os.replace(caminho_parcial, file_path)
+                detalhes = {"nome_arquivo": nome_arquivo, "documento_localizacao": file_path}
+            else:
+                share_name = samba_config.share_name
+                with pool_samba.conexao() as conn:
+                    pasta_remota = os.path.dirname(caminho_parcial)
+                    nome_arquivo = controller.get_unique_filename_samba(conn, share_name, pasta_remota, nome_original)
+                    remote_file_path = os.path.join(pasta_remota, nome_arquivo)
+                    conn.rename(share_name, caminho_parcial, remote_file_path)
+                detalhes = {"nome_arquivo": nome_arquivo,
+                            "documento_url": f"smb://{samba_config.server_name}/{share_name}/{remote_file_path}"}
+
+            self.remove_com_concessao(session, upload_id, concessao)
+            if destino == 'local':
+                extrator_conteudo.agendar(file_path, file_path, Session.session_factory)
+            else:
+                extrator_conteudo.agendar(detalhes['documento_url'], remote_file_path, Session.session_factory,
+                                          compartilhamento=share_name)
+            return {"mensagem": "Arquivo enviado com sucesso", "detalhes": detalhes}, 200
+        except Exception as e:
+            self.libera_concessao(session, upload_id, concessao)
+            return {"mensagem": f"Ocorreu um erro: {e}"}, 500
+
+    def cancelar(self, upload_id: str) -> Tuple[dict, int]:
+        session = Session()
+        concessao = None
+        try:
+            # não remove o arquivo parcial enquanto outra requisição tem a concessão de gravação
+            concessao = self.obtem_concessao(session, upload_id)
+            if concessao is None:
+                return self.resposta_sem_concessao(
+                    session, upload_id, 'Outra requisição está gravando ou concluindo este upload; tente novamente')
+            sessao = session.query(SessaoUpload).get(upload_id)
+            destino, caminho_parcial = sessao.destino, sessao.caminho_parcial
+            session.commit()
+            if destino == 'local':
+                if os.path.exists(caminho_parcial):
+                    os.remove(caminho_parcial)
+            else:
+                with pool_samba.conexao() as conn:
+                    conn.deleteFiles(samba_config.share_name, caminho_parcial)
+            self.remove_com_concessao(session, upload_id, concessao)
+            return {'mensagem': 'Upload cancelado'}, 200
+        except Exception as e:
+            self.libera_concessao(session, upload_id, concessao)
+            return {"mensagem": f"Ocorreu um erro: {e}"}, 500
+
+    @staticmethod
+    def obtem_concessao(session, upload_id: str, *condicoes) -> Union[datetime, None]:
+        """
+        Grava e confirma a concessão de gravação da sessão, se nenhuma estiver em vigor
+
+        Returns:
+            O vencimento da concessão, que a identifica nas atualizações seguintes, ou None se ela não foi obtida
+        """
+        # UPDATE ... RETURNING pela tabela, fora da atualização em massa do ORM
+        concessao = session.execute(
+            update(SessaoUpload.__table__)
+            .where(SessaoUpload.id == upload_id, sem_gravacao(), *condicoes)
+            .values(gravando_ate=func.now() + PRAZO_GRAVACAO)
+            .returning(SessaoUpload.gravando_ate)).scalar()
+        session.commit()
+        return concessao
+
+    @staticmethod
+    def libera_concessao(session, upload_id: str, concessao: Union[datetime, None]):
+        """Devolve a concessão antes do vencimento, para que a parte possa ser reenviada em seguida."""
+        session.rollback()
+        if concessao is None:
+            return
+        try:
+            session.execute(
+                update(SessaoUpload)
+                .where(SessaoUpload.id == upload_id, SessaoUpload.gravando_ate == concessao)
+                .values(gravando_ate=None)
+                .execution_options(synchronize_session=False))
+            session.commit()
+        except Exception:
+            # sem a devolução, a concessão apenas vence no prazo
+            session.rollback()
+
+    @staticmethod
+    def remove_com_concessao(session, upload_id: str, concessao: datetime):
+        session.query(SessaoUpload).filter(SessaoUpload.id == upload_id, SessaoUpload.gravando_ate == concessao) \
+            .delete(synchronize_session=False)
+        session.commit()
+
+    @staticmethod
+    def resposta_sem_concessao(session, upload_id: str, mensagem: str) -> Tuple[dict, int]:
+        existe = session.query(SessaoUpload.id).filter(SessaoUpload.id == upload_id).first()
+        session.rollback()
+        if not existe:
+            return {'mensagem': 'Upload não encontrado'}, 404
+        return {'mensagem': mensagem}, 409
+
+    @staticmethod
+    def sha256_local(caminho: str) -> str:
+        resumo = hashlib.sha256()
+        with open(caminho, 'rb') as arquivo:
+            for bloco in iter(lambda: arquivo.read(BLOCO_LEITURA), b''):
+                resumo.update(bloco)
+        return resumo.hexdigest()
+
+    def sha256_parcial(self, destino: str, caminho_parcial: str) -> str:
+        if destino == 'local':
+            return self.sha256_local(caminho_parcial)
+        escritor = EscritorHash()
+        with pool_samba.conexao() as conn:
+            conn.retrieveFile(samba_config.share_name, caminho_parcial, escritor)
+        return escritor.hash.hexdigest()
+
+    @staticmethod
+    def apresenta_sessao(sessao: SessaoUpload):
+        return {
+            "upload_id": sessao.id,
+            "tipo": sessao.tipo,
+            "nome_arquivo": sessao.nome_arquivo,
+            "tamanho": sessao.tamanho,
+            "recebido": sessao.recebido,
+            "crc32": format(sessao.crc32, '08x')
+        }
@@ -1,8 +1,23 @@
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from models import Session
 from models.users import User
+from models.paginacao import paginar, sem_nulos
+from models.campos import selecao_de_campos, vazio_como_nulo
 from typing import Union, List
 
 class UserController:
+    ORDENACOES = {
+        'id': (User.id,),
+        'username': (User.username, User.id),
+        'name': (sem_nulos(User.name), User.id)
+    }
+    # o hash da senha nunca é selecionável por fields
+    CAMPOS = {
+        'id': (User.id, None),
+        'username': (User.username, None),
+        'name': (User.name, None),
+        'image': (User.image, vazio_como_nulo)
+    }
 
     def create_user(self, username:str, password:str, name:str, image:Union[str,None]=None):
         session = Session()
@@ -10,13 +25,18 @@ class UserController:
             if not username or not password or not name:
                 return {'mensagem': 'Dados de usuários faltantes'}, 400
             user = User(username=username, name=name, image=image)
-            existing_user = session.query(User).filter(User.username == username).first()
-            if existing_user and existing_user.id != user.id:
-                return {'mensagem': 'Nome de usuário já está em uso'}, 409
             user.set_password(password)
-            session.add(user)
+            # uma única ida ao banco: a restrição única do username decide o conflito, sem SELECT prévio
+            insercao = pg_insert(User).values(
+                username=user.username, password_hash=user.password_hash, name=user.name, image=user.image
+            ).on_conflict_do_nothing(index_elements=[User.username]).returning(
+                User.id, User.username, User.password_hash, User.name, User.image)
+            novo_user = session.execute(insercao).first()
+            if not novo_user:
+                session.rollback()
+                return {'mensagem': 'Nome de usuário já está em uso'}, 409
             session.commit()
-            return self.apresenta_usuario(user), 201
+            return self.apresenta_usuario(novo_user), 201
         
         except Exception as e:
             session.rollback()
@@ -104,15 +124,21 @@ class UserController:
         finally:
             session.close()
 
-    def obter_users(self):
+    def obter_users(self, limit: Union[int, None] = None, cursor: Union[str, None] = None, sort: Union[str, None] = None,
+                    fields: Union[str, None] = None, include: Union[str, None] = None):
         session = Session()
         try:
-            users = session.query(User).all()
+            try:
+                query, apresenta = selecao_de_campos(session, User, self.apresenta_usuario, self.CAMPOS, {},
+                                                     self.ORDENACOES, fields, include)
+                users, proximo_cursor = paginar(query, self.ORDENACOES, 'id', sort, cursor, limit)
+            except ValueError as e:
+                return {'mensagem': str(e)}, 400
 
             if not users:
                 return {'mensagem': 'Nenhum usuário encontrado'}, 404
 
-            return self.apresenta_usuarios(users), 200
+            return {'users': [apresenta(user) for user in users], 'next_cursor': proximo_cursor}, 200
         except Exception as e:
             session.rollback()
             return {'mensagem': 'Erro:' + str(e)}, 422
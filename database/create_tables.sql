@@ -1,10 +1,23 @@
+-- Configuração da busca textual em português sem acentos, usada pelas colunas geradas busca
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE TEXT SEARCH CONFIGURATION pt_unaccent (COPY = portuguese);
+ALTER TEXT SEARCH CONFIGURATION pt_unaccent
+    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+
 -- Criação da tabela Cliente
 CREATE TABLE cliente (
     id SERIAL PRIMARY KEY,
     nome_cliente VARCHAR(80) NOT NULL,
     cpf_cliente VARCHAR(11) NOT NULL UNIQUE,
     data_cadastro TIMESTAMP NOT NULL,
-    data_atualizacao TIMESTAMP
+    data_atualizacao TIMESTAMP,
+    -- contadores mantidos pelos triggers tr_cliente_contadores_consulta e tr_cliente_contadores_documento
+    num_consultas INTEGER NOT NULL DEFAULT 0,
+    num_documentos INTEGER NOT NULL DEFAULT 0,
+    ultima_consulta DATE,
+    busca TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('pt_unaccent'::regconfig, coalesce(nome_cliente, '')), 'A') ||
+        setweight(to_tsvector('pt_unaccent'::regconfig, coalesce(cpf_cliente, '')), 'A')) STORED
 );
 
 -- Criação da tabela ConsultaJuridica
@@ -16,6 +29,12 @@ CREATE TABLE consulta_juridica (
     horario_consulta TIME,
     detalhes_consulta TEXT,
     cliente_id INTEGER,
+    periodo_consulta SMALLINT GENERATED ALWAYS AS (
+        CASE WHEN horario_consulta BETWEEN '09:00' AND '12:00' THEN 1
+             WHEN horario_consulta BETWEEN '13:00' AND '18:00' THEN 2
+             ELSE 0 END) STORED,
+    busca TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('pt_unaccent'::regconfig, coalesce(detalhes_consulta, '')), 'B')) STORED,
     FOREIGN KEY (cliente_id) REFERENCES cliente (id) ON DELETE CASCADE,
     CONSTRAINT consulta_unico UNIQUE (cpf_cliente, data_consulta)
 );
@@ -37,8 +56,10 @@ CREATE TABLE documento (
     documento_url VARCHAR(200),
     cliente_id INTEGER,
     consulta_id INTEGER,
+    busca TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('pt_unaccent'::regconfig, coalesce(documento_nome, '')), 'A')) STORED,
     FOREIGN KEY (cliente_id) REFERENCES cliente (id) ON DELETE CASCADE,
-    FOREIGN KEY (consulta_id) REFERENCES consulta_juridica (pk_consulta) ON DELETE CASCADE
+    FOREIGN KEY (consulta_id) REFERENCES consulta_juridica (pk_consulta) ON DELETE SET NULL
 );
 
 CREATE TABLE peca_processual (
@@ -46,6 +67,163 @@ CREATE TABLE peca_processual (
     documento_url VARCHAR(255),  
     documento_localizacao VARCHAR(255), 
     categoria VARCHAR(100) NOT NULL, 
-    nome_peca VARCHAR(150) NOT NULL 
+    nome_peca VARCHAR(150) NOT NULL,
+    busca TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('pt_unaccent'::regconfig, coalesce(nome_peca, '')), 'A') ||
+        setweight(to_tsvector('pt_unaccent'::regconfig, coalesce(categoria, '')), 'C')) STORED
+);
+
+
+-- Índices das ordenações das listagens paginadas por cursor
+CREATE INDEX ix_cliente_nome_cliente_id ON cliente (nome_cliente, id);
+CREATE INDEX ix_cliente_data_cadastro_id ON cliente (data_cadastro, id);
+-- também atende aos filtros por intervalo de data de atualização
+CREATE INDEX ix_cliente_data_atualizacao_id ON cliente (data_atualizacao, id);
+CREATE INDEX ix_cliente_num_consultas_id ON cliente (num_consultas, id);
+CREATE INDEX ix_cliente_num_documentos_id ON cliente (num_documentos, id);
+-- busca por trecho do nome, usada pelas sugestões de clientes enquanto o índice em memória carrega
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX ix_cliente_nome_cliente_trgm ON cliente USING gin (nome_cliente gin_trgm_ops);
+CREATE INDEX ix_consulta_juridica_data_horario_id ON consulta_juridica (data_consulta, horario_consulta, pk_consulta);
+-- colunas anuláveis entram nas ordenações com coalesce e um valor sentinela, para que o cursor não pule NULLs
+CREATE INDEX ix_consulta_juridica_data_ordem ON consulta_juridica
+    (coalesce(data_consulta, '0001-01-01'::date), coalesce(horario_consulta, '00:00:00'::time), pk_consulta);
+CREATE INDEX ix_consulta_juridica_nome_cliente_ordem ON consulta_juridica (coalesce(nome_cliente, ''), pk_consulta);
+
+-- Texto extraído dos arquivos enviados, ligado a documentos e peças pela localização do arquivo
+CREATE TABLE conteudo_arquivo (
+    localizacao VARCHAR(255) PRIMARY KEY,
+    texto TEXT,
+    paginas INTEGER,
+    erro VARCHAR(500),
+    extraido_em TIMESTAMP NOT NULL,
+    busca TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('pt_unaccent'::regconfig, coalesce(texto, '')), 'D')) STORED
 );
+CREATE INDEX ix_conteudo_arquivo_busca ON conteudo_arquivo USING gin (busca);
+CREATE INDEX ix_documento_arquivo ON documento (coalesce(nullif(documento_url, ''), documento_localizacao));
+CREATE INDEX ix_peca_processual_arquivo ON peca_processual (coalesce(nullif(documento_url, ''), documento_localizacao));
+
+-- Uploads em partes em andamento; recebido é o offset confirmado e crc32 o CRC acumulado até ele
+CREATE TABLE sessao_upload (
+    id VARCHAR(32) PRIMARY KEY,
+    tipo VARCHAR(20) NOT NULL,
+    destino VARCHAR(10) NOT NULL,
+    pasta VARCHAR(200) NOT NULL,
+    nome_arquivo VARCHAR(255) NOT NULL,
+    tamanho BIGINT NOT NULL,
+    recebido BIGINT NOT NULL DEFAULT 0,
+    crc32 BIGINT NOT NULL DEFAULT 0,
+    sha256 VARCHAR(64),
+    caminho_parcial VARCHAR(500) NOT NULL,
+    criado_em TIMESTAMP NOT NULL,
+    atualizado_em TIMESTAMP NOT NULL,
+    gravando_ate TIMESTAMP
+);
+
+CREATE INDEX ix_sessao_upload_atualizado_em ON sessao_upload (atualizado_em);
+
+-- Índices GIN da busca textual global (GET /busca)
+CREATE INDEX ix_cliente_busca ON cliente USING gin (busca);
+CREATE INDEX ix_consulta_juridica_busca ON consulta_juridica USING gin (busca);
+CREATE INDEX ix_documento_busca ON documento USING gin (busca);
+CREATE INDEX ix_peca_processual_busca ON peca_processual USING gin (busca);
+
+-- Índices dos filtros combináveis de consultas (intervalos de data e horário usam ix_consulta_juridica_data_horario_id
+-- e CPF usa a restrição consulta_unico)
+CREATE INDEX ix_consulta_juridica_cliente_id_data ON consulta_juridica (cliente_id, data_consulta);
+CREATE INDEX ix_consulta_juridica_horario ON consulta_juridica (horario_consulta);
+
+CREATE INDEX ix_documento_documento_nome_id ON documento (documento_nome, id);
+CREATE INDEX ix_documento_cliente_id_id ON documento (cliente_id, id);
+CREATE INDEX ix_documento_cliente_id_ordem ON documento (coalesce(cliente_id, 0), id);
+-- sustenta o SET NULL de documento.consulta_id ao excluir uma consulta
+CREATE INDEX ix_documento_consulta_id ON documento (consulta_id);
+CREATE INDEX ix_peca_processual_nome_peca_id ON peca_processual (nome_peca, id);
+CREATE INDEX ix_peca_processual_categoria_id ON peca_processual (categoria, id);
+CREATE INDEX ix_users_name_ordem ON users (coalesce(name, ''), id);
+
+-- Resumo da agenda: total de consultas por dia e período, mantido pelo trigger abaixo
+CREATE TABLE agenda_resumo (
+    data_consulta DATE NOT NULL,
+    periodo_consulta SMALLINT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (data_consulta, periodo_consulta)
+);
+
+CREATE OR REPLACE FUNCTION agenda_resumo_atualiza() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.data_consulta IS NOT DISTINCT FROM NEW.data_consulta
+       AND OLD.periodo_consulta IS NOT DISTINCT FROM NEW.periodo_consulta THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.data_consulta IS NOT NULL THEN
+        UPDATE agenda_resumo SET total = total - 1
+         WHERE data_consulta = OLD.data_consulta AND periodo_consulta = OLD.periodo_consulta;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.data_consulta IS NOT NULL THEN
+        INSERT INTO agenda_resumo (data_consulta, periodo_consulta, total)
+        VALUES (NEW.data_consulta, NEW.periodo_consulta, 1)
+        ON CONFLICT (data_consulta, periodo_consulta) DO UPDATE SET total = agenda_resumo.total + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tr_agenda_resumo
+AFTER INSERT OR DELETE OR UPDATE OF data_consulta, horario_consulta ON consulta_juridica
+FOR EACH ROW EXECUTE FUNCTION agenda_resumo_atualiza();
+
+
+-- Contadores de consultas e documentos por cliente
+CREATE OR REPLACE FUNCTION cliente_contadores_consulta() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.cliente_id IS NOT DISTINCT FROM NEW.cliente_id THEN
+        -- remarcação: apenas a data da última consulta pode mudar
+        UPDATE cliente
+           SET ultima_consulta = (SELECT max(data_consulta) FROM consulta_juridica WHERE cliente_id = NEW.cliente_id)
+         WHERE id = NEW.cliente_id;
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.cliente_id IS NOT NULL THEN
+        -- a última consulta só é recalculada quando a consulta removida era a mais recente,
+        -- com uma leitura do fim do índice (cliente_id, data_consulta)
+        UPDATE cliente
+           SET num_consultas = num_consultas - 1,
+               ultima_consulta = CASE WHEN OLD.data_consulta >= ultima_consulta
+                                      THEN (SELECT max(data_consulta) FROM consulta_juridica WHERE cliente_id = OLD.cliente_id)
+                                      ELSE ultima_consulta END
+         WHERE id = OLD.cliente_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.cliente_id IS NOT NULL THEN
+        UPDATE cliente
+           SET num_consultas = num_consultas + 1,
+               ultima_consulta = GREATEST(ultima_consulta, NEW.data_consulta)
+         WHERE id = NEW.cliente_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION cliente_contadores_documento() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.cliente_id IS NOT DISTINCT FROM NEW.cliente_id THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.cliente_id IS NOT NULL THEN
+        UPDATE cliente SET num_documentos = num_documentos - 1 WHERE id = OLD.cliente_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.cliente_id IS NOT NULL THEN
+        UPDATE cliente SET num_documentos = num_documentos + 1 WHERE id = NEW.cliente_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tr_cliente_contadores_consulta
+AFTER INSERT OR DELETE OR UPDATE OF cliente_id, data_consulta ON consulta_juridica
+FOR EACH ROW EXECUTE FUNCTION cliente_contadores_consulta();
 
+CREATE TRIGGER tr_cliente_contadores_documento
+AFTER INSERT OR DELETE OR UPDATE OF cliente_id ON documento
+FOR EACH ROW EXECUTE FUNCTION cliente_contadores_documento();
@@ -1,15 +1,22 @@
 from sqlalchemy_utils import database_exists, create_database
+import logging
 import os
 
 # Importe a classe Base do arquivo base.py
 from models.base import Base
 from models.consultas_juridicas import ConsultaJuridica
+from models.agenda_resumo import AgendaResumo
 from models.clientes import Cliente
 from models.fuso_horario import now_saopaulo
-from models.database import engine, Session
+from models.database import engine, Session, estatisticas_do_pool
 from models.documentos import Documento
 from models.users import User
 from models.peca_processual import PecaProcessual
+from models.conteudo import ConteudoArquivo
+from models.sessao_upload import SessaoUpload
+from models.consultas_duplicadas import restricao_consulta_unico_presente
+
+logger = logging.getLogger(__name__)
 
 db_path = "database/"
 
@@ -18,12 +25,15 @@ if not os.path.exists(db_path):
    # então cria o diretorio
    os.makedirs(db_path)
 
-# Instancia um criador de seção com o banco
-session = Session()
-
 # cria o banco se ele não existir 
 if not database_exists(engine.url):
     create_database(engine.url) 
 
 # cria as tabelas do banco, caso não existam
 Base.metadata.create_all(engine)
+
+# a migração não remove agendamentos repetidos por conta própria; sem consulta_unico, o operador é avisado
+with engine.connect() as conexao:
+    if not restricao_consulta_unico_presente(conexao):
+        logger.warning('A restrição consulta_unico não foi criada porque há consultas repetidas do mesmo CPF no '
+                       'mesmo dia. Liste-as e resolva-as com: flask consultas-duplicadas [--mover]')
@@ -0,0 +1,83 @@
+from bisect import bisect_right
+from datetime import date, time, timedelta
+from typing import Dict, Iterable, List, Tuple
+from models.consultas_juridicas import MANHA_INICIO, MANHA_FIM, TARDE_INICIO, TARDE_FIM
+
+# janelas de atendimento, as mesmas usadas na regra de períodos das consultas
+JANELAS_ATENDIMENTO = ((MANHA_INICIO, MANHA_FIM), (TARDE_INICIO, TARDE_FIM))
+
+
+def _minutos(horario: time) -> int:
+    return horario.hour * 60 + horario.minute
+
+
+def grade_de_horarios(duracao: int) -> List[int]:
+    """
+    Gera os inícios possíveis de atendimento, em minutos desde a meia-noite, dentro das janelas de atendimento
+
+    Arguments:
+        duracao: duração de cada atendimento em minutos
+    """
+    grade = []
+    for inicio, fim in JANELAS_ATENDIMENTO:
+        minuto = _minutos(inicio)
+        while minuto + duracao <= _minutos(fim):
+            grade.append(minuto)
+            minuto += duracao
+    return grade
+
+
+def agrupa_ocupados(agendados: Iterable[Tuple[date, time]]) -> Dict[date, List[int]]:
+    """
+    Organiza os horários agendados em listas ordenadas de minutos por dia, usadas como árvore de intervalos
+
+    Arguments:
+        agendados: pares (data_consulta, horario_consulta) já gravados
+    """
+    ocupados = {}
+    for data_consulta, horario_consulta in agendados:
+        # consultas sem horário não ocupam nenhum intervalo da grade
+        if horario_consulta is None:
+            continue
+        ocupados.setdefault(data_consulta, []).append(_minutos(horario_consulta))
+    for minutos in ocupados.values():
+        minutos.sort()
+    return ocupados
+
+
+def horarios_livres(ocupados: Dict[date, List[int]], de: date, ate: date, duracao: int) -> List[Tuple[str, List[str]]]:
+    """
+    Calcula os horários livres de cada dia do intervalo
+
+    Cada consulta agendada ocupa `duracao` minutos a partir do seu horário. Um horário da grade está
+    livre quando nenhuma consulta começa no intervalo aberto (inicio - duracao, inicio + duracao), o que
+    é verificado com uma busca binária na lista ordenada de ocupações do dia.
+
+    Arguments:
+        ocupados: minutos ocupados por dia, como retornado por agrupa_ocupados
+        de: primeiro dia do intervalo
+        ate: último dia do intervalo (inclusive)
+        duracao: duração de cada atendimento em minutos
+
+    Returns:
+        Uma lista de pares [data, [horários livres]] no formato dd/mm/aaaa e HH:MM
+    """
+    grade = grade_de_horarios(duracao)
+    rotulos = {minuto: f'{minuto // 60:02d}:{minuto % 60:02d}' for minuto in grade}
+    todos_livres = [rotulos[minuto] for minuto in grade]
+
+    dias = []
+    dia = de
+    while dia <= ate:
+        minutos_ocupados = ocupados.get(dia)
+        if not minutos_ocupados:
+            livres = todos_livres
+        else:
+            livres = []
+            for minuto in grade:
+                posicao = bisect_right(minutos_ocupados, minuto - duracao)
+                if posicao == len(minutos_ocupados) or minutos_ocupados[posicao] >= minuto + duracao:
+                    livres.append(rotulos[minuto])
+        dias.append((dia.strftime('%d/%m/%Y'), livres))
+        dia += timedelta(days=1)
+    return dias
@@ -0,0 +1,64 @@
+from sqlalchemy import Column, Integer, SmallInteger, Date, DDL, event
+from models.base import Base
+
+
+class AgendaResumo(Base):
+    """
+    Total de consultas por dia e período de atendimento, mantido por trigger na tabela consulta_juridica
+
+    Cada inserção, exclusão ou remarcação de consulta ajusta o contador do dia/período na mesma
+    transação, então o resumo nunca diverge da agenda e é lido sem varrer consulta_juridica.
+    """
+    __tablename__ = 'agenda_resumo'
+
+    data_consulta = Column(Date, primary_key=True)
+    periodo_consulta = Column(SmallInteger, primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+
+
+# A função e o trigger dependem de consulta_juridica, então são criados depois de todas as tabelas.
+# As instruções são idempotentes porque o create_all roda a cada inicialização.
+event.listen(Base.metadata, 'after_create', DDL("""
+CREATE OR REPLACE FUNCTION agenda_resumo_atualiza() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.data_consulta IS NOT DISTINCT FROM NEW.data_consulta
+       AND OLD.periodo_consulta IS NOT DISTINCT FROM NEW.periodo_consulta THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.data_consulta IS NOT NULL THEN
+        UPDATE agenda_resumo SET total = total - 1
+         WHERE data_consulta = OLD.data_consulta AND periodo_consulta = OLD.periodo_consulta;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.data_consulta IS NOT NULL THEN
+        INSERT INTO agenda_resumo (data_consulta, periodo_consulta, total)
+        VALUES (NEW.data_consulta, NEW.periodo_consulta, 1)
+        ON CONFLICT (data_consulta, periodo_consulta) DO UPDATE SET total = agenda_resumo.total + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""))
+
+# O trigger é criado uma única vez, junto com a carga inicial das consultas já existentes. O bloqueio
+# impede que uma consulta gravada entre a carga e a criação do trigger fique fora do resumo.
+event.listen(Base.metadata, 'after_create', DDL("""
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'tr_agenda_resumo') THEN
+        LOCK TABLE consulta_juridica IN SHARE ROW EXCLUSIVE MODE;
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'tr_agenda_resumo') THEN
+            DELETE FROM agenda_resumo;
+            INSERT INTO agenda_resumo (data_consulta, periodo_consulta, total)
+            SELECT data_consulta, periodo_consulta, count(*)
+              FROM consulta_juridica
+             WHERE data_consulta IS NOT NULL
+             GROUP BY data_consulta, periodo_consulta;
+
+            CREATE TRIGGER tr_agenda_resumo
+            AFTER INSERT OR DELETE OR UPDATE OF data_consulta, horario_consulta ON consulta_juridica
+            FOR EACH ROW EXECUTE FUNCTION agenda_resumo_atualiza();
+        END IF;
+    END IF;
+END
+$$
+"""))
@@ -0,0 +1,59 @@
+from typing import Tuple
+from sqlalchemy import DDL, event
+from models.base import Base
+
+# Configuração de busca textual em português que ignora acentos: 'ação' e 'acao' geram o mesmo lexema
+CONFIGURACAO_BUSCA = 'pt_unaccent'
+
+
+def expressao_busca(*campos: Tuple[str, str]) -> str:
+    """
+    Monta a expressão do tsvector de uma coluna gerada de busca
+
+    Arguments:
+        campos: pares (coluna, peso), com pesos de 'A' (mais relevante) a 'D'
+
+    Returns:
+        A expressão SQL que concatena os vetores ponderados das colunas
+    """
+    return ' || '.join(
+        f"setweight(to_tsvector('{CONFIGURACAO_BUSCA}'::regconfig, coalesce({coluna}, '')), '{peso}')"
+        for coluna, peso in campos)
+
+
+def registra_coluna_busca(tabela: str, expressao: str):
+    """
+    Acrescenta a coluna gerada busca e o seu índice GIN a bases criadas antes da busca textual
+
+    O create_all não altera tabelas existentes. A verificação prévia evita o bloqueio exclusivo do
+    ALTER TABLE nas inicializações seguintes, já que o create_all roda a cada inicialização.
+    """
+    event.listen(Base.metadata, 'after_create', DDL(f"""
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_attribute
+                    WHERE attrelid = '{tabela}'::regclass AND attname = 'busca' AND NOT attisdropped) THEN
+        ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS busca tsvector GENERATED ALWAYS AS ({expressao}) STORED;
+    END IF;
+    CREATE INDEX IF NOT EXISTS ix_{tabela}_busca ON {tabela} USING gin (busca);
+END
+$$
+"""))
+
+
+# A configuração precisa existir antes das tabelas, já que as colunas geradas a referenciam
+event.listen(Base.metadata, 'before_create', DDL('CREATE EXTENSION IF NOT EXISTS unaccent'))
+event.listen(Base.metadata, 'before_create', DDL(f"""
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{CONFIGURACAO_BUSCA}') THEN
+        CREATE TEXT SEARCH CONFIGURATION {CONFIGURACAO_BUSCA} (COPY = portuguese);
+        ALTER TEXT SEARCH CONFIGURATION {CONFIGURACAO_BUSCA}
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+    END IF;
+EXCEPTION
+    -- outro worker criou a configuração ao mesmo tempo
+    WHEN unique_violation OR duplicate_object THEN NULL;
+END
+$$
+"""))
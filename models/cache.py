@@ -0,0 +1,177 @@
+import os
+import time
+from collections import OrderedDict, namedtuple
+from datetime import date
+from threading import Lock
+from typing import Tuple, Union
+
+
+class CacheAgendaHoje:
+    """
+    Cache local do processo para a resposta já serializada da agenda do dia
+
+    A entrada é indexada pela data de São Paulo, então deixa de valer sozinha à meia-noite.
+    As escritas em consultas invalidam a entrada; o TTL limita quanto tempo um worker pode
+    servir uma agenda alterada por outro worker.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = Lock()
+        self._data = None
+        self._resposta = None
+        self._expira_em = 0.0
+        self._geracao = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidacoes = 0
+
+    @property
+    def geracao(self) -> int:
+        """Versão do cache; deve ser lida antes de consultar o banco e repassada a armazenar."""
+        with self._lock:
+            return self._geracao
+
+    def obter(self, hoje: date) -> Union[Tuple[dict, int], None]:
+        with self._lock:
+            if self._data == hoje and time.monotonic() < self._expira_em:
+                self.acertos += 1
+                return self._resposta
+            self.falhas += 1
+            return None
+
+    def armazenar(self, hoje: date, resposta: Tuple[dict, int], geracao: int):
+        with self._lock:
+            # uma escrita ocorrida durante a consulta ao banco torna a resposta obsoleta
+            if geracao != self._geracao:
+                return
+            self._data = hoje
+            self._resposta = resposta
+            self._expira_em = time.monotonic() + self.ttl
+
+    def invalidar(self, *datas: date):
+        """Descarta a entrada se ela for de uma das datas informadas, ou sempre, se nenhuma data for informada."""
+        with self._lock:
+            # a geração muda sempre, descartando consultas em andamento que ainda não foram armazenadas
+            self._geracao += 1
+            if datas and self._data not in datas:
+                return
+            self._data = None
+            self._resposta = None
+            self.invalidacoes += 1
+
+    def como_dict(self):
+        with self._lock:
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'invalidacoes': self.invalidacoes,
+                'data': self._data.strftime('%d/%m/%Y') if self._data else None,
+                'ttl_segundos': self.ttl
+            }
+
+
+# registro imutável de um cliente, com os mesmos atributos lidos por ClientesController.apresenta_cliente
+ClienteRegistro = namedtuple('ClienteRegistro', ['id', 'nome_cliente', 'cpf_cliente', 'data_cadastro', 'data_atualizacao',
+                                                 'num_consultas', 'num_documentos', 'ultima_consulta'])
+
+
+class CacheClientes:
+    """
+    Cache LRU local do processo para clientes, indexado por id e por CPF
+
+    Guarda registros imutáveis, nunca instâncias do ORM ligadas a uma sessão. Ao atingir a capacidade,
+    o cliente usado há mais tempo é descartado. As escritas em clientes, consultas e documentos
+    invalidam os clientes afetados, e o TTL limita quanto tempo um worker pode servir um cliente
+    alterado por outro worker.
+    """
+
+    def __init__(self, capacidade: int, ttl: float):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self._lock = Lock()
+        self._por_id = OrderedDict()
+        self._id_por_cpf = {}
+        self._geracao = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.despejos = 0
+        self.expirados = 0
+        self.invalidacoes = 0
+
+    @property
+    def geracao(self) -> int:
+        """Versão do cache; deve ser lida antes de consultar o banco e repassada a armazenar."""
+        with self._lock:
+            return self._geracao
+
+    def _remover(self, cliente_id: int):
+        registro, _ = self._por_id.pop(cliente_id)
+        if self._id_por_cpf.get(registro.cpf_cliente) == cliente_id:
+            del self._id_por_cpf[registro.cpf_cliente]
+
+    def _obter(self, cliente_id: Union[int, None]) -> Union[ClienteRegistro, None]:
+        entrada = self._por_id.get(cliente_id)
+        if entrada is None:
+            self.falhas += 1
+            return None
+        registro, expira_em = entrada
+        if time.monotonic() >= expira_em:
+            self._remover(cliente_id)
+            self.expirados += 1
+            self.falhas += 1
+            return None
+        self._por_id.move_to_end(cliente_id)
+        self.acertos += 1
+        return registro
+
+    def obter_por_id(self, cliente_id: int) -> Union[ClienteRegistro, None]:
+        with self._lock:
+            return self._obter(cliente_id)
+
+    def obter_por_cpf(self, cpf_cliente: str) -> Union[ClienteRegistro, None]:
+        with self._lock:
+            return self._obter(self._id_por_cpf.get(cpf_cliente))
+
+    def armazenar(self, registro: ClienteRegistro, geracao: int):
+        with self._lock:
+            # uma escrita ocorrida durante a consulta ao banco torna o registro obsoleto
+            if geracao != self._geracao:
+                return
+            if registro.id in self._por_id:
+                self._remover(registro.id)
+            self._por_id[registro.id] = (registro, time.monotonic() + self.ttl)
+            self._id_por_cpf[registro.cpf_cliente] = registro.id
+            while len(self._por_id) > self.capacidade:
+                self._remover(next(iter(self._por_id)))
+                self.despejos += 1
+
+    def invalidar(self, *ids: int):
+        """Descarta os clientes informados, ou todos, se nenhum id for informado."""
+        with self._lock:
+            # a geração muda sempre, descartando leituras em andamento que ainda não foram armazenadas
+            self._geracao += 1
+            alvos = [cliente_id for cliente_id in ids if cliente_id in self._por_id] if ids else list(self._por_id)
+            for cliente_id in alvos:
+                self._remover(cliente_id)
+            self.invalidacoes += len(alvos)
+
+    def como_dict(self):
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_de_acerto': round(self.acertos / consultas, 4) if consultas else None,
+                'despejos': self.despejos,
+                'expirados': self.expirados,
+                'invalidacoes': self.invalidacoes,
+                'tamanho': len(self._por_id),
+                'capacidade': self.capacidade,
+                'ttl_segundos': self.ttl
+            }
+
+
+cache_agenda_hoje = CacheAgendaHoje(ttl=float(os.getenv('AGENDA_HOJE_TTL', 30)))
+cache_clientes = CacheClientes(capacidade=int(os.getenv('CLIENTES_CACHE_CAPACIDADE', 1024)),
+                               ttl=float(os.getenv('CLIENTES_CACHE_TTL', 60)))
@@ -0,0 +1,117 @@
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+from models.fuso_horario import saopaulo_tz
+
+# Um campo é um par (coluna, formatador); o formatador recebe o valor lido do banco e pode ser None.
+# Uma inclusão é uma tupla (entidade, condição de junção, campos da entidade incluída), em que o
+# primeiro campo é a chave da entidade incluída.
+
+
+def formata_data(valor) -> str:
+    return valor.strftime('%d/%m/%Y')
+
+
+def formata_horario(valor) -> str:
+    return valor.strftime('%H:%M')
+
+
+def formata_data_hora(valor) -> str:
+    return valor.astimezone(saopaulo_tz).strftime('%d/%m/%Y %H:%M:%S')
+
+
+def vazio_como_nulo(valor):
+    return valor or None
+
+
+def _lista(parametro: Union[str, None]) -> List[str]:
+    nomes = []
+    for nome in (parametro or '').split(','):
+        nome = nome.strip()
+        if nome and nome not in nomes:
+            nomes.append(nome)
+    return nomes
+
+
+def _valida(nomes: Sequence[str], opcoes: Dict, parametro: str):
+    invalidos = [nome for nome in nomes if nome not in opcoes]
+    if invalidos:
+        if not opcoes:
+            raise ValueError(f'O parâmetro {parametro} não é suportado nesta listagem')
+        raise ValueError(f'Valor inválido em {parametro}: ' + ', '.join(invalidos) +
+                         '. Opções: ' + ', '.join(opcoes))
+
+
+def selecao_de_campos(session, entidade, apresenta_padrao: Callable, campos: Dict[str, Tuple],
+                      inclusoes: Dict[str, Tuple], ordenacoes: Dict[str, Tuple],
+                      fields: Union[str, None] = None, include: Union[str, None] = None) -> Tuple[object, Callable]:
+    """
+    Monta uma query que busca apenas os campos e relações solicitados, com o apresentador correspondente
+
+    Sem fields e sem include, a listagem carrega a entidade completa e usa o apresentador padrão,
+    mantendo a resposta de sempre.
+
+    As colunas de todas as ordenações são sempre selecionadas, já que a paginação por cursor lê os
+    valores de ordenação do último registro; elas não aparecem na resposta se não forem pedidas.
+    As relações incluídas são buscadas com LEFT JOIN na mesma query.
+
+    Arguments:
+        session: sessão do SQLAlchemy
+        entidade: modelo principal da listagem
+        apresenta_padrao: apresentador de um registro da entidade completa
+        campos: mapa do nome do campo para (coluna, formatador)
+        inclusoes: mapa do nome da relação para (entidade, condição de junção, campos)
+        ordenacoes: ordenações suportadas pela listagem
+        fields: campos solicitados, separados por vírgula; todos os campos quando não informado
+        include: relações solicitadas, separadas por vírgula
+
+    Returns:
+        Uma tupla com a query (ainda sem filtros e ordenação) e a função que converte uma linha em dicionário
+
+    Raises:
+        ValueError: se algum campo ou relação não for suportado
+    """
+    if not fields and not include:
+        return session.query(entidade), apresenta_padrao
+
+    nomes = _lista(fields) or list(campos)
+    relacoes = _lista(include)
+    _valida(nomes, campos, 'fields')
+    _valida(relacoes, inclusoes, 'include')
+
+    colunas = [campos[nome][0].label(nome) for nome in nomes]
+    rotulos = set(nomes)
+    for colunas_ordenacao in ordenacoes.values():
+        for coluna in colunas_ordenacao:
+            if coluna.key not in rotulos:
+                colunas.append(coluna.label(coluna.key))
+                rotulos.add(coluna.key)
+    for relacao in relacoes:
+        _, _, campos_relacao = inclusoes[relacao]
+        colunas.extend(coluna.label(f'{relacao}__{nome}') for nome, (coluna, _) in campos_relacao.items())
+
+    query = session.query(*colunas).select_from(entidade)
+    for relacao in relacoes:
+        entidade_relacao, juncao, _ = inclusoes[relacao]
+        query = query.outerjoin(entidade_relacao, juncao)
+
+    formatadores = [(nome, campos[nome][1]) for nome in nomes]
+    formatadores_relacoes = [(relacao, [(nome, f'{relacao}__{nome}', formatador)
+                                        for nome, (_, formatador) in inclusoes[relacao][2].items()])
+                             for relacao in relacoes]
+
+    def apresenta(linha) -> dict:
+        resultado = {}
+        for nome, formatador in formatadores:
+            valor = getattr(linha, nome)
+            resultado[nome] = formatador(valor) if formatador and valor is not None else valor
+        for relacao, campos_relacao in formatadores_relacoes:
+            # o primeiro campo de cada relação é a chave; nula quando não há registro relacionado
+            if getattr(linha, campos_relacao[0][1]) is None:
+                resultado[relacao] = None
+                continue
+            resultado[relacao] = {}
+            for nome, rotulo, formatador in campos_relacao:
+                valor = getattr(linha, rotulo)
+                resultado[relacao][nome] = formatador(valor) if formatador and valor is not None else valor
+        return resultado
+
+    return query, apresenta
@@ -1,8 +1,13 @@
-from sqlalchemy import Column, String, Integer, DateTime, Float, UniqueConstraint
+from sqlalchemy import Column, String, Integer, Date, DateTime, Float, UniqueConstraint, Index, Computed, DDL, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from models.base import Base
+from models.busca import expressao_busca, registra_coluna_busca
 from models.fuso_horario import now_saopaulo
 from typing import Union
 
+BUSCA_CLIENTE = expressao_busca(('nome_cliente', 'A'), ('cpf_cliente', 'A'))
+
 class Cliente(Base):
     __tablename__ = 'cliente'
 
@@ -11,6 +16,25 @@ class Cliente(Base):
     cpf_cliente = Column(String(11), nullable=False, unique=True)
     data_cadastro = Column(DateTime, nullable=False, default=now_saopaulo())
     data_atualizacao = Column(DateTime)
+    # contadores mantidos por triggers em consulta_juridica e documento, na mesma transação das gravações
+    num_consultas = Column(Integer, nullable=False, default=0, server_default='0')
+    num_documentos = Column(Integer, nullable=False, default=0, server_default='0')
+    ultima_consulta = Column(Date)
+    # vetor da busca textual global, fora das consultas comuns do ORM
+    busca = deferred(Column(TSVECTOR, Computed(BUSCA_CLIENTE, persisted=True)))
+
+    # índices que sustentam as ordenações da listagem paginada
+    __table_args__ = (
+        Index('ix_cliente_nome_cliente_id', 'nome_cliente', 'id'),
+        Index('ix_cliente_data_cadastro_id', 'data_cadastro', 'id'),
+        Index('ix_cliente_data_atualizacao_id', 'data_atualizacao', 'id'),
+        Index('ix_cliente_num_consultas_id', 'num_consultas', 'id'),
+        Index('ix_cliente_num_documentos_id', 'num_documentos', 'id'),
+        # busca por trecho do nome (ilike '%...%'), usada pelas sugestões enquanto o índice em memória carrega
+        Index('ix_cliente_nome_cliente_trgm', 'nome_cliente',
+              postgresql_using='gin', postgresql_ops={'nome_cliente': 'gin_trgm_ops'}),
+        Index('ix_cliente_busca', 'busca', postgresql_using='gin'),
+    )
 
     def __init__(self, nome_cliente:str, cpf_cliente:str, data_cadastro: Union[DateTime, None] = None):
         """
@@ -28,3 +52,100 @@ class Cliente(Base):
         if (data_cadastro):
             self.data_cadastro = data_cadastro
 
+
+registra_coluna_busca('cliente', BUSCA_CLIENTE)
+
+# O operador gin_trgm_ops do índice de nomes vem da extensão pg_trgm, que precisa existir antes das tabelas.
+event.listen(Base.metadata, 'before_create', DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+# o create_all não cria índices em tabelas já existentes
+event.listen(Base.metadata, 'after_create', DDL(
+    'CREATE INDEX IF NOT EXISTS ix_cliente_nome_cliente_trgm ON cliente USING gin (nome_cliente gin_trgm_ops)'))
+event.listen(Base.metadata, 'after_create', DDL(
+    'CREATE INDEX IF NOT EXISTS ix_cliente_nome_cliente_id ON cliente (nome_cliente, id)'))
+event.listen(Base.metadata, 'after_create', DDL(
+    'CREATE INDEX IF NOT EXISTS ix_cliente_data_cadastro_id ON cliente (data_cadastro, id)'))
+event.listen(Base.metadata, 'after_create', DDL(
+    'CREATE INDEX IF NOT EXISTS ix_cliente_data_atualizacao_id ON cliente (data_atualizacao, id)'))
+
+
+# Funções dos contadores. Dependem de consulta_juridica e documento, então são criadas depois de todas
+# as tabelas; as instruções são idempotentes porque o create_all roda a cada inicialização.
+event.listen(Base.metadata, 'after_create', DDL("""
+CREATE OR REPLACE FUNCTION cliente_contadores_consulta() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.cliente_id IS NOT DISTINCT FROM NEW.cliente_id THEN
+        -- remarcação: apenas a data da última consulta pode mudar
+        UPDATE cliente
+           SET ultima_consulta = (SELECT max(data_consulta) FROM consulta_juridica WHERE cliente_id = NEW.cliente_id)
+         WHERE id = NEW.cliente_id;
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.cliente_id IS NOT NULL THEN
+        -- a última consulta só é recalculada quando a consulta removida era a mais recente,
+        -- com uma leitura do fim do índice (cliente_id, data_consulta)
+        UPDATE cliente
+           SET num_consultas = num_consultas - 1,
+               ultima_consulta = CASE WHEN OLD.data_consulta >= ultima_consulta
+                                      THEN (SELECT max(data_consulta) FROM consulta_juridica WHERE cliente_id = OLD.cliente_id)
+                                      ELSE ultima_consulta END
+         WHERE id = OLD.cliente_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.cliente_id IS NOT NULL THEN
+        UPDATE cliente
+           SET num_consultas = num_consultas + 1,
+               ultima_consulta = GREATEST(ultima_consulta, NEW.data_consulta)
+         WHERE id = NEW.cliente_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""))
+
+event.listen(Base.metadata, 'after_create', DDL("""
+CREATE OR REPLACE FUNCTION cliente_contadores_documento() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.cliente_id IS NOT DISTINCT FROM NEW.cliente_id THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.cliente_id IS NOT NULL THEN
+        UPDATE cliente SET num_documentos = num_documentos - 1 WHERE id = OLD.cliente_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.cliente_id IS NOT NULL THEN
+        UPDATE cliente SET num_documentos = num_documentos + 1 WHERE id = NEW.cliente_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""))
+
+# Os triggers são criados uma única vez. Em bases anteriores aos contadores, as colunas e os índices
+# são adicionados e preenchidos no mesmo bloco, sob bloqueio, para que nenhuma gravação fique de fora.
+event.listen(Base.metadata, 'after_create', DDL("""
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'tr_cliente_contadores_consulta') THEN
+        LOCK TABLE cliente, consulta_juridica, documento IN SHARE ROW EXCLUSIVE MODE;
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'tr_cliente_contadores_consulta') THEN
+            ALTER TABLE cliente ADD COLUMN IF NOT EXISTS num_consultas INTEGER NOT NULL DEFAULT 0,
+                                ADD COLUMN IF NOT EXISTS num_documentos INTEGER NOT NULL DEFAULT 0,
+                                ADD COLUMN IF NOT EXISTS ultima_consulta DATE;
+            CREATE INDEX IF NOT EXISTS ix_cliente_num_consultas_id ON cliente (num_consultas, id);
+            CREATE INDEX IF NOT EXISTS ix_cliente_num_documentos_id ON cliente (num_documentos, id);
+
+            UPDATE cliente
+               SET num_consultas = (SELECT count(*) FROM consulta_juridica WHERE cliente_id = cliente.id),
+                   ultima_consulta = (SELECT max(data_consulta) FROM consulta_juridica WHERE cliente_id = cliente.id),
+                   num_documentos = (SELECT count(*) FROM documento WHERE cliente_id = cliente.id);
+
+            CREATE TRIGGER tr_cliente_contadores_consulta
+            AFTER INSERT OR DELETE OR UPDATE OF cliente_id, data_consulta ON consulta_juridica
+            FOR EACH ROW EXECUTE FUNCTION cliente_contadores_consulta();
+
+            CREATE TRIGGER tr_cliente_contadores_documento
+            AFTER INSERT OR DELETE OR UPDATE OF cliente_id ON documento
+            FOR EACH ROW EXECUTE FUNCTION cliente_contadores_documento();
+        END IF;
+    END IF;
+END
+$$
+"""))
@@ -0,0 +1,114 @@
+import os
+from functools import wraps
+from threading import Event, Lock
+from typing import Callable, Hashable
+from sqlalchemy import event
+from models.database import Session
+
+
+class _Chamada:
+    def __init__(self):
+        self.evento = Event()
+        self.resultado = None
+        self.erro = None
+
+
+class SingleFlight:
+    """
+    Coalesce chamadas idênticas e simultâneas dentro do processo
+
+    A primeira chamada de uma chave executa a função; as que chegam enquanto ela está em andamento
+    aguardam e recebem o mesmo resultado (ou a mesma exceção). Nada é guardado depois que a
+    execução termina, e cada commit do processo desfaz as execuções em andamento (`invalidar`), então
+    uma chamada feita depois de uma escrita nunca recebe o resultado de uma leitura anterior a ela.
+    A espera é limitada a `espera` segundos; depois disso, a chamada executa a função por conta própria.
+    """
+
+    def __init__(self, espera: float):
+        self.espera = espera
+        self._lock = Lock()
+        self._chamadas = {}
+        self.executadas = 0
+        self.compartilhadas = 0
+        self.esperas_esgotadas = 0
+        self.invalidacoes = 0
+
+    def executar(self, chave: Hashable, funcao: Callable):
+        with self._lock:
+            chamada = self._chamadas.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = _Chamada()
+                self._chamadas[chave] = chamada
+                self.executadas += 1
+            else:
+                self.compartilhadas += 1
+
+        if not lider:
+            if not chamada.evento.wait(self.espera):
+                # a execução compartilhada está presa (por exemplo, esperando um lock no banco)
+                with self._lock:
+                    self.esperas_esgotadas += 1
+                return funcao()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.resultado
+
+        try:
+            chamada.resultado = funcao()
+            return chamada.resultado
+        except BaseException as e:
+            chamada.erro = e
+            raise
+        finally:
+            with self._lock:
+                # depois de um invalidar, a chave pode já ser de outra execução
+                if self._chamadas.get(chave) is chamada:
+                    del self._chamadas[chave]
+            chamada.evento.set()
+
+    def invalidar(self):
+        """
+        Desfaz as execuções em andamento, que podem ter lido o banco antes de uma escrita confirmada
+
+        Quem já aguarda uma delas continua recebendo o seu resultado; chamadas novas iniciam outra execução.
+        """
+        with self._lock:
+            if self._chamadas:
+                self._chamadas.clear()
+                self.invalidacoes += 1
+
+    def como_dict(self):
+        with self._lock:
+            return {
+                'executadas': self.executadas,
+                'compartilhadas': self.compartilhadas,
+                'esperas_esgotadas': self.esperas_esgotadas,
+                'invalidacoes': self.invalidacoes,
+                'em_andamento': len(self._chamadas),
+                'espera_segundos': self.espera
+            }
+
+
+single_flight = SingleFlight(espera=float(os.getenv('COALESCENCIA_ESPERA', 10)))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalida_apos_commit(session):
+    # vale para as sessões das requisições e para as de segundo plano, criadas pela mesma fábrica
+    single_flight.invalidar()
+
+
+def coalescer(metodo):
+    """
+    Decora um método de leitura de controller para que chamadas com os mesmos argumentos
+    compartilhem uma única execução em andamento
+    """
+    nome = metodo.__qualname__
+
+    @wraps(metodo)
+    def envoltorio(self, *args, **kwargs):
+        chave = (nome, args, tuple(sorted(kwargs.items())))
+        return single_flight.executar(chave, lambda: metodo(self, *args, **kwargs))
+
+    return envoltorio
@@ -0,0 +1,86 @@
+from sqlalchemy import text
+
+# agendamentos repetidos do mesmo CPF no mesmo dia; o mais antigo de cada grupo é o mantido
+CONSULTAS_DUPLICADAS = text("""
+SELECT cpf_cliente, data_consulta, min(pk_consulta) AS mantida,
+       (array_agg(pk_consulta ORDER BY pk_consulta))[2:] AS repetidas
+  FROM consulta_juridica
+ WHERE cpf_cliente IS NOT NULL AND data_consulta IS NOT NULL
+ GROUP BY cpf_cliente, data_consulta
+HAVING count(*) > 1
+ ORDER BY data_consulta, cpf_cliente
+""")
+
+RESTRICAO_CONSULTA_UNICO = text("""
+SELECT 1 FROM pg_constraint WHERE conname = 'consulta_unico' AND conrelid = 'consulta_juridica'::regclass
+""")
+
+MOVE_DUPLICADAS = [
+    text('LOCK TABLE consulta_juridica, documento IN SHARE ROW EXCLUSIVE MODE'),
+    text("""
+    CREATE TABLE IF NOT EXISTS consulta_juridica_duplicada AS
+        SELECT pk_consulta, nome_cliente, cpf_cliente, data_consulta, horario_consulta, detalhes_consulta, cliente_id
+          FROM consulta_juridica WITH NO DATA
+    """),
+    # documentos das consultas repetidas passam para a consulta mantida
+    text("""
+    UPDATE documento d
+       SET consulta_id = m.mantida
+      FROM (SELECT pk_consulta, min(pk_consulta) OVER (PARTITION BY cpf_cliente, data_consulta) AS mantida
+              FROM consulta_juridica
+             WHERE cpf_cliente IS NOT NULL AND data_consulta IS NOT NULL) m
+     WHERE d.consulta_id = m.pk_consulta AND m.pk_consulta <> m.mantida
+    """),
+]
+
+REMOVE_DUPLICADAS = text("""
+WITH duplicadas AS (
+    DELETE FROM consulta_juridica c
+     USING consulta_juridica mantida
+     WHERE c.cpf_cliente = mantida.cpf_cliente
+       AND c.data_consulta = mantida.data_consulta
+       AND c.pk_consulta > mantida.pk_consulta
+    RETURNING c.pk_consulta, c.nome_cliente, c.cpf_cliente, c.data_consulta, c.horario_consulta,
+              c.detalhes_consulta, c.cliente_id
+)
+INSERT INTO consulta_juridica_duplicada SELECT * FROM duplicadas
+RETURNING pk_consulta, cpf_cliente, data_consulta
+""")
+
+CRIA_RESTRICAO = [
+    text('ALTER TABLE consulta_juridica ADD CONSTRAINT consulta_unico UNIQUE (cpf_cliente, data_consulta)'),
+    text('ALTER TABLE consulta_juridica DROP CONSTRAINT IF EXISTS consulta_periodo_unico'),
+]
+
+
+def restricao_consulta_unico_presente(conexao) -> bool:
+    return conexao.execute(RESTRICAO_CONSULTA_UNICO).first() is not None
+
+
+def consultas_duplicadas(conexao):
+    """
+    Lista os agendamentos repetidos do mesmo CPF no mesmo dia, que impedem a criação de consulta_unico
+
+    Returns:
+        Uma linha por CPF e dia, com a consulta mantida e as repetidas
+    """
+    return conexao.execute(CONSULTAS_DUPLICADAS).fetchall()
+
+
+def move_consultas_duplicadas(conexao):
+    """
+    Resolve os agendamentos repetidos e cria a restrição consulta_unico, na transação da conexão
+
+    De cada CPF e dia, mantém a consulta mais antiga, que recebe os documentos das demais; as demais são
+    copiadas para consulta_juridica_duplicada e removidas. Nada é feito sem que o operador peça
+    (flask consultas-duplicadas --mover).
+
+    Returns:
+        As consultas movidas (pk_consulta, cpf_cliente, data_consulta)
+    """
+    for instrucao in MOVE_DUPLICADAS:
+        conexao.execute(instrucao)
+    movidas = conexao.execute(REMOVE_DUPLICADAS).fetchall()
+    for instrucao in CRIA_RESTRICAO:
+        conexao.execute(instrucao)
+    return movidas
@@ -1,11 +1,24 @@
-from sqlalchemy import Column, String, Integer, Date, Time, ForeignKey, UniqueConstraint
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Integer, SmallInteger, Date, Time, ForeignKey, UniqueConstraint, Index, Computed, DDL, event, func, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, backref, deferred
 from datetime import datetime, time
 from models.base import Base 
-from models.database import Session
+from models.busca import expressao_busca, registra_coluna_busca
 from models.clientes import Cliente
 from typing import Union
 
+# janelas de atendimento
+MANHA_INICIO = time(9, 0)
+MANHA_FIM = time(12, 0)
+TARDE_INICIO = time(13, 0)
+TARDE_FIM = time(18, 0)
+
+PERIODO_FORA_EXPEDIENTE = 0
+PERIODO_MANHA = 1
+PERIODO_TARDE = 2
+
+BUSCA_CONSULTA = expressao_busca(('detalhes_consulta', 'B'))
+
 class ConsultaJuridica(Base):
     __tablename__ = 'consulta_juridica'
 
@@ -15,10 +28,29 @@ class ConsultaJuridica(Base):
     data_consulta = Column(Date)
     horario_consulta = Column(Time)
     detalhes_consulta = Column(String(200))
-    cliente_id = Column(Integer, ForeignKey('cliente.id'))
-    cliente = relationship('Cliente', backref='consultas')
-
-    UniqueConstraint('cpf_cliente', 'data_consulta', name='consulta_unico')
+    cliente_id = Column(Integer, ForeignKey('cliente.id', ondelete='CASCADE'))
+    # passive_deletes deixa a exclusão em cascata para o banco, sem carregar as consultas do cliente
+    cliente = relationship('Cliente', backref=backref('consultas', passive_deletes=True))
+    periodo_consulta = Column(SmallInteger, Computed(
+        "CASE WHEN horario_consulta BETWEEN '09:00' AND '12:00' THEN 1 "
+        "WHEN horario_consulta BETWEEN '13:00' AND '18:00' THEN 2 ELSE 0 END", persisted=True))
+    # vetor da busca textual global, fora das consultas comuns do ORM
+    busca = deferred(Column(TSVECTOR, Computed(BUSCA_CONSULTA, persisted=True)))
+
+    __table_args__ = (
+        # As regras de agendamento são garantidas pelo banco: uma consulta por CPF e dia já impede duas no
+        # mesmo período. A API consulta o agendamento existente para distinguir as mensagens de conflito.
+        UniqueConstraint('cpf_cliente', 'data_consulta', name='consulta_unico'),
+        # índices que sustentam as ordenações da listagem paginada; as colunas são anuláveis (ver sem_nulos)
+        Index('ix_consulta_juridica_data_ordem', func.coalesce(data_consulta, text("'0001-01-01'::date")),
+              func.coalesce(horario_consulta, text("'00:00:00'::time")), id),
+        Index('ix_consulta_juridica_nome_cliente_ordem', func.coalesce(nome_cliente, text("''")), id),
+        # índices dos filtros combináveis da listagem
+        Index('ix_consulta_juridica_data_horario_id', 'data_consulta', 'horario_consulta', 'pk_consulta'),
+        Index('ix_consulta_juridica_cliente_id_data', 'cliente_id', 'data_consulta'),
+        Index('ix_consulta_juridica_horario', 'horario_consulta'),
+        Index('ix_consulta_juridica_busca', 'busca', postgresql_using='gin'),
+    )
 
     def __init__(self, nome_cliente: str, cpf_cliente: str, data_consulta: Date, horario_consulta: Time, detalhes_consulta: Union[str, None] = None):
         """
@@ -32,23 +64,15 @@ class ConsultaJuridica(Base):
             detalhes_consulta:  informações a respeito da consulta
             Deve incluir 'nome_cliente', 'cpf_cliente', 'data_consulta', 'horario_consulta' e 'detalhes_consulta'
         """
-        try:
-            session = Session()
-            if not self.valida_data(data_consulta) or not self.valida_hora(horario_consulta):
-                raise ValueError('Formato de data ou horário inválido')
-            self.nome_cliente = nome_cliente
-            self.cpf_cliente = cpf_cliente
-            self.data_consulta = datetime.strptime(
-                data_consulta, '%d/%m/%Y').date()
-            self.horario_consulta = datetime.strptime(
-                horario_consulta, '%H:%M').time()
-            self.detalhes_consulta = detalhes_consulta
-
-        except Exception as e:
-            session.rollback()
-            raise e
-        finally:
-            session.close()
+        if not self.valida_data(data_consulta) or not self.valida_hora(horario_consulta):
+            raise ValueError('Formato de data ou horário inválido')
+        self.nome_cliente = nome_cliente
+        self.cpf_cliente = cpf_cliente
+        self.data_consulta = datetime.strptime(
+            data_consulta, '%d/%m/%Y').date()
+        self.horario_consulta = datetime.strptime(
+            horario_consulta, '%H:%M').time()
+        self.detalhes_consulta = detalhes_consulta
 
     @staticmethod
     def valida_data(data_str: str) -> bool:
@@ -85,49 +109,84 @@ class ConsultaJuridica(Base):
             return False
 
     @staticmethod
-    def valida_consulta_dia(cpf_cliente: str, data_consulta: Date) -> bool:
-        """
-        Verifica se já existe uma consulta no mesmo dia para o cliente
-
-        Arguments:
-            cpf_cliente: O CPF do cliente
-            data_consulta: A data da consulta
-
-        Returns:
-            True se não houver consulta no mesmo dia, False caso contrário
-        """
-        session = Session()
-        consulta = session.query(ConsultaJuridica).filter_by(
-            cpf_cliente=cpf_cliente, data_consulta=data_consulta).first()
-        return consulta is None
-
-    @staticmethod
-    def valida_consulta_periodo(cpf_cliente: str, data_consulta: Date, horario_consulta: Time) -> bool:
+    def periodo_do_horario(horario_consulta: Time) -> int:
         """
-        Verifica se já existe uma consulta no mesmo período para o cliente
+        Identifica o período de atendimento de um horário, com a mesma regra da coluna periodo_consulta
 
         Arguments:
-            cpf_cliente: O CPF do cliente
-            data_consulta: A data da consulta
             horario_consulta: O horário da consulta
 
         Returns:
-            True se não houver consulta no mesmo período, False caso contrário
+            PERIODO_MANHA, PERIODO_TARDE ou PERIODO_FORA_EXPEDIENTE
         """
-        manha_inicio = time(9, 0)
-        manha_fim = time(12, 0)
-        tarde_inicio = time(13, 0)
-        tarde_fim = time(18, 0)
-
-        session = Session()
-        consulta_periodo = session.query(ConsultaJuridica).filter_by(
-            cpf_cliente=cpf_cliente, data_consulta=data_consulta).first()
-        if consulta_periodo is None:
-            return True
-
-        if horario_consulta >= manha_inicio and horario_consulta <= manha_fim:
-            return consulta_periodo.horario_consulta < manha_inicio or consulta_periodo.horario_consulta > manha_fim
-        elif horario_consulta >= tarde_inicio and horario_consulta <= tarde_fim:
-            return consulta_periodo.horario_consulta < tarde_inicio or consulta_periodo.horario_consulta > tarde_fim
-        else:
-            return False
+        if MANHA_INICIO <= horario_consulta <= MANHA_FIM:
+            return PERIODO_MANHA
+        if TARDE_INICIO <= horario_consulta <= TARDE_FIM:
+            return PERIODO_TARDE
+        return PERIODO_FORA_EXPEDIENTE
+
+
+registra_coluna_busca('consulta_juridica', BUSCA_CONSULTA)
+
+# Bases criadas antes da exclusão em cascata têm a chave estrangeira sem ON DELETE CASCADE; ela é recriada uma vez.
+event.listen(Base.metadata, 'after_create', DDL("""
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'consulta_juridica_cliente_id_fkey' AND confdeltype <> 'c') THEN
+        ALTER TABLE consulta_juridica
+            DROP CONSTRAINT consulta_juridica_cliente_id_fkey,
+            ADD CONSTRAINT consulta_juridica_cliente_id_fkey FOREIGN KEY (cliente_id) REFERENCES cliente (id) ON DELETE CASCADE;
+    END IF;
+END
+$$
+"""))
+
+# Bases anteriores às regras de agendamento não têm periodo_consulta nem consulta_unico (o create_all não altera
+# tabelas existentes). A coluna é adicionada uma vez. A restrição só é criada aqui se não houver agendamentos
+# repetidos do mesmo CPF no mesmo dia; havendo, nenhuma consulta é alterada, a inicialização registra um aviso e
+# o operador os lista e resolve com flask consultas-duplicadas (ver models/consultas_duplicadas.py).
+# Este bloco é registrado antes do resumo da agenda, cuja carga inicial lê periodo_consulta.
+event.listen(Base.metadata, 'after_create', DDL("""
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_attribute
+                   WHERE attrelid = 'consulta_juridica'::regclass AND attname = 'periodo_consulta' AND NOT attisdropped) THEN
+        ALTER TABLE consulta_juridica ADD COLUMN periodo_consulta SMALLINT GENERATED ALWAYS AS (
+            CASE WHEN horario_consulta BETWEEN '09:00' AND '12:00' THEN 1
+                 WHEN horario_consulta BETWEEN '13:00' AND '18:00' THEN 2
+                 ELSE 0 END) STORED;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                   WHERE conname = 'consulta_unico' AND conrelid = 'consulta_juridica'::regclass) THEN
+        LOCK TABLE consulta_juridica IN SHARE ROW EXCLUSIVE MODE;
+        IF NOT EXISTS (SELECT 1 FROM consulta_juridica
+                        WHERE cpf_cliente IS NOT NULL AND data_consulta IS NOT NULL
+                        GROUP BY cpf_cliente, data_consulta HAVING count(*) > 1) THEN
+            ALTER TABLE consulta_juridica ADD CONSTRAINT consulta_unico UNIQUE (cpf_cliente, data_consulta);
+        END IF;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_constraint
+               WHERE conname = 'consulta_unico' AND conrelid = 'consulta_juridica'::regclass)
+       AND EXISTS (SELECT 1 FROM pg_constraint
+                   WHERE conname = 'consulta_periodo_unico' AND conrelid = 'consulta_juridica'::regclass) THEN
+        ALTER TABLE consulta_juridica DROP CONSTRAINT consulta_periodo_unico;
+    END IF;
+END
+$$
+"""))
+
+# o create_all não cria índices em tabelas já existentes; o índice de nome anterior, sem coalesce, é substituído
+event.listen(Base.metadata, 'after_create', DDL("""
+CREATE INDEX IF NOT EXISTS ix_consulta_juridica_data_ordem ON consulta_juridica
+    (coalesce(data_consulta, '0001-01-01'::date), coalesce(horario_consulta, '00:00:00'::time), pk_consulta)
+"""))
+event.listen(Base.metadata, 'after_create', DDL(
+    "CREATE INDEX IF NOT EXISTS ix_consulta_juridica_nome_cliente_ordem ON consulta_juridica (coalesce(nome_cliente, ''), pk_consulta)"))
+event.listen(Base.metadata, 'after_create', DDL('DROP INDEX IF EXISTS ix_consulta_juridica_nome_cliente_id'))
+event.listen(Base.metadata, 'after_create', DDL(
+    'CREATE INDEX IF NOT EXISTS ix_consulta_juridica_data_horario_id ON consulta_juridica (data_consulta, horario_consulta, pk_consulta)'))
+# filtros combináveis de consultas: por cliente e data, e janela de horário
+event.listen(Base.metadata, 'after_create', DDL(
+    'CREATE INDEX IF NOT EXISTS ix_consulta_juridica_cliente_id_data ON consulta_juridica (cliente_id, data_consulta)'))
+event.listen(Base.metadata, 'after_create', DDL(
+    'CREATE INDEX IF NOT EXISTS ix_consulta_juridica_horario ON consulta_juridica (horario_consulta)'))
@@ -0,0 +1,65 @@
+from typing import Iterable, Union
+from sqlalchemy import Column, String, Integer, Text, DateTime, Index, Computed, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
+from models.base import Base
+from models.busca import expressao_busca
+from models.database import Session
+
+
+def chave_arquivo(entidade):
+    """
+    Expressão que identifica o arquivo de um documento ou peça processual: a URL do Samba ou, na falta dela,
+    o caminho local, os mesmos valores devolvidos pelo upload
+    """
+    return func.coalesce(func.nullif(entidade.documento_url, ''), entidade.documento_localizacao)
+
+
+def localizacao_do_arquivo(documento_url: Union[str, None], documento_localizacao: Union[str, None]):
+    """A mesma chave de chave_arquivo, calculada a partir dos valores de um registro já carregado."""
+    return documento_url or documento_localizacao
+
+
+class ConteudoArquivo(Base):
+    """
+    Texto extraído de um arquivo enviado (PDF ou DOCX), indexado para a busca no conteúdo
+
+    A extração roda depois do upload, antes de o documento ou a peça ser cadastrado, então o conteúdo é
+    ligado aos registros pela localização do arquivo (ver chave_arquivo).
+    """
+    __tablename__ = 'conteudo_arquivo'
+
+    localizacao = Column(String(255), primary_key=True)
+    texto = deferred(Column(Text))
+    paginas = Column(Integer)
+    erro = Column(String(500))
+    extraido_em = Column(DateTime, nullable=False)
+    busca = deferred(Column(TSVECTOR, Computed(expressao_busca(('texto', 'D')), persisted=True)))
+
+    __table_args__ = (
+        Index('ix_conteudo_arquivo_busca', 'busca', postgresql_using='gin'),
+    )
+
+
+def remove_conteudo(session, localizacoes: Iterable[Union[str, None]]):
+    """
+    Apaga o texto extraído dos arquivos informados, na transação da sessão
+
+    Chamada onde os arquivos são excluídos ou enfileirados para remoção, para que o texto e as entradas
+    do índice de busca não fiquem para trás.
+    """
+    localizacoes = list({localizacao for localizacao in localizacoes if localizacao})
+    if localizacoes:
+        session.query(ConteudoArquivo).filter(
+            ConteudoArquivo.localizacao.in_(localizacoes)).delete(synchronize_session=False)
+
+
+def remove_conteudo_do_arquivo(localizacao: str):
+    """Apaga o texto extraído de um arquivo removido do armazenamento, numa transação própria."""
+    session = Session()
+    try:
+        remove_conteudo(session, [localizacao])
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
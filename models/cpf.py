@@ -0,0 +1,34 @@
+import re
+from typing import Union
+
+_NAO_DIGITOS = re.compile(r'\D')
+
+
+def _digito_verificador(digitos: str) -> str:
+    peso = len(digitos) + 1
+    soma = sum(int(digito) * (peso - posicao) for posicao, digito in enumerate(digitos))
+    resto = soma * 10 % 11
+    return str(resto if resto < 10 else 0)
+
+
+def normaliza_cpf(valor: Union[str, None]) -> Union[str, None]:
+    """
+    Normaliza um CPF para os 11 dígitos gravados no banco, validando os dígitos verificadores
+
+    Pontuação é removida e zeros à esquerda perdidos (comum em planilhas) são restaurados.
+
+    Arguments:
+        valor: CPF com ou sem pontuação
+
+    Returns:
+        O CPF com 11 dígitos, ou None se ele for inválido
+    """
+    digitos = _NAO_DIGITOS.sub('', valor or '')
+    if not digitos or len(digitos) > 11:
+        return None
+    digitos = digitos.zfill(11)
+    if digitos == digitos[0] * 11:
+        return None
+    if _digito_verificador(digitos[:9]) != digitos[9] or _digito_verificador(digitos[:10]) != digitos[10]:
+        return None
+    return digitos
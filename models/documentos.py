@@ -1,9 +1,14 @@
-from sqlalchemy import Column, String, Integer, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Integer, ForeignKey, Index, Computed, DDL, event, func, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, backref, deferred
 from models.base import Base
+from models.busca import expressao_busca, registra_coluna_busca
+from models.conteudo import chave_arquivo
 from models.clientes import Cliente
 from models.consultas_juridicas import ConsultaJuridica
 
+BUSCA_DOCUMENTO = expressao_busca(('documento_nome', 'A'))
+
 class Documento(Base):
     __tablename__ = 'documento'
 
@@ -12,10 +17,25 @@ class Documento(Base):
     documento_localizacao = Column(String(200))
     documento_url = Column(String(200))
     cliente_id = Column(Integer, ForeignKey('cliente.id', ondelete='CASCADE'))
-    consulta_id = Column(Integer, ForeignKey('consulta_juridica.pk_consulta'), nullable=True)
+    # excluir uma consulta mantém os seus documentos, apenas desvinculados dela
+    consulta_id = Column(Integer, ForeignKey('consulta_juridica.pk_consulta', ondelete='SET NULL'), nullable=True)
+    # vetor da busca textual global, fora das consultas comuns do ORM
+    busca = deferred(Column(TSVECTOR, Computed(BUSCA_DOCUMENTO, persisted=True)))
+
+    # passive_deletes deixa a exclusão em cascata e o SET NULL para o banco, sem carregar os documentos
+    cliente = relationship('Cliente', backref=backref('documentos', passive_deletes=True))
+    consulta = relationship('ConsultaJuridica', backref=backref('documentos', passive_deletes=True))
 
-    cliente = relationship('Cliente', backref='documentos')
-    consulta = relationship('ConsultaJuridica', backref='documentos')
+    # índices que sustentam as ordenações da listagem paginada
+    __table_args__ = (
+        Index('ix_documento_documento_nome_id', 'documento_nome', 'id'),
+        Index('ix_documento_cliente_id_id', 'cliente_id', 'id'),
+        # cliente_id é anulável; a ordenação por ele usa coalesce (ver sem_nulos)
+        Index('ix_documento_cliente_id_ordem', func.coalesce(cliente_id, text('0')), id),
+        # sustenta o SET NULL ao excluir uma consulta
+        Index('ix_documento_consulta_id', 'consulta_id'),
+        Index('ix_documento_busca', 'busca', postgresql_using='gin'),
+    )
 
     def __init__(self, documento_nome:str, documento_localizacao:str, documento_url:str, cliente_id:int, consulta_id:int):
         """
@@ -33,3 +53,35 @@ class Documento(Base):
         self.documento_url = documento_url
         self.cliente_id = cliente_id
         self.consulta_id = consulta_id
+
+
+# liga o documento ao texto extraído do seu arquivo em conteudo_arquivo
+Index('ix_documento_arquivo', chave_arquivo(Documento))
+event.listen(Base.metadata, 'after_create', DDL(
+    "CREATE INDEX IF NOT EXISTS ix_documento_arquivo ON documento (coalesce(nullif(documento_url, ''), documento_localizacao))"))
+
+registra_coluna_busca('documento', BUSCA_DOCUMENTO)
+
+# o create_all não cria índices em tabelas já existentes; os de cliente_id e consulta_id também sustentam a exclusão
+# em cascata de um cliente e o SET NULL de uma consulta, que sem eles varrem toda a tabela
+event.listen(Base.metadata, 'after_create', DDL(
+    'CREATE INDEX IF NOT EXISTS ix_documento_documento_nome_id ON documento (documento_nome, id)'))
+event.listen(Base.metadata, 'after_create', DDL(
+    'CREATE INDEX IF NOT EXISTS ix_documento_cliente_id_ordem ON documento (coalesce(cliente_id, 0), id)'))
+event.listen(Base.metadata, 'after_create', DDL(
+    'CREATE INDEX IF NOT EXISTS ix_documento_cliente_id_id ON documento (cliente_id, id)'))
+event.listen(Base.metadata, 'after_create', DDL(
+    'CREATE INDEX IF NOT EXISTS ix_documento_consulta_id ON documento (consulta_id)'))
+
+# Bases anteriores têm a chave estrangeira sem ON DELETE SET NULL (ou com CASCADE); ela é recriada uma vez.
+event.listen(Base.metadata, 'after_create', DDL("""
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'documento_consulta_id_fkey' AND confdeltype <> 'n') THEN
+        ALTER TABLE documento
+            DROP CONSTRAINT documento_consulta_id_fkey,
+            ADD CONSTRAINT documento_consulta_id_fkey FOREIGN KEY (consulta_id) REFERENCES consulta_juridica (pk_consulta) ON DELETE SET NULL;
+    END IF;
+END
+$$
+"""))
@@ -0,0 +1,194 @@
+import csv
+import io
+from typing import Iterator, List, Tuple
+from sqlalchemy import select, func, Integer, SmallInteger, String, Text, Date, Time, DateTime
+from models.database import engine
+from models.clientes import Cliente
+from models.consultas_juridicas import ConsultaJuridica
+from models.documentos import Documento
+
+TABELAS_EXPORTAVEIS = {
+    'clientes': Cliente.__table__,
+    'consultas': ConsultaJuridica.__table__,
+    'documentos': Documento.__table__,
+}
+FORMATOS_EXPORTACAO = ('csv', 'parquet')
+MIMETYPES_EXPORTACAO = {
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+TAMANHO_LOTE_EXPORTACAO = 10000
+
+# tipos de coluna exportados; colunas de outros tipos (ex: índices de busca) ficam de fora
+_TIPOS_EXPORTAVEIS = (Integer, String, Text, Date, Time, DateTime)
+
+
+class _BufferSaida(io.RawIOBase):
+    """Destino em memória para o escritor Parquet, esvaziado a cada lote transmitido."""
+
+    def __init__(self):
+        super().__init__()
+        self._partes = []
+        self._posicao = 0
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def esvazia(self) -> bytes:
+        dados = b''.join(self._partes)
+        self._partes = []
+        return dados
+
+
+def _tipo_arrow(coluna):
+    import pyarrow as pa
+
+    if isinstance(coluna.type, SmallInteger):
+        return pa.int16()
+    if isinstance(coluna.type, Integer):
+        return pa.int64()
+    if isinstance(coluna.type, DateTime):
+        return pa.timestamp('us')
+    if isinstance(coluna.type, Date):
+        return pa.date32()
+    if isinstance(coluna.type, Time):
+        return pa.time64('us')
+    return pa.string()
+
+
+def colunas_exportaveis(tabela) -> List:
+    return [coluna for coluna in tabela.columns if isinstance(coluna.type, _TIPOS_EXPORTAVEIS)]
+
+
+def _lotes(conexao, tabela, colunas, desde_id: int, ate_id: int, tamanho_lote: int) -> Iterator[List[Tuple]]:
+    # paginação pela chave primária dentro do snapshot: cada lote é uma varredura de intervalo no índice
+    chave = tabela.primary_key.columns.values()[0]
+    posicao_chave = next(posicao for posicao, coluna in enumerate(colunas) if coluna is chave)
+    ultimo_id = desde_id
+    while True:
+        linhas = conexao.execute(
+            select(*colunas).where(chave > ultimo_id, chave <= ate_id).order_by(chave).limit(tamanho_lote)
+        ).fetchall()
+        if not linhas:
+            return
+        yield linhas
+        ultimo_id = linhas[-1][posicao_chave]
+
+
+def _gera_csv(lotes, colunas) -> Iterator[bytes]:
+    saida = io.StringIO()
+    escritor = csv.writer(saida)
+    escritor.writerow([coluna.name for coluna in colunas])
+    for linhas in lotes:
+        escritor.writerows(linhas)
+        yield saida.getvalue().encode('utf-8')
+        saida.seek(0)
+        saida.truncate()
+    yield saida.getvalue().encode('utf-8')
+
+
+def _gera_parquet(lotes, colunas) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(coluna.name, _tipo_arrow(coluna)) for coluna in colunas])
+    saida = _BufferSaida()
+    escritor = pq.ParquetWriter(saida, schema)
+    try:
+        for linhas in lotes:
+            valores = list(zip(*linhas))
+            lote = pa.RecordBatch.from_arrays(
+                [pa.array(valores[i], type=campo.type) for i, campo in enumerate(schema)], schema=schema)
+            escritor.write_batch(lote)
+            yield saida.esvazia()
+    finally:
+        escritor.close()
+    yield saida.esvazia()
+
+
+class ArquivoExportacao:
+    """
+    Bytes do arquivo exportado, lidos da conexão aberta no snapshot
+
+    A conexão é liberada ao fim da iteração ou em close(). O close() também é chamado quando o cliente
+    desconecta antes do primeiro lote; o finally de um gerador que nunca começou não rodaria.
+    """
+
+    def __init__(self, conexao, transacao, partes: Iterator[bytes]):
+        self._conexao = conexao
+        self._transacao = transacao
+        self._partes = partes
+        self._aberto = True
+
+    def __iter__(self):
+        try:
+            yield from self._partes
+        finally:
+            self.close()
+
+    def close(self):
+        if not self._aberto:
+            return
+        self._aberto = False
+        try:
+            self._transacao.rollback()
+        finally:
+            self._conexao.close()
+
+
+def abre_exportacao(nome_tabela: str, formato: str, desde_id: int = 0,
+                    tamanho_lote: int = TAMANHO_LOTE_EXPORTACAO) -> Tuple[int, Iterator[bytes]]:
+    """
+    Abre um snapshot consistente de uma tabela para exportação em CSV ou Parquet
+
+    A leitura ocorre em uma transação REPEATABLE READ somente leitura, em lotes de tamanho fixo
+    percorridos pela chave primária. Apenas as linhas com id maior que `desde_id` e até a marca
+    d'água (o maior id visível no snapshot) são exportadas; a próxima exportação incremental
+    deve partir dessa marca d'água.
+
+    Arguments:
+        nome_tabela: clientes, consultas ou documentos
+        formato: csv ou parquet
+        desde_id: id a partir do qual (exclusive) as linhas são exportadas
+        tamanho_lote: quantidade de linhas lidas do banco e escritas a cada lote
+
+    Returns:
+        Uma tupla com a marca d'água do snapshot e o ArquivoExportacao, que deve ser fechado se não for
+        percorrido até o fim
+
+    Raises:
+        ValueError: se a tabela ou o formato não forem suportados
+    """
+    tabela = TABELAS_EXPORTAVEIS.get(nome_tabela)
+    if tabela is None:
+        raise ValueError('Tabela inválida. Opções: ' + ', '.join(TABELAS_EXPORTAVEIS))
+    if formato not in FORMATOS_EXPORTACAO:
+        raise ValueError('Formato inválido. Opções: ' + ', '.join(FORMATOS_EXPORTACAO))
+    if formato == 'parquet':
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ValueError('Exportação em parquet indisponível: o pacote pyarrow não está instalado')
+
+    colunas = colunas_exportaveis(tabela)
+    conexao = engine.connect().execution_options(isolation_level='REPEATABLE READ', postgresql_readonly=True)
+    transacao = conexao.begin()
+    try:
+        chave = tabela.primary_key.columns.values()[0]
+        ate_id = conexao.execute(select(func.max(chave))).scalar() or desde_id
+    except Exception:
+        transacao.rollback()
+        conexao.close()
+        raise
+
+    lotes = _lotes(conexao, tabela, colunas, desde_id, ate_id, tamanho_lote)
+    partes = _gera_parquet(lotes, colunas) if formato == 'parquet' else _gera_csv(lotes, colunas)
+    return max(ate_id, desde_id), ArquivoExportacao(conexao, transacao, partes)
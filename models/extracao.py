@@ -0,0 +1,153 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from tempfile import SpooledTemporaryFile
+from threading import Lock
+from typing import Tuple, Union
+from docx import Document as DocumentoDocx
+from pypdf import PdfReader
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models.conteudo import ConteudoArquivo
+from models.fuso_horario import now_saopaulo
+from models.samba import pool_samba, TAMANHO_MAXIMO_MEMORIA
+
+# o tsvector do Postgres é limitado a 1 MB; textos maiores são truncados antes de gravar
+TAMANHO_MAXIMO_TEXTO = 500000
+EXTENSOES_EXTRAIVEIS = {'.pdf', '.docx'}
+
+logger = logging.getLogger(__name__)
+
+
+def extrai_texto(caminho: str, arquivo=None) -> Tuple[str, Union[int, None]]:
+    """
+    Extrai o texto de um PDF ou DOCX. Roda nos processos do pool, fora dos workers da API
+
+    Arguments:
+        caminho: caminho do arquivo; define o formato pela extensão
+        arquivo: arquivo já aberto, lido no lugar do caminho quando informado
+
+    Returns:
+        Uma tupla com o texto e a quantidade de páginas (None para DOCX, que não é paginado)
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    origem = arquivo if arquivo is not None else caminho
+    if extensao == '.pdf':
+        leitor = PdfReader(origem)
+        texto = '\n'.join(pagina.extract_text() or '' for pagina in leitor.pages)
+        paginas = len(leitor.pages)
+    elif extensao == '.docx':
+        texto = '\n'.join(paragrafo.text for paragrafo in DocumentoDocx(origem).paragraphs)
+        paginas = None
+    else:
+        raise ValueError(f'Formato não suportado para extração: {extensao}')
+    # o Postgres não aceita o caractere nulo em colunas de texto
+    return texto.replace('\x00', '')[:TAMANHO_MAXIMO_TEXTO], paginas
+
+
+def extrai_texto_samba(compartilhamento: str, caminho: str) -> Tuple[str, Union[int, None]]:
+    """
+    Baixa um arquivo do Samba e extrai o seu texto. Cada processo do pool usa o próprio pool de conexões
+    """
+    with SpooledTemporaryFile(max_size=TAMANHO_MAXIMO_MEMORIA) as arquivo:
+        with pool_samba.conexao() as conn:
+            conn.retrieveFile(compartilhamento, caminho, arquivo)
+        arquivo.seek(0)
+        return extrai_texto(caminho, arquivo)
+
+
+class ExtratorConteudo:
+    """
+    Extrai o texto dos arquivos enviados em um pool de processos e grava o resultado em conteudo_arquivo
+
+    O upload agenda a extração e responde sem esperar por ela; a leitura do PDF, que consome CPU, não
+    ocupa os workers da API. O pool é criado no primeiro agendamento de cada processo, depois de um
+    eventual fork dos workers, e o resultado é gravado por uma sessão própria, fora da requisição.
+    """
+
+    def __init__(self, processos: int):
+        self.processos = processos
+        self._lock = Lock()
+        self._executor = None
+        self.agendados = 0
+        self.extraidos = 0
+        self.falhas = 0
+
+    @staticmethod
+    def extraivel(nome_arquivo: str) -> bool:
+        return os.path.splitext(nome_arquivo)[1].lower() in EXTENSOES_EXTRAIVEIS
+
+    def agendar(self, localizacao: str, caminho: str, sessao_factory, compartilhamento: str = None):
+        """
+        Agenda a extração de um arquivo
+
+        Arguments:
+            localizacao: chave do arquivo, a mesma devolvida pelo upload (caminho local ou URL do Samba)
+            caminho: caminho de onde o arquivo é lido, local ou remoto dentro do compartilhamento
+            sessao_factory: fábrica de sessões usada para gravar o resultado
+            compartilhamento: compartilhamento do Samba; quando informado o arquivo é baixado pelo processo do pool
+        """
+        if not self.extraivel(caminho):
+            return
+        if compartilhamento:
+            funcao, argumentos = extrai_texto_samba, (compartilhamento, caminho)
+        else:
+            funcao, argumentos = extrai_texto, (caminho,)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processos)
+            try:
+                futuro = self._executor.submit(funcao, *argumentos)
+            except BrokenProcessPool:
+                # um processo do pool morreu (ex: falta de memória em um PDF muito grande); o pool é recriado
+                self._executor = ProcessPoolExecutor(max_workers=self.processos)
+                futuro = self._executor.submit(funcao, *argumentos)
+            self.agendados += 1
+        futuro.add_done_callback(lambda f: self._gravar(localizacao, f, sessao_factory))
+
+    def _gravar(self, localizacao: str, futuro, sessao_factory):
+        try:
+            texto, paginas = futuro.result()
+            erro = None
+        except Exception as e:
+            logger.warning('Falha ao extrair o texto de %s: %s', localizacao, e)
+            texto, paginas, erro = None, None, str(e)[:500]
+        falhou = erro is not None
+
+        session = sessao_factory()
+        try:
+            valores = {'texto': texto, 'paginas': paginas, 'erro': erro, 'extraido_em': now_saopaulo()}
+            session.execute(pg_insert(ConteudoArquivo).values(localizacao=localizacao, **valores)
+                            .on_conflict_do_update(index_elements=[ConteudoArquivo.localizacao], set_=valores))
+            session.commit()
+        except Exception:
+            session.rollback()
+            logger.exception('Falha ao gravar o conteúdo extraído de %s', localizacao)
+            falhou = True
+        finally:
+            session.close()
+
+        with self._lock:
+            if falhou:
+                self.falhas += 1
+            else:
+                self.extraidos += 1
+
+    def reinicia_no_filho(self):
+        # o pool do processo pai não pode ser usado no filho; um novo é criado no primeiro agendamento
+        self._lock = Lock()
+        self._executor = None
+
+    def como_dict(self):
+        with self._lock:
+            return {
+                'processos': self.processos,
+                'agendados': self.agendados,
+                'extraidos': self.extraidos,
+                'falhas': self.falhas,
+                'pendentes': self.agendados - self.extraidos - self.falhas
+            }
+
+
+extrator_conteudo = ExtratorConteudo(processos=int(os.getenv('EXTRACAO_PROCESSOS', 2)))
+os.register_at_fork(after_in_child=extrator_conteudo.reinicia_no_filho)
@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 from pytz import timezone
 
 saopaulo_tz = timezone('America/Sao_Paulo')
@@ -6,6 +6,16 @@ saopaulo_tz = timezone('America/Sao_Paulo')
 def now_saopaulo(tz=saopaulo_tz):
     return datetime.now(tz)
 
+def meia_noite_saopaulo(dia: date) -> datetime:
+    """
+    Início de um dia do calendário de São Paulo, com fuso
+
+    Os horários com fuso gravados pela API são convertidos pelo Postgres para o TimeZone da sessão e
+    armazenados sem o fuso; comparado a uma coluna timestamp sem fuso (ver filtra_periodo), este valor
+    passa pela mesma conversão.
+    """
+    return saopaulo_tz.localize(datetime.combine(dia, time.min))
+
 def convert_time_to_tz(time, tz=saopaulo_tz):
     datetime_obj = datetime.combine(datetime.today(), time)
     datetime_obj = datetime_obj.astimezone(tz)
@@ -0,0 +1,25 @@
+import json
+from typing import Callable
+from flask import Response, stream_with_context
+
+MIMETYPE_NDJSON = 'application/x-ndjson'
+TAMANHO_LOTE_STREAM = 500
+
+
+def resposta_ndjson(query, apresenta: Callable, tamanho_lote: int = TAMANHO_LOTE_STREAM) -> Response:
+    """
+    Transmite o resultado de uma query como NDJSON, um objeto JSON por linha
+
+    As linhas são lidas com yield_per, que no psycopg2 usa um cursor do lado do servidor, então
+    apenas um lote de registros fica em memória por vez, independente do tamanho da tabela.
+
+    Arguments:
+        query: query do SQLAlchemy já filtrada e ordenada
+        apresenta: função que converte um registro no dicionário a ser serializado
+        tamanho_lote: quantidade de registros buscados do servidor a cada ida ao banco
+    """
+    def gera_linhas():
+        for registro in query.yield_per(tamanho_lote):
+            yield json.dumps(apresenta(registro), ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(gera_linhas()), mimetype=MIMETYPE_NDJSON)
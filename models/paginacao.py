@@ -0,0 +1,172 @@
+import base64
+import json
+from datetime import date, datetime, time
+from typing import Dict, List, Sequence, Tuple, Union
+from sqlalchemy import func, literal, tuple_
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 500
+
+# Valores que ocupam o lugar de NULL nas colunas de ordenação anuláveis. Uma comparação de tupla com NULL
+# nunca é verdadeira, então sem eles os registros sem valor sumiriam das páginas seguintes. Os índices
+# de ordenação usam as mesmas expressões coalesce.
+SENTINELAS = {
+    str: '',
+    int: 0,
+    date: date(1, 1, 1),
+    time: time(0, 0),
+    datetime: datetime(1, 1, 1)
+}
+
+
+def _serializa_valor(valor):
+    if isinstance(valor, datetime):
+        return {'dt': valor.isoformat()}
+    if isinstance(valor, date):
+        return {'d': valor.isoformat()}
+    if isinstance(valor, time):
+        return {'t': valor.isoformat()}
+    return valor
+
+
+def _deserializa_valor(valor):
+    if isinstance(valor, dict):
+        if 'dt' in valor:
+            return datetime.fromisoformat(valor['dt'])
+        if 'd' in valor:
+            return date.fromisoformat(valor['d'])
+        if 't' in valor:
+            return time.fromisoformat(valor['t'])
+        raise ValueError('Cursor inválido')
+    return valor
+
+
+def sem_nulos(coluna):
+    """
+    Coluna anulável como parte de uma ordenação: NULL é ordenado como o sentinela do tipo da coluna
+
+    Returns:
+        A expressão coalesce(coluna, sentinela), rotulada com o nome da coluna
+    """
+    sentinela = SENTINELAS[coluna.type.python_type]
+    return func.coalesce(coluna, literal(sentinela, coluna.type)).label(coluna.key)
+
+
+def _valor_de_ordenacao(registro, coluna):
+    valor = getattr(registro, coluna.key)
+    if valor is None:
+        # a entidade completa traz o valor original da coluna, sem o coalesce da ordenação
+        return SENTINELAS[coluna.type.python_type]
+    return valor
+
+
+def codifica_cursor(ordenacao: str, valores: Sequence) -> str:
+    """
+    Gera um cursor opaco a partir da ordenação e dos valores de ordenação do último registro da página
+
+    Arguments:
+        ordenacao: chave de ordenação usada na listagem (ex: 'nome_cliente' ou '-id')
+        valores: valores das colunas de ordenação do último registro retornado
+    """
+    conteudo = json.dumps({'s': ordenacao, 'v': [_serializa_valor(v) for v in valores]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(conteudo.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodifica_cursor(cursor: str, ordenacao: str) -> List:
+    """
+    Recupera os valores de ordenação de um cursor, validando se ele pertence à ordenação informada
+
+    Arguments:
+        cursor: cursor recebido do cliente
+        ordenacao: chave de ordenação da requisição atual
+    """
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        conteudo = json.loads(base64.urlsafe_b64decode(cursor + preenchimento).decode('utf-8'))
+        valores = [_deserializa_valor(v) for v in conteudo['v']]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError('Cursor inválido')
+    if conteudo.get('s') != ordenacao:
+        raise ValueError('O cursor informado pertence a outra ordenação')
+    return valores
+
+
+def colunas_de_ordenacao(ordenacoes: Dict[str, Tuple], ordenacao_padrao: str, sort: Union[str, None] = None):
+    """
+    Resolve a ordenação solicitada nas colunas que a compõem
+
+    Returns:
+        Uma tupla com a chave de ordenação, as colunas e se a ordem é decrescente
+
+    Raises:
+        ValueError: se a ordenação não for suportada
+    """
+    chave = sort or ordenacao_padrao
+    colunas = ordenacoes.get(chave.lstrip('-'))
+    if not colunas:
+        raise ValueError('Ordenação inválida. Opções: ' + ', '.join(sorted(ordenacoes)))
+    return chave, colunas, chave.startswith('-')
+
+
+def ordenar(query, ordenacoes: Dict[str, Tuple], ordenacao_padrao: str, sort: Union[str, None] = None):
+    """
+    Aplica a ordenação solicitada a uma query, sem paginação
+
+    Raises:
+        ValueError: se a ordenação não for suportada
+    """
+    _, colunas, descendente = colunas_de_ordenacao(ordenacoes, ordenacao_padrao, sort)
+    return query.order_by(*[coluna.desc() if descendente else coluna.asc() for coluna in colunas])
+
+
+def paginar(query, ordenacoes: Dict[str, Tuple], ordenacao_padrao: str,
+            sort: Union[str, None] = None, cursor: Union[str, None] = None,
+            limit: Union[int, None] = None):
+    """
+    Aplica paginação por cursor (keyset) a uma query, ordenando no servidor
+
+    Cada ordenação é uma tupla de colunas terminada pela chave primária, de forma que a
+    combinação seja única e coberta por um índice B-tree. Colunas anuláveis entram na tupla
+    por sem_nulos. Um '-' no início de `sort` inverte o sentido da ordenação.
+
+    Arguments:
+        query: query do SQLAlchemy já filtrada
+        ordenacoes: mapa do nome da ordenação para as colunas que a compõem
+        ordenacao_padrao: ordenação usada quando `sort` não é informado
+        sort: ordenação solicitada pelo cliente
+        cursor: cursor devolvido na página anterior
+        limit: quantidade máxima de registros da página
+
+    Returns:
+        Uma tupla com os registros da página e o cursor da próxima página (ou None)
+
+    Raises:
+        ValueError: se a ordenação, o limite ou o cursor forem inválidos
+    """
+    chave, colunas, descendente = colunas_de_ordenacao(ordenacoes, ordenacao_padrao, sort)
+
+    if limit is None:
+        limit = LIMITE_PADRAO
+    if limit < 1 or limit > LIMITE_MAXIMO:
+        raise ValueError(f'O parâmetro limit deve estar entre 1 e {LIMITE_MAXIMO}')
+
+    if cursor:
+        valores = decodifica_cursor(cursor, chave)
+        if len(valores) != len(colunas):
+            raise ValueError('Cursor inválido')
+        chave_cursor = tuple_(*[literal(valor, coluna.type) for valor, coluna in zip(valores, colunas)])
+        if descendente:
+            query = query.filter(tuple_(*colunas) < chave_cursor)
+        else:
+            query = query.filter(tuple_(*colunas) > chave_cursor)
+
+    query = query.order_by(*[coluna.desc() if descendente else coluna.asc() for coluna in colunas])
+    registros = query.limit(limit + 1).all()
+
+    proximo_cursor = None
+    if len(registros) > limit:
+        registros = registros[:limit]
+        ultimo = registros[-1]
+        proximo_cursor = codifica_cursor(chave, [_valor_de_ordenacao(ultimo, coluna) for coluna in colunas])
+
+    return registros, proximo_cursor
@@ -1,5 +1,11 @@
-from sqlalchemy import Column, String, Integer, ForeignKey
+from sqlalchemy import Column, String, Integer, ForeignKey, Index, Computed, DDL, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from models.base import Base
+from models.busca import expressao_busca, registra_coluna_busca
+from models.conteudo import chave_arquivo
+
+BUSCA_PECA = expressao_busca(('nome_peca', 'A'), ('categoria', 'C'))
 
 class PecaProcessual(Base):
     __tablename__ = 'peca_processual'
@@ -9,6 +15,15 @@ class PecaProcessual(Base):
     documento_localizacao = Column(String(255), nullable=True)
     categoria = Column(String(100), nullable=False)
     nome_peca = Column(String(150), nullable=False)
+    # vetor da busca textual global, fora das consultas comuns do ORM
+    busca = deferred(Column(TSVECTOR, Computed(BUSCA_PECA, persisted=True)))
+
+    # índices que sustentam as ordenações da listagem paginada
+    __table_args__ = (
+        Index('ix_peca_processual_nome_peca_id', 'nome_peca', 'id'),
+        Index('ix_peca_processual_categoria_id', 'categoria', 'id'),
+        Index('ix_peca_processual_busca', 'busca', postgresql_using='gin'),
+    )
 
     def __init__(self, documento_url:str, documento_localizacao:str, categoria:str, nome_peca:str):
         """
@@ -23,4 +38,18 @@ class PecaProcessual(Base):
         self.documento_url = documento_url
         self.documento_localizacao = documento_localizacao
         self.categoria = categoria
-        self.nome_peca = nome_peca
\ No newline at end of file
+        self.nome_peca = nome_peca
+
+
+# liga a peça ao texto extraído do seu arquivo em conteudo_arquivo
+Index('ix_peca_processual_arquivo', chave_arquivo(PecaProcessual))
+event.listen(Base.metadata, 'after_create', DDL(
+    "CREATE INDEX IF NOT EXISTS ix_peca_processual_arquivo ON peca_processual (coalesce(nullif(documento_url, ''), documento_localizacao))"))
+
+registra_coluna_busca('peca_processual', BUSCA_PECA)
+
+# o create_all não cria índices em tabelas já existentes
+event.listen(Base.metadata, 'after_create', DDL(
+    'CREATE INDEX IF NOT EXISTS ix_peca_processual_nome_peca_id ON peca_processual (nome_peca, id)'))
+event.listen(Base.metadata, 'after_create', DDL(
+    'CREATE INDEX IF NOT EXISTS ix_peca_processual_categoria_id ON peca_processual (categoria, id)'))
@@ -0,0 +1,160 @@
+import logging
+import os
+import posixpath
+import queue
+from threading import Lock, Thread
+from typing import Iterable, Tuple, Union
+from smb.smb_structs import OperationFailure
+from models.samba import pool_samba, samba_config
+from models.upload import documents
+
+TAMANHO_LOTE_REMOCAO = 100
+ESPERA_LOTE_SEGUNDOS = 0.5
+
+logger = logging.getLogger(__name__)
+
+
+def caminho_local_permitido(caminho: str, raiz: str) -> bool:
+    """Verifica se o caminho, com links simbólicos e '..' resolvidos, fica dentro da pasta raiz."""
+    raiz = os.path.realpath(raiz)
+    return os.path.commonpath([os.path.realpath(caminho), raiz]) == raiz
+
+
+def caminho_samba_permitido(compartilhamento: str, caminho: str) -> bool:
+    """Verifica se o caminho remoto fica no compartilhamento configurado, abaixo de REMOTE_PATH."""
+    if not samba_config.share_name or not samba_config.remote_path or compartilhamento != samba_config.share_name:
+        return False
+    raiz = posixpath.normpath('/' + samba_config.remote_path.replace('\\', '/'))
+    normalizado = posixpath.normpath('/' + caminho.replace('\\', '/'))
+    return normalizado.startswith(raiz.rstrip('/') + '/')
+
+
+def arquivos_do_documento(documento_localizacao: Union[str, None], documento_url: Union[str, None]):
+    """
+    Identifica os arquivos armazenados de um documento
+
+    A localização e a URL são texto livre gravado pela API; só entram arquivos dentro da pasta de uploads
+    de documentos ou do caminho remoto configurado do Samba, para que uma exclusão não alcance outros arquivos.
+
+    Returns:
+        Uma lista de pares ('local', caminho) ou ('samba', (compartilhamento, caminho remoto))
+    """
+    arquivos = []
+    if documento_localizacao:
+        if caminho_local_permitido(documento_localizacao, documents.config.destination):
+            arquivos.append(('local', documento_localizacao))
+        else:
+            logger.warning('Arquivo local fora da pasta de documentos ignorado: %s', documento_localizacao)
+    if documento_url and documento_url.startswith('smb://'):
+        # formato gravado no upload: smb://<servidor>/<compartilhamento>/<caminho remoto>
+        partes = documento_url[len('smb://'):].split('/', 2)
+        if len(partes) == 3 and partes[2]:
+            if caminho_samba_permitido(partes[1], partes[2]):
+                arquivos.append(('samba', (partes[1], partes[2])))
+            else:
+                logger.warning('Arquivo do Samba fora do caminho configurado ignorado: %s', documento_url)
+    return arquivos
+
+
+class FilaRemocaoArquivos:
+    """
+    Fila local do processo que remove arquivos do armazenamento local e do Samba em segundo plano
+
+    As exclusões no banco enfileiram os arquivos depois do commit e respondem sem esperar pelo
+    armazenamento. Uma thread consome a fila em lotes e usa uma única conexão do pool Samba por lote.
+    Arquivos locais que já não existem contam como removidos.
+    """
+
+    def __init__(self, tamanho_lote: int = TAMANHO_LOTE_REMOCAO):
+        self.tamanho_lote = tamanho_lote
+        self._fila = queue.Queue()
+        self._lock = Lock()
+        self._thread = None
+        self.enfileirados = 0
+        self.removidos = 0
+        self.falhas = 0
+        self.lotes = 0
+
+    def enfileirar(self, arquivos: Iterable[Tuple[str, object]]):
+        quantidade = 0
+        for arquivo in arquivos:
+            self._fila.put(arquivo)
+            quantidade += 1
+        if not quantidade:
+            return
+        with self._lock:
+            self.enfileirados += quantidade
+            # a thread é iniciada no processo que enfileira, depois de um eventual fork dos workers
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._consumir, name='remocao-arquivos', daemon=True)
+                self._thread.start()
+
+    def _proximo_lote(self):
+        lote = [self._fila.get()]
+        while len(lote) < self.tamanho_lote:
+            try:
+                lote.append(self._fila.get(timeout=ESPERA_LOTE_SEGUNDOS))
+            except queue.Empty:
+                break
+        return lote
+
+    def _consumir(self):
+        while True:
+            lote = self._proximo_lote()
+            removidos, falhas = 0, 0
+            locais = [caminho for tipo, caminho in lote if tipo == 'local']
+            remotos = [caminho for tipo, caminho in lote if tipo == 'samba']
+
+            for caminho in locais:
+                try:
+                    os.remove(caminho)
+                    removidos += 1
+                except FileNotFoundError:
+                    removidos += 1
+                except OSError:
+                    logger.exception('Falha ao remover o arquivo local %s', caminho)
+                    falhas += 1
+
+            if remotos:
+                r, f = self._remover_do_samba(remotos)
+                removidos += r
+                falhas += f
+
+            with self._lock:
+                self.removidos += removidos
+                self.falhas += falhas
+                self.lotes += 1
+            for _ in lote:
+                self._fila.task_done()
+
+    @staticmethod
+    def _remover_do_samba(remotos):
+        removidos, falhas = 0, 0
+        try:
+            with pool_samba.conexao() as conn:
+                for compartilhamento, caminho in remotos:
+                    try:
+                        conn.deleteFiles(compartilhamento, caminho)
+                        removidos += 1
+                    except OperationFailure:
+                        logger.exception('Falha ao remover o arquivo %s do Samba', caminho)
+                        falhas += 1
+        except Exception:
+            # a conexão caiu ou não pôde ser obtida; o restante do lote não é removido
+            logger.exception('Erro na conexão com o servidor Samba; %d arquivos não removidos',
+                             len(remotos) - removidos - falhas)
+            falhas = len(remotos) - removidos
+        return removidos, falhas
+
+    def como_dict(self):
+        with self._lock:
+            return {
+                'enfileirados': self.enfileirados,
+                'removidos': self.removidos,
+                'falhas': self.falhas,
+                'lotes': self.lotes,
+                'pendentes': self._fila.qsize()
+            }
+
+
+fila_remocao_arquivos = FilaRemocaoArquivos()
@@ -0,0 +1,221 @@
+import logging
+import os
+import shutil
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from tempfile import SpooledTemporaryFile
+from threading import BoundedSemaphore, Lock
+from dotenv import load_dotenv
+from smb.SMBConnection import SMBConnection
+from smb.smb_structs import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# arquivos sem posicionamento são copiados para um temporário que fica em memória até este tamanho
+TAMANHO_MAXIMO_MEMORIA = 8 * 1024 * 1024
+BLOCO_COPIA = 1024 * 1024
+
+project_dir = os.path.abspath(os.path.dirname(__file__))
+load_dotenv(os.path.join(project_dir, '..', '.env'))
+
+ConfiguracaoSamba = namedtuple('ConfiguracaoSamba', [
+    'server_name', 'server_ip', 'share_name', 'remote_path', 'username', 'password', 'machine_name'
+])
+
+# configuração lida uma única vez, na importação
+samba_config = ConfiguracaoSamba(
+    server_name=os.getenv('SERVER_NAME'),
+    server_ip=os.getenv('SERVER_IP'),
+    share_name=os.getenv('SHARENAME'),
+    remote_path=os.getenv('REMOTE_PATH'),
+    username=os.getenv('USERNAME'),
+    password=os.getenv('PASSWORD'),
+    machine_name=os.getenv('MACHINE_NAME')
+)
+
+
+@contextmanager
+def fluxo_para_envio(fluxo):
+    """
+    Prepara o fluxo de um arquivo recebido para o storeFile, sem gravar uma cópia local
+
+    Um fluxo com posicionamento é enviado como está; os demais são copiados para um SpooledTemporaryFile,
+    que só vai para o disco acima de TAMANHO_MAXIMO_MEMORIA.
+
+    Returns:
+        Uma tupla com o fluxo posicionado no início e a quantidade de bytes a enviar
+    """
+    # o SpooledTemporaryFile usado pelo werkzeug não tem seekable() antes do Python 3.11; o seek é testado
+    try:
+        tamanho = fluxo.seek(0, os.SEEK_END)
+        fluxo.seek(0)
+    except (AttributeError, OSError):
+        tamanho = None
+    if tamanho is not None:
+        yield fluxo, tamanho
+        return
+    with SpooledTemporaryFile(max_size=TAMANHO_MAXIMO_MEMORIA) as temporario:
+        shutil.copyfileobj(fluxo, temporario, BLOCO_COPIA)
+        tamanho = temporario.tell()
+        temporario.seek(0)
+        yield temporario, tamanho
+
+
+class ErroConexaoSamba(Exception):
+    """Não foi possível obter uma conexão autenticada com o servidor Samba."""
+
+
+class PoolSamba:
+    """
+    Pool de conexões SMB autenticadas do processo
+
+    O pool limita a quantidade de conexões em uso ao mesmo tempo (`tamanho`); quem excede espera até
+    `espera` segundos por uma devolução. Conexões devolvidas ficam livres para reuso e são fechadas depois
+    de `ocioso_maximo` segundos sem uso. Uma conexão livre há mais de `verificar_apos` segundos é testada
+    com um echo SMB antes de ser emprestada; se falhar, é descartada e outra é usada ou aberta.
+
+    Erros de operação (ex: arquivo inexistente) devolvem a conexão ao pool; qualquer outro erro durante
+    o uso a descarta, já que o estado da sessão SMB é desconhecido.
+    """
+
+    def __init__(self, config: ConfiguracaoSamba, tamanho: int, ocioso_maximo: float, verificar_apos: float, espera: float):
+        self.config = config
+        self.tamanho = tamanho
+        self.ocioso_maximo = ocioso_maximo
+        self.verificar_apos = verificar_apos
+        self.espera = espera
+        self._reinicia()
+
+    def _reinicia(self):
+        self._lock = Lock()
+        self._vagas = BoundedSemaphore(self.tamanho)
+        # pilha de (conexão, devolvida_em): a conexão usada mais recentemente é a primeira a sair
+        self._livres = []
+        self.em_uso = 0
+        self.criadas = 0
+        self.reutilizadas = 0
+        self.descartadas = 0
+        self.expiradas = 0
+        self.timeouts = 0
+        self.espera_maxima = 0.0
+
+    def _abrir(self) -> SMBConnection:
+        conn = SMBConnection(self.config.username, self.config.password, self.config.machine_name,
+                             self.config.server_name, domain='WORKGROUP', use_ntlm_v2=True)
+        try:
+            conectado = conn.connect(self.config.server_ip, 445)
+        except Exception as e:
+            raise ErroConexaoSamba('Erro ao conectar ao servidor Samba') from e
+        if not conectado:
+            raise ErroConexaoSamba('Erro ao conectar ao servidor Samba')
+        with self._lock:
+            self.criadas += 1
+        return conn
+
+    @staticmethod
+    def _fechar(conn: SMBConnection):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _remover_ociosas(self, agora: float):
+        with self._lock:
+            expiradas = [conn for conn, devolvida_em in self._livres if agora - devolvida_em > self.ocioso_maximo]
+            self._livres = [(conn, devolvida_em) for conn, devolvida_em in self._livres
+                            if agora - devolvida_em <= self.ocioso_maximo]
+            self.expiradas += len(expiradas)
+        for conn in expiradas:
+            self._fechar(conn)
+
+    def _emprestar(self) -> SMBConnection:
+        agora = time.monotonic()
+        self._remover_ociosas(agora)
+        while True:
+            with self._lock:
+                if not self._livres:
+                    break
+                conn, devolvida_em = self._livres.pop()
+            if agora - devolvida_em <= self.verificar_apos:
+                with self._lock:
+                    self.reutilizadas += 1
+                return conn
+            try:
+                conn.echo(b'ping', timeout=5)
+                with self._lock:
+                    self.reutilizadas += 1
+                return conn
+            except Exception:
+                self._fechar(conn)
+                with self._lock:
+                    self.descartadas += 1
+        return self._abrir()
+
+    @contextmanager
+    def conexao(self):
+        """
+        Empresta uma conexão do pool durante o bloco with
+
+        Raises:
+            ErroConexaoSamba: se o pool estiver esgotado além do tempo de espera ou o servidor não aceitar a conexão
+        """
+        inicio = time.monotonic()
+        if not self._vagas.acquire(timeout=self.espera):
+            with self._lock:
+                self.timeouts += 1
+            raise ErroConexaoSamba('Todas as conexões com o servidor Samba estão em uso')
+        with self._lock:
+            self.em_uso += 1
+            self.espera_maxima = max(self.espera_maxima, time.monotonic() - inicio)
+
+        conn = None
+        try:
+            conn = self._emprestar()
+            yield conn
+        except OperationFailure:
+            # falha da operação pedida; a sessão SMB continua válida
+            raise
+        except BaseException:
+            if conn is not None:
+                self._fechar(conn)
+                with self._lock:
+                    self.descartadas += 1
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._devolver(conn)
+            with self._lock:
+                self.em_uso -= 1
+            self._vagas.release()
+
+    def _devolver(self, conn: SMBConnection):
+        with self._lock:
+            self._livres.append((conn, time.monotonic()))
+
+    def reinicia_no_filho(self):
+        # as conexões herdadas compartilham sockets com o processo pai; são abandonadas sem fechar
+        self._reinicia()
+
+    def como_dict(self):
+        with self._lock:
+            return {
+                'tamanho': self.tamanho,
+                'em_uso': self.em_uso,
+                'livres': len(self._livres),
+                'criadas': self.criadas,
+                'reutilizadas': self.reutilizadas,
+                'descartadas': self.descartadas,
+                'expiradas': self.expiradas,
+                'timeouts': self.timeouts,
+                'espera_maxima': round(self.espera_maxima, 4)
+            }
+
+
+pool_samba = PoolSamba(samba_config,
+                       tamanho=int(os.getenv('SAMBA_POOL_SIZE', 4)),
+                       ocioso_maximo=float(os.getenv('SAMBA_POOL_OCIOSO', 300)),
+                       verificar_apos=float(os.getenv('SAMBA_POOL_VERIFICAR_APOS', 5)),
+                       espera=float(os.getenv('SAMBA_POOL_TIMEOUT', 10)))
+os.register_at_fork(after_in_child=pool_samba.reinicia_no_filho)
@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import os
+import time
+import zlib
+from datetime import timedelta
+from typing import Union
+from sqlalchemy import Column, String, BigInteger, DateTime, Index, DDL, event, func, or_
+from models.base import Base
+from models.fuso_horario import now_saopaulo
+from models.remocao_arquivos import fila_remocao_arquivos
+from models.samba import samba_config
+
+# uma sessão sem partes recebidas por esse tempo é considerada abandonada
+EXPIRACAO_UPLOAD = timedelta(seconds=int(os.getenv('UPLOAD_EXPIRACAO', 86400)))
+LOTE_EXPIRACAO = 100
+# prazo da concessão de gravação de uma parte; uma parte que não chega nesse tempo é interrompida
+PRAZO_GRAVACAO = timedelta(seconds=int(os.getenv('UPLOAD_PRAZO_PARTE', 600)))
+
+logger = logging.getLogger(__name__)
+
+
+class SessaoUpload(Base):
+    """
+    Upload em partes em andamento
+
+    As partes são gravadas direto no arquivo parcial do destino (local ou Samba); recebido é o offset
+    confirmado até onde o arquivo está íntegro e crc32 é o CRC acumulado desses bytes. Uma transferência
+    interrompida é retomada a partir de recebido. A sessão é removida quando o upload é concluído ou, junto
+    com o arquivo parcial, quando expira (ver remove_sessoes_expiradas).
+
+    gravando_ate é a concessão de gravação: enquanto não vence, só a requisição que a obteve grava no arquivo
+    parcial, conclui ou remove o upload. A concessão é gravada e confirmada antes da transferência, que
+    acontece sem transação aberta.
+    """
+    __tablename__ = 'sessao_upload'
+
+    id = Column(String(32), primary_key=True)
+    tipo = Column(String(20), nullable=False)
+    destino = Column(String(10), nullable=False)
+    pasta = Column(String(200), nullable=False)
+    nome_arquivo = Column(String(255), nullable=False)
+    tamanho = Column(BigInteger, nullable=False)
+    recebido = Column(BigInteger, nullable=False, default=0)
+    crc32 = Column(BigInteger, nullable=False, default=0)
+    sha256 = Column(String(64))
+    caminho_parcial = Column(String(500), nullable=False)
+    criado_em = Column(DateTime, nullable=False)
+    atualizado_em = Column(DateTime, nullable=False)
+    gravando_ate = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_sessao_upload_atualizado_em', 'atualizado_em'),
+    )
+
+
+# o create_all não cria colunas nem índices em tabelas já existentes
+event.listen(Base.metadata, 'after_create', DDL(
+    'ALTER TABLE sessao_upload ADD COLUMN IF NOT EXISTS gravando_ate TIMESTAMP'))
+event.listen(Base.metadata, 'after_create', DDL(
+    'CREATE INDEX IF NOT EXISTS ix_sessao_upload_atualizado_em ON sessao_upload (atualizado_em)'))
+
+
+def sem_gravacao():
+    """Condição das sessões sem concessão de gravação em vigor; a hora é sempre a do banco."""
+    return or_(SessaoUpload.gravando_ate.is_(None), SessaoUpload.gravando_ate < func.now())
+
+
+def remove_sessoes_expiradas(session) -> int:
+    """
+    Remove as sessões de upload abandonadas há mais de UPLOAD_EXPIRACAO segundos e os seus arquivos parciais
+
+    As sessões com uma concessão de gravação em vigor são ignoradas. Os arquivos parciais saem pela fila de
+    remoção, depois do commit; uma falha é registrada e não interrompe quem chamou.
+
+    Returns:
+        A quantidade de sessões removidas
+    """
+    try:
+        expiradas = (session.query(SessaoUpload.id, SessaoUpload.destino, SessaoUpload.caminho_parcial)
+                     .filter(SessaoUpload.atualizado_em < now_saopaulo() - EXPIRACAO_UPLOAD, sem_gravacao())
+                     .limit(LOTE_EXPIRACAO)
+                     .with_for_update(skip_locked=True)
+                     .all())
+        if not expiradas:
+            session.commit()
+            return 0
+        session.query(SessaoUpload).filter(SessaoUpload.id.in_([sessao.id for sessao in expiradas]), sem_gravacao()) \
+            .delete(synchronize_session=False)
+        session.commit()
+    except Exception:
+        session.rollback()
+        logger.exception('Falha ao remover as sessões de upload expiradas')
+        return 0
+
+    fila_remocao_arquivos.enfileirar(
+        ('local', sessao.caminho_parcial) if sessao.destino == 'local'
+        else ('samba', (samba_config.share_name, sessao.caminho_parcial))
+        for sessao in expiradas)
+    return len(expiradas)
+
+
+BLOCO_LEITURA = 1024 * 1024
+
+
+class PrazoGravacaoEsgotado(Exception):
+    """A parte não chegou dentro do prazo da concessão de gravação."""
+
+
+def prazo_local_da_concessao() -> float:
+    """
+    Instante, no relógio monotônico do processo, em que a gravação de uma parte deve parar
+
+    Medido antes de a concessão ser gravada e com uma margem de 10%, termina antes de a concessão vencer no
+    banco; assim uma gravação atrasada nunca se sobrepõe à de quem obtiver a próxima concessão.
+    """
+    return time.monotonic() + PRAZO_GRAVACAO.total_seconds() * 0.9
+
+
+class LeitorParte:
+    """
+    Lê uma parte do corpo da requisição em blocos, acumulando o CRC32 da parte e do arquivo
+
+    Serve de arquivo de origem tanto para a cópia local quanto para o storeFileFromOffset do Samba,
+    então a parte nunca é carregada inteira em memória. Com um prazo, a leitura é interrompida com
+    PrazoGravacaoEsgotado quando ele passa.
+    """
+
+    def __init__(self, fluxo, tamanho: int, crc_inicial: int, prazo: Union[float, None] = None):
+        self.fluxo = fluxo
+        self.restante = tamanho
+        self.lidos = 0
+        self.crc32 = crc_inicial
+        self.crc32_parte = 0
+        self.prazo = prazo
+
+    def read(self, tamanho: int = -1) -> bytes:
+        if self.restante <= 0:
+            return b''
+        if self.prazo is not None and time.monotonic() > self.prazo:
+            raise PrazoGravacaoEsgotado()
+        if tamanho is None or tamanho < 0:
+            tamanho = BLOCO_LEITURA
+        dados = self.fluxo.read(min(tamanho, self.restante))
+        if dados:
+            self.restante -= len(dados)
+            self.lidos += len(dados)
+            self.crc32 = zlib.crc32(dados, self.crc32)
+            self.crc32_parte = zlib.crc32(dados, self.crc32_parte)
+        else:
+            # o cliente encerrou o corpo antes do fim da parte
+            self.restante = 0
+        return dados
+
+
+class EscritorHash:
+    """Destino de escrita que apenas calcula o SHA-256 do que recebe, para conferir um arquivo no Samba."""
+
+    def __init__(self):
+        self.hash = hashlib.sha256()
+
+    def write(self, dados: bytes):
+        self.hash.update(dados)
+        return len(dados)
@@ -0,0 +1,219 @@
+import os
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from threading import Lock, Thread
+from typing import Dict, List, NamedTuple, Tuple, Union
+
+LIMITE_SUGESTOES = 10
+LIMITE_MAXIMO_SUGESTOES = 50
+# prefixos curtos (uma ou duas letras) casam com boa parte do índice; a varredura é limitada para
+# manter o tempo de resposta constante. Se ela termina antes de reunir `limite` nomes que começam com a
+# consulta, as sugestões saem dos clientes varridos, e não necessariamente dos primeiros em ordem alfabética.
+MAXIMO_VARREDURA = 5000
+
+
+def dobra_texto(texto: str) -> str:
+    """Remove acentos e converte para minúsculas, para comparar nomes como 'José' e 'jose'."""
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def tokens_do_nome(nome: str) -> List[str]:
+    return dobra_texto(nome or '').split()
+
+
+class NomeIndexado(NamedTuple):
+    """Nome de um cliente com a forma sem acento e os tokens já calculados, para a busca não refazê-los."""
+    nome: str
+    dobrado: str
+    tokens: Tuple[str, ...]
+
+
+def indexa_nome(nome: str) -> NomeIndexado:
+    dobrado = dobra_texto(nome or '')
+    return NomeIndexado(nome, dobrado, tuple(set(dobrado.split())))
+
+
+class IndiceNomes:
+    """
+    Índice de prefixos em memória para autocompletar nomes de clientes, um por worker
+
+    Guarda uma lista ordenada de pares (token, id) com os tokens dos nomes sem acento e em minúsculas;
+    a busca por prefixo é uma busca binária seguida de uma varredura curta. A carga completa roda em
+    segundo plano; enquanto o índice não está pronto, as buscas vão ao banco. As escritas de clientes
+    deste worker atualizam o índice na hora, e a recarga periódica (`recarga`, em segundos) traz as
+    escritas feitas por outros workers.
+    """
+
+    def __init__(self, recarga: float):
+        self.recarga = recarga
+        self._lock = Lock()
+        self._tokens: List[Tuple[str, int]] = []
+        self._nomes: Dict[int, NomeIndexado] = {}
+        self._pronto = False
+        self._carregando = False
+        self._pendentes = []
+        self._carregado_em = 0.0
+        self.buscas_memoria = 0
+        self.buscas_banco = 0
+        self.cargas = 0
+
+    @property
+    def pronto(self) -> bool:
+        with self._lock:
+            return self._pronto
+
+    # --- manutenção ---
+
+    def _adicionar(self, cliente_id: int, nome: str):
+        self._remover(cliente_id)
+        indexado = indexa_nome(nome)
+        self._nomes[cliente_id] = indexado
+        for token in indexado.tokens:
+            insort(self._tokens, (token, cliente_id))
+
+    def _remover(self, cliente_id: int):
+        indexado = self._nomes.pop(cliente_id, None)
+        if indexado is None:
+            return
+        for token in indexado.tokens:
+            posicao = bisect_left(self._tokens, (token, cliente_id))
+            if posicao < len(self._tokens) and self._tokens[posicao] == (token, cliente_id):
+                del self._tokens[posicao]
+
+    def adicionar(self, cliente_id: int, nome: str):
+        """Inclui ou atualiza o nome de um cliente, depois do commit da escrita."""
+        self._registrar(cliente_id, nome)
+
+    def remover(self, cliente_id: int):
+        """Retira um cliente do índice, depois do commit da exclusão."""
+        self._registrar(cliente_id, None)
+
+    def _registrar(self, cliente_id: int, nome: Union[str, None]):
+        with self._lock:
+            if self._carregando:
+                self._pendentes.append((cliente_id, nome))
+            if self._pronto:
+                self._aplicar(cliente_id, nome)
+
+    def _aplicar(self, cliente_id: int, nome: Union[str, None]):
+        if nome is None:
+            self._remover(cliente_id)
+        else:
+            self._adicionar(cliente_id, nome)
+
+    def carregar_em_segundo_plano(self, sessao_factory):
+        """Inicia a carga completa do índice, se ela não estiver em andamento."""
+        with self._lock:
+            if self._carregando:
+                return
+            self._carregando = True
+            self._pendentes = []
+        Thread(target=self._carregar, args=(sessao_factory,), name='indice-nomes', daemon=True).start()
+
+    def _carregar(self, sessao_factory):
+        from models.clientes import Cliente
+
+        tokens, nomes = [], {}
+        session = sessao_factory()
+        try:
+            for cliente_id, nome in session.query(Cliente.id, Cliente.nome_cliente).yield_per(5000):
+                indexado = nomes[cliente_id] = indexa_nome(nome)
+                tokens.extend((token, cliente_id) for token in indexado.tokens)
+            tokens.sort()
+        except Exception:
+            with self._lock:
+                self._carregando = False
+            return
+        finally:
+            session.close()
+
+        with self._lock:
+            self._tokens, self._nomes = tokens, nomes
+            # escritas confirmadas durante a carga são reaplicadas; reaplicar uma escrita já lida não muda nada
+            for cliente_id, nome in self._pendentes:
+                self._aplicar(cliente_id, nome)
+            self._pendentes = []
+            self._pronto = True
+            self._carregando = False
+            self._carregado_em = time.monotonic()
+            self.cargas += 1
+
+    def reinicia_no_filho(self):
+        # threads não sobrevivem ao fork: uma carga em andamento no processo pai é descartada
+        if self._lock.locked():
+            self._lock = Lock()
+        if self._carregando:
+            self._carregando = False
+            self._pendentes = []
+
+    # --- consulta ---
+
+    def sugerir(self, consulta: str, limite: int, sessao_factory) -> Union[List[dict], None]:
+        """
+        Busca os clientes cujo nome tem, para cada termo da consulta, um token que começa com o termo
+
+        Os nomes que começam com a consulta vêm primeiro; a varredura para ao reunir `limite` deles, que nenhum
+        outro candidato supera, ou ao atingir MAXIMO_VARREDURA tokens. Em qualquer caso, a ordem alfabética
+        vale entre os clientes varridos.
+
+        Returns:
+            Até `limite` sugestões {'id', 'nome_cliente'}, ou None se o índice ainda não estiver pronto
+        """
+        with self._lock:
+            pronto = self._pronto
+            expirado = pronto and time.monotonic() - self._carregado_em >= self.recarga
+        if not pronto or expirado:
+            self.carregar_em_segundo_plano(sessao_factory)
+        if not pronto:
+            with self._lock:
+                self.buscas_banco += 1
+            return None
+
+        termos = tokens_do_nome(consulta)
+        if not termos:
+            return []
+        # o termo mais longo é o mais seletivo; os demais são conferidos nos candidatos
+        principal = max(termos, key=len)
+        prefixo_completo = dobra_texto(consulta.strip())
+
+        with self._lock:
+            self.buscas_memoria += 1
+            candidatos = []
+            vistos = set()
+            iniciais = 0
+            posicao = bisect_left(self._tokens, (principal, -1))
+            fim = min(len(self._tokens), posicao + MAXIMO_VARREDURA)
+            while posicao < fim and iniciais < limite and self._tokens[posicao][0].startswith(principal):
+                cliente_id = self._tokens[posicao][1]
+                posicao += 1
+                if cliente_id in vistos:
+                    continue
+                vistos.add(cliente_id)
+                indexado = self._nomes[cliente_id]
+                if all(any(token.startswith(termo) for token in indexado.tokens) for termo in termos):
+                    inicial = indexado.dobrado.startswith(prefixo_completo)
+                    iniciais += inicial
+                    candidatos.append((not inicial, indexado.dobrado, cliente_id, indexado.nome))
+
+        # nomes que começam com a consulta vêm primeiro, depois a ordem alfabética
+        candidatos.sort()
+        return [{'id': cliente_id, 'nome_cliente': nome} for _, _, cliente_id, nome in candidatos[:limite]]
+
+    def como_dict(self):
+        with self._lock:
+            return {
+                'pronto': self._pronto,
+                'carregando': self._carregando,
+                'clientes': len(self._nomes),
+                'tokens': len(self._tokens),
+                'cargas': self.cargas,
+                'buscas_memoria': self.buscas_memoria,
+                'buscas_banco': self.buscas_banco,
+                'idade_segundos': round(time.monotonic() - self._carregado_em, 1) if self._pronto else None
+            }
+
+
+indice_nomes = IndiceNomes(recarga=float(os.getenv('SUGESTOES_RECARGA', 300)))
+os.register_at_fork(after_in_child=indice_nomes.reinicia_no_filho)
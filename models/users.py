@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text
+from sqlalchemy import Column, Integer, String, Text, Index, DDL, event, func, text
 from werkzeug.security import generate_password_hash, check_password_hash
 from models.base import Base
 
@@ -11,8 +11,19 @@ class User(Base):
     name = Column(String(64))
     image = Column(Text, nullable=True)
 
+    # índice que sustenta a ordenação por nome da listagem paginada (nome anulável, ver sem_nulos)
+    __table_args__ = (
+        Index('ix_users_name_ordem', func.coalesce(name, text("''")), id),
+    )
+
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
+
+
+# o create_all não cria índices em tabelas já existentes; o índice anterior, sem coalesce, é substituído
+event.listen(Base.metadata, 'after_create', DDL(
+    "CREATE INDEX IF NOT EXISTS ix_users_name_ordem ON users (coalesce(name, ''), id)"))
+event.listen(Base.metadata, 'after_create', DDL('DROP INDEX IF EXISTS ix_users_name_id'))
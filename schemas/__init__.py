@@ -1,6 +1,10 @@
-from schemas.clientes import ClienteSchema, ClienteAtualizadoSchema, ClienteBuscaSchema, ClientesFiltradosSchema, ClienteListagemSchema, ClienteViewSchema
-from schemas.consultas_juridicas import ConsultaJuridicaSchema, ConsultaJuridicaAtualizadaSchema, ConsultaJuridicaListagemSchema, ConsultaJuridicaViewSchema, ConsultaJuridicaBuscaSchema, ConsultasFiltradasBuscaSchema, ConsultaJuridicaBuscaPorDataEHoraSchema
+from schemas.clientes import ClienteSchema, ClienteAtualizadoSchema, ClienteBuscaSchema, ClienteIdOuCpfBuscaSchema, ClientesFiltradosSchema, ClienteListagemSchema, ClienteViewSchema, ClienteDossieSchema, ClienteDossiePathSchema, ClienteImportacaoResultadoSchema, ClienteSugestoesBuscaSchema, ClienteSugestoesSchema
+from schemas.consultas_juridicas import ConsultaJuridicaSchema, ConsultaJuridicaAtualizadaSchema, ConsultaJuridicaListagemSchema, ConsultaJuridicaViewSchema, ConsultaJuridicaBuscaSchema, ConsultasFiltradasBuscaSchema, ConsultaJuridicaBuscaPorDataEHoraSchema, ConsultaJuridicaLoteSchema, ConsultaJuridicaLoteResultadoSchema, ConsultaDisponibilidadeBuscaSchema, ConsultaDisponibilidadeViewSchema, ConsultaResumoBuscaSchema, ConsultaResumoViewSchema
 from schemas.mensagem import MensagemResposta
+from schemas.paginacao import PaginacaoSchema
+from schemas.exportacao import ExportacaoPathSchema, ExportacaoBuscaSchema
+from schemas.uploads import UploadSessaoSchema, UploadPathSchema, UploadConclusaoSchema, UploadSessaoViewSchema
+from schemas.busca import BuscaSchema, BuscaListagemSchema, ConteudoListagemSchema
 from schemas.users import UserSchema, UserAuthenticateSchema, UserAtualizadoSchema, UserBuscaSchema, UserViewSchema, UsersListagemSchema
 from schemas.documentos import DocumentoSchema, DocumentoBuscaSchema, DocumentoViewSchema, DocumentoListagemSchema, DocumentoAtualizadoSchema, DocumentoAtualizadoComArquivoSchema, DocumentoExclusaoArmazenamentoSchema
 from schemas.peca_processual import (
@@ -0,0 +1,39 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class BuscaSchema(BaseModel):
+    """Define uma busca textual global. q aceita a sintaxe de buscadores web: aspas para frases,
+    '-' para excluir um termo e 'or' para alternativas. limit e cursor paginam os resultados.
+    """
+    q: str
+    limit: Optional[int]
+    cursor: Optional[str]
+
+class BuscaResultadoSchema(BaseModel):
+    """Define um resultado da busca: tipo é cliente, consulta, documento ou peca_processual"""
+    tipo: str
+    id: int
+    titulo: str
+    descricao: Optional[str]
+    relevancia: float
+
+class BuscaListagemSchema(BaseModel):
+    """Define uma página de resultados da busca, do mais para o menos relevante"""
+    resultados: List[BuscaResultadoSchema]
+    next_cursor: Optional[str]
+
+class ConteudoResultadoSchema(BaseModel):
+    """Define um arquivo encontrado na busca no conteúdo: tipo é documento ou peca_processual, e trecho
+    traz as partes do texto com os termos encontrados destacados em <b>
+    """
+    tipo: str
+    id: int
+    nome: str
+    paginas: Optional[int]
+    trecho: Optional[str]
+    relevancia: float
+
+class ConteudoListagemSchema(BaseModel):
+    """Define uma página de resultados da busca no conteúdo dos arquivos, do mais para o menos relevante"""
+    documentos: List[ConteudoResultadoSchema]
+    next_cursor: Optional[str]
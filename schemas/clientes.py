@@ -1,6 +1,9 @@
 from pydantic import BaseModel
 from datetime import datetime
 from typing import List, Optional
+from schemas.paginacao import PaginacaoSchema
+from schemas.consultas_juridicas import ConsultaJuridicaViewSchema
+from schemas.documentos import DocumentoViewSchema
 
 class ClienteSchema(BaseModel):
     """ Define como um novo cliente deve inserido e deve ser representado"""
@@ -17,9 +20,15 @@ class ClienteBuscaSchema(BaseModel):
     """Define uma busca de um cliente por id"""
     cliente_id: int
 
+class ClienteIdOuCpfBuscaSchema(BaseModel):
+    """Define uma busca de um cliente por id ou, na falta dele, por CPF"""
+    cliente_id: Optional[int]
+    cpf: Optional[str]
+
 class ClienteListagemSchema(BaseModel):
     """Define a representação de uma lista de clientes"""
     clientes: List[ClienteSchema]
+    next_cursor: Optional[str]
 
 class ClienteViewSchema(BaseModel):
     """Define a representação de um cliente"""
@@ -28,10 +37,62 @@ class ClienteViewSchema(BaseModel):
     cpf_cliente: str
     data_cadastro: datetime
     data_atualizacao: Optional[datetime]
+    num_consultas: int
+    num_documentos: int
+    ultima_consulta: Optional[str]
+
+class ClienteDossieSchema(ClienteViewSchema):
+    """Define a representação de um cliente com as suas consultas e documentos"""
+    consultas: List[ConsultaJuridicaViewSchema]
+    documentos: List[DocumentoViewSchema]
+
+class ClienteDossiePathSchema(BaseModel):
+    """Define o cliente cujo dossiê é buscado"""
+    cliente_id: int
+
+class ClienteSugestoesBuscaSchema(BaseModel):
+    """Define uma busca de sugestões de clientes pelo início das palavras do nome, sem diferenciar acentos
+    e maiúsculas. limit vai de 1 a 50 e vale 10 quando não informado.
+    """
+    q: str
+    limit: Optional[int]
+
+class ClienteSugestaoSchema(BaseModel):
+    """Define a representação de uma sugestão de cliente"""
+    id: int
+    nome_cliente: str
+
+class ClienteSugestoesSchema(BaseModel):
+    """Define a representação das sugestões de clientes; origem indica se vieram do índice em memória ou do banco"""
+    sugestoes: List[ClienteSugestaoSchema]
+    origem: str
+
+class ClienteImportacaoRejeicaoSchema(BaseModel):
+    """Define a representação de uma linha rejeitada na importação de clientes"""
+    linha: int
+    cpf_cliente: Optional[str]
+    motivo: str
+
+class ClienteImportacaoResultadoSchema(BaseModel):
+    """Define o relatório de uma importação de clientes. O relatório traz no máximo 1000 rejeições;
+    as demais são apenas contadas em rejeicoes_omitidas.
+    """
+    total_linhas: int
+    importados: int
+    rejeitados: int
+    rejeicoes: List[ClienteImportacaoRejeicaoSchema]
+    rejeicoes_omitidas: int
+
+class ClientesFiltradosSchema(PaginacaoSchema):
+    """Define a representação de uma lista de clientes filtrados e ordenados.
 
-class ClientesFiltradosSchema(BaseModel):
-    """Define a representação de uma lista de clientes filtrados e ordenados"""
+    Ordenações: id, nome_cliente, data_cadastro, num_consultas e num_documentos.
+    """
     nome: Optional[str]
     cpf: Optional[str]
     data_cadastro: Optional[str]
     data_atualizacao: Optional[str]
+    data_cadastro_de: Optional[str]
+    data_cadastro_ate: Optional[str]
+    data_atualizacao_de: Optional[str]
+    data_atualizacao_ate: Optional[str]
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, validator
 from datetime import date, time
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from schemas.paginacao import PaginacaoSchema
 
 class ConsultaJuridicaSchema(BaseModel):
     """ Define como deve ser a estrutura que representa uma consulta.
@@ -24,12 +25,54 @@ class ConsultaJuridicaBuscaPorDataEHoraSchema(BaseModel):
     data_consulta: str
     horario_consulta: str
 
-class ConsultasFiltradasBuscaSchema(BaseModel):
+class ConsultaDisponibilidadeBuscaSchema(BaseModel):
+    """ Define como deve ser a estrutura da busca de horários livres na agenda, entre duas datas
+        (dd/mm/aaaa) e para atendimentos com a duração informada em minutos.
+    """
+    de: str
+    ate: str
+    duracao: Optional[int] = 60
+
+class ConsultaDisponibilidadeViewSchema(BaseModel):
+    """ Define como são retornados os horários livres: um par [data, [horários]] para cada dia do intervalo.
+    """
+    duracao: int
+    dias: List[Tuple[str, List[str]]]
+
+class ConsultaResumoBuscaSchema(BaseModel):
+    """ Define como deve ser a estrutura da busca do resumo da agenda, entre duas datas (dd/mm/aaaa) inclusivas.
+    """
+    de: str
+    ate: str
+
+class ConsultaResumoDiaSchema(BaseModel):
+    """ Define como é retornado o total de consultas de um dia, por período de atendimento.
+    """
+    data: str
+    manha: int
+    tarde: int
+    fora_expediente: int
+    total: int
+
+class ConsultaResumoViewSchema(BaseModel):
+    """ Define como é retornado o resumo da agenda: apenas os dias do intervalo que têm consultas.
+    """
+    dias: List[ConsultaResumoDiaSchema]
+
+class ConsultasFiltradasBuscaSchema(PaginacaoSchema):
     """ Define como deve ser a estrutura que representa a busca de consultas, esperando parâmetros ou não.
+        Os filtros informados são combinados entre si. Datas no formato dd/mm/aaaa e horários no formato HH:MM,
+        com data_de/data_ate e horario_de/horario_ate inclusivos.
+        Ordenações: id, data_consulta e nome_cliente.
     """
     data_consulta: Optional[str] 
     nome_cliente: Optional[str]
     cpf: Optional[str]
+    data_de: Optional[str]
+    data_ate: Optional[str]
+    horario_de: Optional[str]
+    horario_ate: Optional[str]
+    cliente_id: Optional[int]
 
 class ConsultaJuridicaAtualizadaSchema(BaseModel):
     """Define como é a estrutura de uma consulta jurídica atualizada"""
@@ -45,6 +88,7 @@ class ConsultaJuridicaListagemSchema(BaseModel):
     """ Define como uma listagem de consultas será retornada.
     """
     consultas: List[ConsultaJuridicaSchema]
+    next_cursor: Optional[str]
 
 
 class ConsultaJuridicaViewSchema(BaseModel):
@@ -55,4 +99,25 @@ class ConsultaJuridicaViewSchema(BaseModel):
     cpf_cliente: str
     data_consulta: str
     horario_consulta: str
-    detalhes_consulta: Optional[str]
\ No newline at end of file
+    detalhes_consulta: Optional[str]
+
+
+class ConsultaJuridicaLoteSchema(BaseModel):
+    """ Define como deve ser a estrutura de um lote de consultas a serem agendadas de uma só vez.
+    """
+    consultas: List[ConsultaJuridicaSchema]
+
+
+class ConsultaJuridicaLoteItemSchema(BaseModel):
+    """ Define como é retornado o resultado do agendamento de um item do lote, identificado pela sua posição.
+    """
+    indice: int
+    status: int
+    mensagem: Optional[str]
+    consulta: Optional[ConsultaJuridicaViewSchema]
+
+
+class ConsultaJuridicaLoteResultadoSchema(BaseModel):
+    """ Define como é retornado o resultado do agendamento de um lote de consultas.
+    """
+    resultados: List[ConsultaJuridicaLoteItemSchema]
\ No newline at end of file
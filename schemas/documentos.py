@@ -21,6 +21,7 @@ class DocumentoViewSchema(BaseModel):
 class DocumentoListagemSchema(BaseModel):
     """ Define como uma lista de documentos será retornada. """
     documentos: List[DocumentoViewSchema]
+    next_cursor: Optional[str]
 
 class DocumentoBuscaSchema(BaseModel):
     """ Define como deve ser a estrutura de busca de um documento. """
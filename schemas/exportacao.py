@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class ExportacaoPathSchema(BaseModel):
+    """Define a tabela a ser exportada: clientes, consultas ou documentos"""
+    tabela: str
+
+class ExportacaoBuscaSchema(BaseModel):
+    """Define o formato da exportação (csv ou parquet) e o id a partir do qual exportar, para exportações incrementais"""
+    formato: Optional[str] = 'csv'
+    desde_id: Optional[int] = 0
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class PaginacaoSchema(BaseModel):
+    """Define os parâmetros de paginação por cursor e ordenação de uma listagem.
+
+    O sort aceita o nome de uma ordenação suportada pela listagem, com '-' à frente para ordem decrescente.
+    Com stream=1 (ou Accept: application/x-ndjson) todos os registros são transmitidos em NDJSON, sem paginação.
+    fields restringe os campos de cada registro (ex: fields=id,nome_cliente) e include acrescenta relações
+    (ex: include=cliente), ambos separados por vírgula; apenas as colunas pedidas são lidas do banco.
+    """
+    limit: Optional[int]
+    cursor: Optional[str]
+    sort: Optional[str]
+    stream: Optional[bool]
+    fields: Optional[str]
+    include: Optional[str]
@@ -19,6 +19,7 @@ class PecaProcessualViewSchema(BaseModel):
 class PecaProcessualListagemSchema(BaseModel):
     """ Define como uma lista de peças processuais será retornada. """
     pecas_processuais: List[PecaProcessualViewSchema]
+    next_cursor: Optional[str]
 
 class PecaProcessualBuscaSchema(BaseModel):
     """ Define como deve ser a estrutura de busca de uma peça processual. """
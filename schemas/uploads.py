@@ -0,0 +1,34 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class UploadSessaoSchema(BaseModel):
+    """Define a criação de um upload em partes.
+
+    tipo é documento ou peca; pasta é o nome do cliente (documentos) ou a categoria (peças). sha256, opcional,
+    é conferido na conclusão.
+    """
+    tipo: str
+    local_ou_samba: str
+    pasta: str
+    nome_arquivo: str
+    tamanho: int
+    sha256: Optional[str]
+
+class UploadPathSchema(BaseModel):
+    """Define o upload em partes acessado"""
+    upload_id: str
+
+class UploadConclusaoSchema(BaseModel):
+    """Define a conclusão de um upload em partes; crc32, opcional, é o CRC32 do arquivo completo em hexadecimal"""
+    crc32: Optional[str]
+
+class UploadSessaoViewSchema(BaseModel):
+    """Define a representação de um upload em partes: recebido é o offset a partir do qual a próxima parte
+    deve ser enviada e crc32 é o CRC32 dos bytes já confirmados
+    """
+    upload_id: str
+    tipo: str
+    nome_arquivo: str
+    tamanho: int
+    recebido: int
+    crc32: str
@@ -35,4 +35,5 @@ class UserBuscaSchema(BaseModel):
 
 class UsersListagemSchema(BaseModel):
     """Define a representação de uma lista de usuários"""
-    users: List[UserSchema]
\ No newline at end of file
+    users: List[UserSchema]
+    next_cursor: Optional[str]
\ No newline at end of file